@@ -0,0 +1,129 @@
+"""
+Cold-cache image loading benchmark.
+
+Loads every image in a folder the way the GUI does, one "keypress" at a
+time with some think time in between, after evicting each file from the
+page cache. Compares plain PIL loading with the pooled-buffer loader, with
+and without read-ahead of the upcoming files.
+
+    python benchmarks/cold_cache.py                   # generated 24 MP JPEGs
+    python benchmarks/cold_cache.py ~/Pictures/nas    # your own files
+
+Files are evicted with POSIX_FADV_DONTNEED, which needs no privileges; with
+--drop-all (as root) the whole page cache is dropped before each mode.
+Eviction has no effect on tmpfs, so put generated files on a real disk.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from declutrr.constants import *
+from declutrr.image_processor import BUFFERS, ImageProcessor, advise, read_file
+
+
+def generate(directory: str, count: int, megapixels: float) -> None:
+    """Noisy JPEGs, which compress about as badly as real photos."""
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = int(width * 2 / 3)
+    noise = Image.effect_noise((width, height), 64).convert('RGB')
+    for i in range(count):
+        noise.rotate(i * 90 / count).save(os.path.join(directory, f"bench_{i:03d}.jpg"), quality=95)
+
+
+def drop_caches(paths: list[str], drop_all: bool) -> None:
+    if drop_all:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3')
+    for path in paths:
+        advise(path, os.POSIX_FADV_DONTNEED)
+
+
+def load_plain(filepath: str) -> Image.Image:
+    """Loading before pooled buffers: the decoder reads the file as it goes."""
+    image = Image.open(filepath)
+    image.load()
+    return image
+
+
+def run(directory: str, names: list[str], mode: str, think: float) -> tuple[list[float], list[float]]:
+    """Per-image (total, read) times; reads can't be told apart from decoding in plain mode."""
+    processor = ImageProcessor(directory, create_dirs=False)
+    totals, reads = [], []
+    for i, name in enumerate(names):
+        filepath = os.path.join(directory, name)
+        if mode == 'readahead':
+            processor.prefetch(names[i + 1:i + 1 + READAHEAD_FILES])
+        # Time spent looking at the image before the next keypress
+        time.sleep(think)
+        start = time.perf_counter()
+        if mode == 'plain':
+            load_plain(filepath)
+        else:
+            # The read load_image() starts with, timed on its own; the file
+            # is then in the page cache for the decode
+            buffer, view = read_file(filepath)
+            reads.append(time.perf_counter() - start)
+            view.release()
+            BUFFERS.release(buffer)
+            processor.load_image(filepath)
+        totals.append(time.perf_counter() - start)
+        if mode == 'readahead':
+            processor.evict(name)
+    processor.close()
+    return totals, reads
+
+
+def summary(timings: list[float]) -> str:
+    if not timings:
+        return f"{'-':>8} {'-':>8}"
+    timings = [t * 1000 for t in timings]
+    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    return f"{statistics.median(timings):>6.0f}ms {p95:>6.0f}ms"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory', nargs='?', help="folder of images (default: generate some)")
+    parser.add_argument('--count', type=int, default=20, help="images to generate")
+    parser.add_argument('--megapixels', type=float, default=24, help="size of generated images")
+    parser.add_argument('--think', type=float, default=0.3, help="seconds between keypresses")
+    parser.add_argument('--drop-all', action='store_true', help="also drop the whole page cache (root only)")
+    args = parser.parse_args()
+
+    if not hasattr(os, 'posix_fadvise'):
+        print("posix_fadvise is not available on this platform")
+        return 1
+
+    generated = None
+    directory = args.directory
+    if directory is None:
+        generated = directory = tempfile.mkdtemp(dir=os.getcwd())
+        print(f"Generating {args.count} {args.megapixels:g} MP images...")
+        generate(directory, args.count, args.megapixels)
+    try:
+        names = sorted(f for f in os.listdir(directory) if f.lower().endswith(VALID_IMAGE_EXTENSIONS))
+        paths = [os.path.join(directory, name) for name in names]
+        size = sum(os.path.getsize(path) for path in paths) / len(paths) / 1e6
+        print(f"{len(names)} images, {size:.1f} MB on average, {args.think * 1000:.0f} ms think time\n")
+        print(f"{'':<10} {'load p50':>8} {'load p95':>8} {'read p50':>8} {'read p95':>8}")
+        for mode in ('plain', 'pooled', 'readahead'):
+            drop_caches(paths, args.drop_all)
+            totals, reads = run(directory, names, mode, args.think)
+            print(f"{mode:<10} {summary(totals)} {summary(reads)}")
+    finally:
+        if generated:
+            shutil.rmtree(generated)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Synthetic photo corpus for benchmarks.
+
+Generates JPEGs (and some PNGs) that behave like camera files where it
+matters for performance: 2 to 50 megapixels, noisy enough to compress like
+real photos, EXIF capture dates, all eight EXIF orientations and an
+embedded EXIF thumbnail. The same count and seed always give the same
+corpus, and an existing corpus is reused, since generating thousands of
+large files takes a while.
+
+    python benchmarks/corpus.py ~/bench-corpus --count 2000
+"""
+import io
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+# Megapixels and how common each is
+SIZES = {2: 2, 6: 3, 12: 4, 24: 3, 50: 1}
+PNG_SHARE = 0.1
+TILE_SIZE = 1024
+THUMBNAIL_SIZE = (160, 120)
+MANIFEST_NAME = 'corpus.json'
+FIRST_DATE = datetime(2019, 1, 1)
+
+_tiles = []
+
+
+def _noise_tiles() -> list[Image.Image]:
+    """A few noise textures per process; images are tiled from them rather than
+    generating 50 MP of noise each time."""
+    if not _tiles:
+        for sigma in (20, 40, 70):
+            _tiles.append(Image.effect_noise((TILE_SIZE, TILE_SIZE), sigma))
+    return _tiles
+
+
+def plan(count: int, seed: int = 0, sizes: dict[int, int] = SIZES) -> list[dict]:
+    """What to generate: name, megapixels, orientation, format and capture date per file."""
+    rng = random.Random(seed)
+    megapixels = rng.choices(list(sizes), weights=list(sizes.values()), k=count)
+    taken = sorted(FIRST_DATE + timedelta(seconds=rng.randrange(5 * 365 * 86400)) for _ in range(count))
+    specs = []
+    for i in range(count):
+        png = rng.random() < PNG_SHARE
+        specs.append({
+            'name': f"IMG_{i:05d}.{'png' if png else 'jpg'}",
+            'megapixels': megapixels[i],
+            'orientation': i % 8 + 1,
+            'taken': taken[i].strftime('%Y:%m:%d %H:%M:%S'),
+            'seed': rng.randrange(2 ** 32),
+        })
+    return specs
+
+
+def render(spec: dict) -> Image.Image:
+    """Gradient plus tiled noise, landscape 3:2."""
+    width = int((spec['megapixels'] * 1e6 * 3 / 2) ** 0.5)
+    height = width * 2 // 3
+    rng = random.Random(spec['seed'])
+    tile = rng.choice(_noise_tiles())
+    noise = Image.new('L', (width, height))
+    for x in range(-rng.randrange(TILE_SIZE), width, TILE_SIZE):
+        for y in range(-rng.randrange(TILE_SIZE), height, TILE_SIZE):
+            noise.paste(tile, (x, y))
+    gradient = Image.linear_gradient('L').rotate(rng.randrange(360)).resize((width, height))
+    return Image.merge('RGB', (noise, gradient, Image.blend(noise, gradient, rng.random())))
+
+
+def exif_bytes(spec: dict, image: Image.Image) -> bytes:
+    import piexif
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE)
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, 'JPEG', quality=75)
+    taken = spec['taken'].encode()
+    return piexif.dump({
+        '0th': {piexif.ImageIFD.Orientation: spec['orientation'], piexif.ImageIFD.DateTime: taken,
+                piexif.ImageIFD.Make: b'Declutrr', piexif.ImageIFD.Model: b'Synthetic'},
+        'Exif': {piexif.ExifIFD.DateTimeOriginal: taken, piexif.ExifIFD.DateTimeDigitized: taken},
+        '1st': {piexif.ImageIFD.JPEGInterchangeFormat: 0, piexif.ImageIFD.JPEGInterchangeFormatLength: 0},
+        'thumbnail': buffer.getvalue(),
+    })
+
+
+def write(directory: str, spec: dict) -> int:
+    path = os.path.join(directory, spec['name'])
+    image = render(spec)
+    if spec['name'].endswith('.png'):
+        exif = Image.Exif()
+        exif[274] = spec['orientation']
+        exif.get_ifd(0x8769)[36867] = spec['taken']
+        image.save(path, exif=exif, compress_level=1)
+    else:
+        image.save(path, quality=90, exif=exif_bytes(spec, image))
+    return os.path.getsize(path)
+
+
+def generate_corpus(directory: str, count: int, seed: int = 0, sizes: dict[int, int] = SIZES,
+                    workers: int | None = None, progress=None) -> list[dict]:
+    """
+    Generate the corpus in directory, or reuse it if one with the same
+    parameters is there. Returns the specs, with each file's size in bytes.
+    """
+    manifest = os.path.join(directory, MANIFEST_NAME)
+    params = {'count': count, 'seed': seed, 'sizes': {str(mp): weight for mp, weight in sizes.items()}}
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            existing = json.load(f)
+        if existing['params'] == params:
+            return existing['files']
+
+    os.makedirs(directory, exist_ok=True)
+    specs = plan(count, seed, sizes)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for spec, size in zip(specs, pool.map(write, [directory] * count, specs, chunksize=4)):
+            spec['bytes'] = size
+            if progress:
+                progress()
+    with open(manifest, 'w') as f:
+        json.dump({'params': params, 'files': specs}, f, indent=1)
+    return specs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    specs = generate_corpus(args.directory, args.count, args.seed)
+    print(f"{len(specs)} files, {sum(spec['bytes'] for spec in specs) / 1e9:.1f} GB in {args.directory}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+End-to-end UI benchmark: replays a sorting session against the real GUI.
+
+Plays a recorded session (declutrr gui --record session.json) or a
+synthetic one back against ImageSorter on a generated corpus (see
+corpus.py), under Xvfb when there is no display, and reports frame latency
+(from when a keypress was due to its image being on screen, including time
+spent waiting behind the previous one) and total session time. Sessions
+sort hard links to the corpus, so the corpus is never touched. Runs are
+stored and compared like suite.py's.
+
+    python benchmarks/replay.py --count 300                  # synthetic session
+    python benchmarks/replay.py --recording session.json     # a recorded one
+    python benchmarks/replay.py --speed 0                    # keypresses back to back
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import hashlib
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tkinter as tk
+
+from declutrr.constants import *
+from declutrr.recording import load_recording, synthetic_recording
+from declutrr.decisions import DECISION_BACKENDS
+from benchmarks.corpus import generate_corpus
+from benchmarks.suite import BENCH_DIR, RESULTS_FILE, summarize, version, previous_run, report
+
+XVFB_SCREEN = '1920x1080x24'
+XVFB_TIMEOUT = 10  # Seconds to wait for Xvfb to accept connections
+UNDO_KEY = 'z'
+
+
+def start_xvfb() -> subprocess.Popen | None:
+    """Start Xvfb on a free display and point DISPLAY at it, unless there already is a display."""
+    if os.environ.get('DISPLAY'):
+        return None
+    if not shutil.which('Xvfb'):
+        raise RuntimeError("No display and Xvfb not found; install xvfb or set DISPLAY")
+    number = next(n for n in range(99, 200) if not os.path.exists(f"/tmp/.X11-unix/X{n}"))
+    process = subprocess.Popen(['Xvfb', f":{number}", '-screen', '0', XVFB_SCREEN, '-nolisten', 'tcp'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + XVFB_TIMEOUT
+    while not os.path.exists(f"/tmp/.X11-unix/X{number}"):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"Xvfb did not start on :{number}")
+        time.sleep(0.05)
+    os.environ['DISPLAY'] = f":{number}"
+    return process
+
+
+def link_session(corpus: str, directory: str, specs: list[dict]) -> None:
+    """Hard link the corpus images into directory; falls back to copies across filesystems."""
+    for spec in specs:
+        source, target = os.path.join(corpus, spec['name']), os.path.join(directory, spec['name'])
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+
+def keysym(action: str) -> str:
+    """The key the GUI binds to action, as Tk names it."""
+    if action == 'undo':
+        return UNDO_KEY
+    return KEY_BINDINGS['arrows'][action].strip('<>')
+
+
+def replay(directory: str, events: list[dict], speed: float = 1.0, decisions: str = DEFAULT_DECISION_BACKEND) -> dict:
+    """
+    Replay events against an ImageSorter on directory. speed scales the
+    recorded gaps (2 is twice as fast); 0 sends each key as soon as the
+    previous image is on screen. Returns frame latencies in seconds, the
+    session time and the app's own per-stage stats.
+    """
+    from declutrr.app import ImageSorter
+
+    root = tk.Tk()
+    root.geometry(INITIAL_WINDOW_SIZE)
+    app = ImageSorter(root, directory=directory, decisions=decisions)
+    root.update()
+    # Key events go to the focused window
+    root.focus_force()
+    root.update()
+
+    latencies = []
+    start = time.perf_counter()
+
+    def due(index: int) -> float:
+        return start + events[index]['t'] / speed if speed else time.perf_counter()
+
+    def fire(index: int, when: float) -> None:
+        root.event_generate(f"<KeyPress-{keysym(events[index]['action'])}>")
+        # Idle callbacks run in order, so this runs after the app's own paint callback
+        root.after_idle(painted, index, when)
+
+    def painted(index: int, when: float) -> None:
+        latencies.append(time.perf_counter() - when)
+        if index + 1 == len(events):
+            root.quit()
+            return
+        when = due(index + 1)
+        root.after(max(0, round((when - time.perf_counter()) * 1000)), fire, index + 1, when)
+
+    if events:
+        when = due(0)
+        root.after(max(0, round((when - time.perf_counter()) * 1000)), fire, 0, when)
+        root.mainloop()
+    session = time.perf_counter() - start
+
+    stages = app.metrics.summary()['stages']
+    app.scheduler.shutdown()
+    app.decisions.close()
+    app.processor.close()
+    root.destroy()
+    return {'latencies': latencies, 'session_s': session, 'stages': stages}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recording', help="session recorded with declutrr gui --record (default: synthetic)")
+    parser.add_argument('--count', type=int, default=200, help="keypresses in a synthetic session")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed; 0 for back to back")
+    parser.add_argument('--decisions', choices=list(DECISION_BACKENDS), default=DEFAULT_DECISION_BACKEND)
+    parser.add_argument('--corpus', help="where to generate or find the corpus (default: benchmarks/corpus-N)")
+    parser.add_argument('--results', default=RESULTS_FILE, help="JSON lines file runs are appended to")
+    parser.add_argument('--no-save', action='store_true', help="don't store this run")
+    args = parser.parse_args()
+
+    events = load_recording(args.recording) if args.recording else synthetic_recording(args.count, args.seed)
+    if not events:
+        parser.error("the recording has no keypresses")
+    # Enough images that the session never runs out
+    count = len(events)
+    directory = args.corpus or os.path.join(BENCH_DIR, f"corpus-{count}")
+    print(f"Preparing {count} images in {directory}...")
+    specs = generate_corpus(directory, count, args.seed)
+
+    xvfb = start_xvfb()
+    session_dir = tempfile.mkdtemp(prefix='declutrr-replay-', dir=os.path.dirname(os.path.abspath(directory)))
+    try:
+        link_session(directory, session_dir, specs)
+        print(f"Replaying {len(events)} keypresses at {'full speed' if not args.speed else f'{args.speed}x'}...")
+        run = replay(session_dir, events, args.speed, args.decisions)
+    finally:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    recording = hashlib.sha1(json.dumps(events, sort_keys=True).encode()).hexdigest()[:12]
+    corpus = {'count': count, 'seed': args.seed, 'replay': recording, 'speed': args.speed}
+    session = {'count': len(events), 'total_s': round(run['session_s'], 3),
+               'per_second': round(len(events) / run['session_s'], 1) if run['session_s'] else None,
+               'p50': None, 'p95': None, 'p99': None}
+    # Throughput is the session's; frames overlap with think time
+    results = {'frame': {**summarize(run['latencies']), 'per_second': None}, 'session': session}
+    for stage in ('decode', 'resize', 'photo', 'paint'):
+        histogram = run['stages'][stage]
+        results[stage] = {'count': histogram['count'], 'per_second': None,
+                          'p50': histogram['p50_ms'], 'p95': histogram['p95_ms'], 'p99': histogram['p99_ms']}
+    record = {
+        **version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'host': socket.gethostname(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus,
+        'results': results,
+    }
+    regressions = report(results, previous_run(args.results, corpus))
+    print(f"Session: {run['session_s']:.1f} s for {len(events)} keypresses")
+    if not args.no_save:
+        with open(args.results, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Benchmark suite for the image loading and sorting hot paths.
+
+Times listing (get_image_files), capture time lookup (get_creation_time),
+decoding (load_image), the GUI's resize step and keep/restore moves on a
+synthetic corpus (see corpus.py), and prints throughput and p50/p95/p99
+latencies. Every run is appended to a results file with the version and
+commit, and compared with the previous run on the same corpus, so
+regressions show up between versions.
+
+    python benchmarks/suite.py --count 2000 --corpus ~/bench-corpus
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from declutrr.constants import *
+from declutrr.image_processor import ImageProcessor
+from benchmarks.corpus import generate_corpus
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results.jsonl')
+DISPLAY_SIZE = (DEFAULT_WINDOW_WIDTH, DEFAULT_WINDOW_HEIGHT)
+REGRESSION_THRESHOLD = 0.10  # Slower p50 than this fraction is flagged...
+REGRESSION_MIN_MS = 0.5  # ...if it is also this much slower, so sub-millisecond noise isn't
+
+
+def summarize(timings: list[float], nbytes: int = 0) -> dict:
+    """Per-item latencies in ms and throughput per second."""
+    total = sum(timings)
+    result = {'count': len(timings), 'total_s': round(total, 4),
+              'per_second': round(len(timings) / total, 1) if total else None}
+    if nbytes and total:
+        result['mb_per_second'] = round(nbytes / total / 1e6, 1)
+    if len(timings) > 1:
+        cuts = statistics.quantiles([t * 1000 for t in timings], n=100)
+        result.update(p50=round(cuts[49], 3), p95=round(cuts[94], 3), p99=round(cuts[98], 3))
+    else:
+        result.update(p50=round(timings[0] * 1000, 3), p95=None, p99=None)
+    return result
+
+
+def timed(function: Callable, items: list) -> tuple[list[float], list]:
+    timings, outputs = [], []
+    for item in items:
+        start = time.perf_counter()
+        outputs.append(function(item))
+        timings.append(time.perf_counter() - start)
+    return timings, outputs
+
+
+def resize(image: Image.Image) -> Image.Image:
+    """What ImageSorter.resize_image does before handing the image to Tk."""
+    return ImageProcessor.fit_image(image, DISPLAY_SIZE)
+
+
+def run_suite(directory: str, specs: list[dict], sample: int, repeat: int) -> dict:
+    processor = ImageProcessor(directory, create_dirs=False)
+    names = [spec['name'] for spec in specs]
+    paths = [os.path.join(directory, name) for name in names]
+    # Evenly spread over the corpus, so all sizes and orientations are in the sample
+    step = max(1, len(specs) // sample)
+    sampled = specs[::step][:sample]
+    results = {}
+
+    timings, _ = timed(lambda _: processor.get_image_files(), range(repeat))
+    results['get_image_files'] = summarize(timings)
+    # Files listed per second rather than listings
+    results['get_image_files']['per_second'] = round(len(names) * len(timings) / sum(timings), 1)
+
+    timings, _ = timed(processor.get_creation_time, paths)
+    results['get_creation_time'] = summarize(timings)
+
+    timings, images = timed(processor.load_image, [os.path.join(directory, spec['name']) for spec in sampled])
+    results['load_image'] = summarize(timings, sum(spec['bytes'] for spec in sampled))
+    results['load_image']['megapixels'] = round(sum(spec['megapixels'] for spec in sampled) / sum(timings), 1)
+
+    timings, _ = timed(resize, images)
+    results['resize'] = summarize(timings)
+    del images
+
+    os.makedirs(processor.keep_dir, exist_ok=True)
+    try:
+        keep_timings, _ = timed(processor.move_to_keep, names)
+        restore_timings, _ = timed(processor.restore_from_keep, names)
+    finally:
+        os.rmdir(processor.keep_dir)
+    results['move'] = summarize(keep_timings + restore_timings)
+    processor.close()
+    return results
+
+
+def version() -> dict:
+    with open(os.path.join(BENCH_DIR, '..', 'pyproject.toml')) as f:
+        package = next((line.split('"')[1] for line in f if line.startswith('version')), None)
+    try:
+        commit = subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                                cwd=BENCH_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'version': package, 'commit': commit}
+
+
+def previous_run(path: str, corpus: dict) -> dict | None:
+    """The newest stored run on the same corpus and machine."""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record['corpus'] == corpus and record['host'] == socket.gethostname():
+                previous = record
+    return previous
+
+
+def report(results: dict, previous: dict | None) -> int:
+    """Print the results next to the previous run's; returns the number of regressions."""
+    regressions = 0
+    print(f"{'benchmark':<18} {'n':>6} {'per s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  change")
+    for name, result in results.items():
+        change = ''
+        before = previous['results'].get(name) if previous else None
+        if before and before.get('p50') and result['p50']:
+            delta = result['p50'] / before['p50'] - 1
+            change = f"{delta:+.0%} vs {previous['version']} ({previous['commit']})"
+            if delta > REGRESSION_THRESHOLD and result['p50'] - before['p50'] > REGRESSION_MIN_MS:
+                change += "  REGRESSION"
+                regressions += 1
+        columns = [f"{result[key]:>9}" if result.get(key) is not None else f"{'-':>9}"
+                   for key in ('per_second', 'p50', 'p95', 'p99')]
+        print(f"{name:<18} {result['count']:>6} {' '.join(columns)}  {change}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=1000, help="images in the corpus")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus', help="where to generate or find the corpus (default: benchmarks/corpus-COUNT)")
+    parser.add_argument('--sample', type=int, default=100, help="images to decode and resize")
+    parser.add_argument('--repeat', type=int, default=3, help="listings to time")
+    parser.add_argument('--results', default=RESULTS_FILE, help="JSON lines file runs are appended to")
+    parser.add_argument('--no-save', action='store_true', help="don't store this run")
+    args = parser.parse_args()
+
+    directory = args.corpus or os.path.join(BENCH_DIR, f"corpus-{args.count}")
+    print(f"Preparing {args.count} images in {directory}...")
+    specs = generate_corpus(directory, args.count, args.seed)
+    corpus = {'count': args.count, 'seed': args.seed, 'sample': args.sample}
+
+    results = run_suite(directory, specs, args.sample, args.repeat)
+    record = {
+        **version(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'host': socket.gethostname(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus,
+        'results': results,
+    }
+    regressions = report(results, previous_run(args.results, corpus))
+    if not args.no_save:
+        with open(args.results, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+import logging
+from typing import Any
+
+from declutrr.constants import *
+from declutrr.pipeline import Analyzer, Frame
+from declutrr.store import MetadataStore, ANALYZER_TAGS
+from declutrr.tagging import Model, extract_tags
+from declutrr import screenshot_rules
+from declutrr.raw import is_raw, raw_capture_date
+
+# Per-file messages, sampled by setup_logging
+file_log = logging.getLogger(FILE_LOGGER)
+
+
+# EXIF capture date tags, in the Exif sub-IFD
+EXIF_IFD_POINTER = 0x8769
+TAG_DATETIME_ORIGINAL = 36867
+TAG_CREATE_DATE = 36868
+
+
+def laplacian_variance(gray) -> float:
+    """Variance of the 4-neighbour Laplacian, same kernel as cv2.Laplacian(ksize=1)."""
+    import numpy as np
+    pixels = gray.astype(np.float32)
+    laplacian = (pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+                 - 4 * pixels[1:-1, 1:-1])
+    return float(laplacian.var())
+
+
+class BlurAnalyzer(Analyzer):
+    """Sharpness as Laplacian variance; low values mean blurry."""
+    name = 'blur'
+
+    def analyze(self, frame: Frame) -> float:
+        return laplacian_variance(frame.gray)
+
+
+class ScreenshotAnalyzer(Analyzer):
+    """Header-only screenshot score from declutrr.screenshot_rules; never needs pixels."""
+    name = 'screenshot'
+    needs_pixels = False
+
+    def analyze(self, frame: Frame) -> float:
+        return screenshot_rules.screenshot_score(frame.path)
+
+
+def screen_layout(gray) -> dict:
+    """
+    Measure UI-like structure: uniform light/dark regions and long, perfectly
+    horizontal and vertical lines.
+    """
+    import cv2
+    import numpy as np
+
+    total_pixels = gray.shape[0] * gray.shape[1]
+    _, light_binary = cv2.threshold(gray, 250, 255, cv2.THRESH_BINARY)
+    light_ratio = cv2.countNonZero(light_binary) / total_pixels
+    _, dark_binary = cv2.threshold(gray, 30, 255, cv2.THRESH_BINARY_INV)
+    dark_ratio = cv2.countNonZero(dark_binary) / total_pixels
+
+    edges = cv2.Canny(gray, 50, 150)
+    lines = cv2.HoughLines(edges, 1, np.pi / 180, 100)
+
+    height, width = gray.shape
+    min_line_length = min(height, width) * 0.2  # At least 20% of image dimension
+    h_lines = 0
+    v_lines = 0
+    for line in lines if lines is not None else ():
+        rho, theta = line[0]
+        angle_deg = theta * 180 / np.pi
+        a = np.cos(theta)
+        b = np.sin(theta)
+        if abs(b) < 0.01:  # Horizontal line
+            line_length = width
+        elif abs(a) < 0.01:  # Vertical line
+            line_length = height
+        else:
+            continue  # Skip diagonal lines
+        if line_length >= min_line_length:
+            if abs(angle_deg - 180) <= 0.5 or abs(angle_deg) <= 0.5:
+                h_lines += 1
+            elif abs(angle_deg - 90) <= 0.5:
+                v_lines += 1
+
+    return {'light_ratio': light_ratio, 'dark_ratio': dark_ratio,
+            'uniform_ratio': max(light_ratio, dark_ratio), 'h_lines': h_lines, 'v_lines': v_lines}
+
+
+class ScreenContentAnalyzer(Analyzer):
+    """
+    Pixel-based screen detection: a YOLO detector looking for screens, with
+    the line/uniform-region checks as fallback. Scores 1.0 for a screen.
+    """
+    name = 'screen_content'
+
+    def __init__(self, detector: Model | None = None):
+        self.detector = detector
+
+    def detect_screen(self, frame: Frame) -> bool:
+        if self.detector is None:
+            return False
+        try:
+            for cls_name, conf in self.detector([frame.image])[0]['boxes']:
+                if cls_name in SCREEN_CLASSES and conf > 0.5:
+                    file_log.debug("YOLO detected %s with confidence %.2f", cls_name, conf)
+                    return True
+        except Exception as e:
+            logging.error(f"YOLO detection error: {e}")
+        return False
+
+    def analyze(self, frame: Frame) -> float:
+        if self.detect_screen(frame):
+            file_log.info("Screenshot detected by YOLO: %s", frame.name)
+            return 1.0
+        layout = screen_layout(frame.gray)
+        file_log.debug("%s: %s", frame.name, layout)
+        # Require both horizontal AND vertical lines plus significant uniform regions
+        if layout['h_lines'] >= 3 and layout['v_lines'] >= 3 and layout['uniform_ratio'] > 0.25:
+            file_log.info("Screenshot detected by traditional CV: %s", frame.name)
+            return 1.0
+        return 0.0
+
+
+def is_likely_screenshot(results: dict) -> bool:
+    """Header rules win on their own; otherwise fall back to the pixel checks."""
+    return (results['screenshot'] >= SCREENSHOT_SCORE_THRESHOLD
+            or results.get('screen_content', 0) >= 1)
+
+
+def dhash(gray) -> int:
+    """64-bit difference hash: whether each pixel of a 9x8 thumbnail is brighter than its right neighbour."""
+    from PIL import Image
+    small = Image.fromarray(gray).resize((9, 8), Image.Resampling.BOX)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+class HashAnalyzer(Analyzer):
+    """Perceptual dHash for finding near-duplicates."""
+    name = 'dhash'
+    size = 256  # Plenty for a 9x8 thumbnail
+
+    def analyze(self, frame: Frame) -> int:
+        return dhash(frame.gray)
+
+    def store(self, store: MetadataStore, frame: Frame, result: Any) -> None:
+        store.set_hash(frame.name, frame.stat, self.name, result)
+
+    def load(self, store: MetadataStore, name: str) -> int | None:
+        return store.get_hash(name, self.name)
+
+
+def read_capture_time(filepath: str) -> float | None:
+    """
+    Capture time from EXIF DateTimeOriginal, or CreateDate, as seconds since
+    the epoch of the naive camera clock (read back with datetime.fromtimestamp(t, timezone.utc)).
+
+    Only the header is parsed, as in declutrr.screenshot_rules.read_header;
+    of RAW files only the IFDs.
+    """
+    import calendar
+    from datetime import datetime
+    from PIL import Image
+
+    if is_raw(filepath):
+        captured = raw_capture_date(filepath)
+        return float(calendar.timegm(captured.timetuple())) if captured else None
+    try:
+        with Image.open(filepath, formats=screenshot_rules.HEADER_FORMATS) as img:
+            raw_exif = img.info.get('exif')
+        if not raw_exif:
+            return None
+        exif = Image.Exif()
+        exif.load(raw_exif)
+        exif_ifd = exif.get_ifd(EXIF_IFD_POINTER)
+    except Exception as e:
+        logging.debug(f"Could not read EXIF of {filepath}: {e}")
+        return None
+
+    for tag in (TAG_DATETIME_ORIGINAL, TAG_CREATE_DATE):
+        value = exif_ifd.get(tag)
+        try:
+            captured = datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+        except ValueError:
+            continue
+        return float(calendar.timegm(captured.timetuple()))
+    return None
+
+
+class CaptureTimeAnalyzer(Analyzer):
+    """EXIF capture time from the header; files without one are remembered too."""
+    name = 'captured'
+    needs_pixels = False
+
+    def analyze(self, frame: Frame) -> float | None:
+        return read_capture_time(frame.path)
+
+    def store(self, store: MetadataStore, frame: Frame, result: Any) -> None:
+        if result is None:
+            store.mark_analyzed(frame.name, frame.stat, self.name)
+        else:
+            store.set_score(frame.name, frame.stat, self.name, result)
+
+
+class TagAnalyzer(Analyzer):
+    """Runs a classification and a detection model on batches of frames."""
+    name = ANALYZER_TAGS
+    size = TAG_DECODE_SIZE
+
+    def __init__(self, cls_model: Model, det_model: Model, batch_size: int = TAG_BATCH_SIZE):
+        self.cls_model = cls_model
+        self.det_model = det_model
+        self.batch_size = batch_size
+
+    def analyze_batch(self, frames: list[Frame]) -> list[list[tuple[str, float]]]:
+        images = [frame.image for frame in frames]
+        return [
+            extract_tags(cls_result, det_result)
+            for cls_result, det_result in zip(self.cls_model(images), self.det_model(images))
+        ]
+
+    def store(self, store: MetadataStore, frame: Frame, result: Any) -> None:
+        store.set_tags(frame.name, frame.stat, result)
+
+    def load(self, store: MetadataStore, name: str) -> list[tuple[str, float]]:
+        return store.get_tag_confidences(name)
@@ -1,27 +1,51 @@
 import os
+import bisect
+import logging
 import tkinter as tk
 from tkinter import ttk
 
 from PIL import Image, ImageTk
 
-from declutrr.utils import get_directory
+from declutrr.utils import get_directory, get_cli_path
 from declutrr.image_processor import ImageProcessor
+from declutrr.decisions import get_decision_backend
+from declutrr.watcher import FolderWatch, Watcher, get_watcher, list_image_names
+from declutrr.staging import StagingCache, is_network_mount
+from declutrr.metrics import SessionMetrics
+from declutrr.recording import SessionRecorder
+from declutrr.scheduler import Scheduler
+from declutrr.leases import LeaseManager
+from declutrr.tracing import mark, span, traced
 from declutrr.constants import *
 
 
 class ImageSorter:
     """GUI application for sorting images into keep/delete categories."""
-    def __init__(self, root: tk.Tk):
+    def __init__(self, root: tk.Tk, filter_expr: str | None = None, directory: str | None = None,
+                 decisions: str | None = None, watch: bool = False, stage: bool | None = None,
+                 stats_path: str | None = None, record_path: str | None = None, share: bool = False):
         """Initialize the Image Sorter application."""
         self.root = root
         self.root.title(STARTUP_TITLE)
         
         # Initialize all attributes
         self.directory = None
+        self.initial_directory = directory
+        self.decision_backend = decisions
+        self.decisions = None
+        self.watch_enabled = watch
+        # None: stage files locally only when the folder is on a network mount
+        self.stage = stage
+        self.watch = None
+        # Sort a share of the folder alongside other operators
+        self.share = share
+        self.leases = None
+        self.lease_task = None
         self.processor = None
         self.delete_dir = None
         self.keep_dir = None
         self.use_arrows = tk.BooleanVar(value=True)
+        self.filter_var = tk.StringVar(value=filter_expr or '')
         
         # UI components
         self.main_frame = None
@@ -32,6 +56,7 @@ class ImageSorter:
         self.controls_frame = None
         self.status_var = None
         self.status_bar = None
+        self.stats_label = None
         
         # State
         self.current_index = 0
@@ -40,8 +65,24 @@ class ImageSorter:
         self.history = []
         self.current_image = None
         self.stats = {STATUS_KEPT: 0, STATUS_DELETED: 0}
+
+        # Hot path latencies, shown with S and written to stats_path on quit
+        self.metrics = SessionMetrics()
+        self.stats_path = stats_path
+        self.show_stats = False
+        # Sorting keypresses with their timing, for benchmarks/replay.py
+        self.recorder = SessionRecorder(record_path) if record_path else None
+        self.bytes_seen = ImageProcessor.bytes_read
+
+        # Background work, most urgent first; the next image is decoded ahead
+        self.scheduler = Scheduler()
+        self.ahead = None
+        self.ahead_photo = None
+        self.root.after(SCHEDULER_POLL_MS, self.poll_scheduler)
         
         self.setup_startup_dialog()
+        if directory:
+            self.start_processing()
 
     def setup_startup_dialog(self):
         """Show initial dialog with options to open folder or quit."""
@@ -57,6 +98,17 @@ class ImageSorter:
         ttk.Radiobutton(key_frame, text="J/K/L Keys", variable=self.use_arrows, 
                        value=False, command=self.update_button_labels).pack(side='left', padx=5)
         
+        # Optional filter over precomputed analyzer results
+        filter_frame = ttk.Frame(dialog_frame)
+        filter_frame.pack(pady=10)
+        ttk.Label(filter_frame, text="Filter: ").pack(side='left', padx=5)
+        filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_var, width=30)
+        filter_entry.pack(side='left', padx=5)
+        # Keep typed letters from triggering the window hotkeys
+        filter_entry.bindtags((filter_entry, 'TEntry', 'all'))
+        filter_entry.bind('<Return>', lambda e: self.start_processing())
+        ttk.Label(dialog_frame, text="e.g. blur < 90, screenshots, tag:document").pack()
+
         ttk.Button(dialog_frame, text="Open Folder (O)", 
                   command=self.start_processing).pack(pady=10)
         ttk.Button(dialog_frame, text="Quit (Q)", 
@@ -76,20 +128,33 @@ class ImageSorter:
         for widget in self.root.winfo_children():
             widget.destroy()
 
-        # Get working directory
-        self.directory = get_directory()
+        # Get working directory; one given on the command line is only used once,
+        # later "Open Folder" presses ask again
+        self.directory = get_directory(self.initial_directory, use_argv=False)
+        self.initial_directory = None
         if not self.directory:
             self.root.quit()
             return
 
-        # Initialize image processor
-        self.processor = ImageProcessor(self.directory)
-        
-        # Initialize directories
-        self.delete_dir = os.path.join(self.directory, 'delete')
-        self.keep_dir = os.path.join(self.directory, 'keep')
-        os.makedirs(self.delete_dir, exist_ok=True)
-        os.makedirs(self.keep_dir, exist_ok=True)
+        # Initialize image processor; folders are only created by backends that use them
+        if self.processor is not None:
+            self.processor.close()
+        stage = self.stage if self.stage is not None else is_network_mount(self.directory)
+        self._drop_ahead()
+        lookahead = self.scheduler.executor(PRIORITY_LOOKAHEAD)
+        self.processor = ImageProcessor(self.directory, create_dirs=False, executor=lookahead,
+                                        staging=StagingCache(self.directory, executor=lookahead) if stage else None)
+        self.delete_dir = self.processor.delete_dir
+        self.keep_dir = self.processor.keep_dir
+
+        # Where keep/delete decisions go: subfolders, G_ prefix, sidecars or a manifest
+        if self.decisions is not None:
+            self.decisions.close()
+        self.decisions = get_decision_backend(self.directory, self.decision_backend)
+        self.release_leases()
+        if self.share:
+            self.leases = LeaseManager(self.directory)
+            self.root.after(LEASE_RENEW_MS, self.poll_leases, self.leases)
 
         # Initialize UI components
         self.main_frame = None
@@ -105,8 +170,15 @@ class ImageSorter:
         # Setup UI
         self.setup_ui()
         
+        # Pick up files arriving while sorting, e.g. from a tethered camera. The
+        # watcher starts before the folder is listed, so nothing arriving in between is missed
+        watcher = self.open_watcher() if self.watch_enabled else None
+
         # Load images
         self.load_directory()
+
+        if watcher is not None:
+            self.start_watch(*watcher)
         
         # Bind keys and events
         self.bind_keys()
@@ -157,6 +229,10 @@ class ImageSorter:
         self.status_var = tk.StringVar()
         self.status_bar = ttk.Label(self.main_frame, textvariable=self.status_var)
         self.status_bar.pack(fill='x', pady=(10, 0))
+        self.stats_label = ttk.Label(self.main_frame, font='TkFixedFont', justify='left')
+        if self.show_stats:
+            self.stats_label.pack(fill='x')
+            self.update_stats_overlay()
         
     def update_button_labels(self):
         """Update button labels based on current control scheme"""
@@ -181,29 +257,262 @@ class ImageSorter:
 
     def bind_keys(self):
         # Always bind undo and global controls
-        self.root.bind('z', lambda e: self.undo_last_action())
-        self.root.bind('Z', lambda e: self.undo_last_action())
+        self.root.bind('z', lambda e: self.on_key(e, self.undo_last_action, 'undo'))
+        self.root.bind('Z', lambda e: self.on_key(e, self.undo_last_action, 'undo'))
         self.root.bind('q', lambda e: self.root.quit())
         self.root.bind('Q', lambda e: self.root.quit())
         self.root.bind('o', lambda e: self.reset_and_restart())
         self.root.bind('O', lambda e: self.reset_and_restart())
+        self.root.bind('s', lambda e: self.toggle_stats())
+        self.root.bind('S', lambda e: self.toggle_stats())
         
         # Bind based on user preference
         bindings = KEY_BINDINGS['arrows'] if self.use_arrows.get() else KEY_BINDINGS['letters']
-        self.root.bind(bindings['delete'], lambda e: self.delete_image())
-        self.root.bind(bindings['keep'], lambda e: self.keep_image())
-        self.root.bind(bindings['skip'], lambda e: self.skip_image())
+        self.root.bind(bindings['delete'], lambda e: self.on_key(e, self.delete_image, 'delete'))
+        self.root.bind(bindings['keep'], lambda e: self.on_key(e, self.keep_image, 'keep'))
+        self.root.bind(bindings['skip'], lambda e: self.on_key(e, self.skip_image, 'skip'))
+
+    def on_key(self, event, action, name: str | None = None) -> None:
+        """Run a sorting action, timing it from the keypress to the new image on screen."""
+        if self.recorder is not None and name:
+            self.recorder.record(name, getattr(event, 'keysym', None))
+        self.metrics.key_pressed(getattr(event, 'time', None))
+        mark('keypress', 'tk', key=getattr(event, 'keysym', None))
+        with span(action.__name__, 'tk'):
+            action()
+
+    def toggle_stats(self) -> None:
+        """Show or hide the latency stats below the status bar."""
+        self.show_stats = not self.show_stats
+        if not self.stats_label:
+            return
+        if self.show_stats:
+            self.stats_label.pack(fill='x')
+            self.update_stats_overlay()
+        else:
+            self.stats_label.pack_forget()
+
+    def update_stats_overlay(self) -> None:
+        if self.show_stats and self.stats_label:
+            self.stats_label.configure(text=self.metrics.overlay_text())
+
+    @traced('painted', 'tk')
+    def _painted(self) -> None:
+        """Runs once Tk is idle again, i.e. after the new image was drawn."""
+        self.metrics.paint_finished()
+        self.update_stats_overlay()
+        if self.recorder is not None:
+            self.recorder.start()
         
     def load_directory(self):
-        # Get list of images sorted by creation date
-        self.image_files = self.processor.get_image_files()
+        # Get list of images sorted by creation date, limited to the filter if set
+        filter_expr = self.filter_var.get().strip()
+        try:
+            self.image_files = self.decisions.undecided(self.processor.get_image_files(filter_expr or None))
+        except ValueError as e:
+            self.image_files = []
+            self.status_var.set(f"Invalid filter: {e}")
+            return
+        if self.leases is not None:
+            if self.decisions.name == 'manifest':
+                self.image_files = []
+                self.status_var.set("Sharing a folder needs decisions recorded per file, not in a manifest")
+                return
+            # Only the chunks leased here; the rest of the folder is for the other operators
+            self.leases.sync(self.image_files)
+            self.image_files = self.leases.acquire(self.decisions.undecided)
+            self._lease_ahead()
         
         if not self.image_files:
-            self.status_var.set("No images found in directory")
+            if self.leases is not None and self.leases.chunks:
+                self.status_var.set("All remaining images are being sorted by other operators")
+            elif filter_expr:
+                self.status_var.set(f"No images match filter: {filter_expr}")
+            else:
+                self.status_var.set("No images found in directory")
             return
             
         self.display_current_image()
         
+    def open_watcher(self) -> tuple[Watcher, set[str]]:
+        """Start watching the folder, before it is listed; returns the watcher and the files present now."""
+        watcher = get_watcher(self.directory)
+        return watcher, set(list_image_names(self.directory))
+
+    def start_watch(self, watcher: Watcher, present: set[str]) -> None:
+        """
+        Hand new files from watcher to the UI, polling from the Tk event loop.
+        Files present when watching started, or loaded since, aren't new.
+        """
+        self.stop_watch()
+        self.watch = FolderWatch(self.directory, self.processor.get_creation_time,
+                                 known=present | set(self.processor.creation_times), watcher=watcher,
+                                 executor=self.scheduler.executor(PRIORITY_BACKGROUND)).start()
+        self.root.after(WATCH_UI_INTERVAL_MS, self.poll_watch)
+
+    def stop_watch(self) -> None:
+        if self.watch is not None:
+            self.watch.stop()
+            self.watch = None
+
+    @traced('poll_watch', 'tk')
+    def poll_watch(self) -> None:
+        """Insert files found by the watcher in chronological position."""
+        if self.watch is None:
+            return
+        arrived = [(key, name) for key, name in self.watch.drain()
+                   if self.decisions.undecided([name])]
+        if arrived and self.leases is not None:
+            # New files join the shared queue; whoever has time leases them
+            for key, name in arrived:
+                self.processor.creation_times[name] = key
+            self.leases.sync([name for _, name in arrived])
+            if self._all_images_processed():
+                self.display_current_image()
+        elif arrived:
+            waiting = self._all_images_processed()
+            times = self.processor.creation_times
+            for key, name in arrived:
+                times[name] = key
+                index = bisect.bisect_right(self.image_files, key, key=times.__getitem__)
+                self.image_files.insert(index, name)
+                # Keep showing the same image
+                if index <= self.current_index and not waiting:
+                    self.current_index += 1
+            if waiting:
+                self.current_index = self.image_files.index(arrived[0][1])
+                self.display_current_image()
+            else:
+                self._update_status_bar()
+        self.root.after(WATCH_UI_INTERVAL_MS, self.poll_watch)
+
+    def _lease_ahead(self) -> None:
+        """Lease the next chunk in the background, so it is ready when this one is sorted."""
+        if self.leases is not None and self.lease_task is None:
+            self.lease_task = self.scheduler.submit(self.leases.acquire, self.decisions.undecided, ahead=True,
+                                                    priority=PRIORITY_BACKGROUND, callback=self._leased_ahead)
+
+    def _leased_ahead(self, task) -> None:
+        if task is not self.lease_task:
+            return
+        self.lease_task = None
+        waiting = self._all_images_processed()
+        if task.exception() is not None:
+            logging.warning(f"Could not lease more images: {task.exception()}")
+        elif task.result():
+            self.image_files.extend(task.result())
+            if waiting:
+                self.display_current_image()
+            else:
+                self._update_status_bar()
+            return
+        if waiting:
+            # A lease started right away can still take chunks others only leased ahead
+            self.display_current_image()
+
+    def _lease_more(self) -> bool:
+        """
+        Once everything leased here is sorted, lease another chunk in the
+        background and show it once it is in; False if there's none to wait for.
+        """
+        if self.leases is None:
+            return False
+        if self.lease_task is None:
+            self.lease_task = self.scheduler.submit(self.leases.acquire, self.decisions.undecided,
+                                                    priority=PRIORITY_INTERACTIVE, callback=self._leased)
+        else:
+            # A lease ahead that is still on its way comes first
+            self.scheduler.promote(self.lease_task, PRIORITY_INTERACTIVE)
+        self._clear_image()
+        self.status_var.set(f"Leasing more images in {self.directory}...")
+        return True
+
+    def _leased(self, task) -> None:
+        """On the Tk thread once the lease _lease_more() asked for is in."""
+        if task is not self.lease_task:
+            return
+        self.lease_task = None
+        if task.exception() is not None:
+            logging.warning(f"Could not lease more images: {task.exception()}")
+        elif task.result():
+            self.current_index = len(self.image_files)
+            self.image_files.extend(task.result())
+            self._lease_ahead()
+            self.display_current_image()
+            return
+        if self.watch is not None:
+            self._show_waiting_status()
+        else:
+            self._show_completion_status()
+
+    def _start_chunk(self) -> bool:
+        """Start the chunk the current image is in if it was leased ahead; False if it was taken."""
+        if self.leases is None:
+            return True
+        chunk = self.leases.chunk_of.get(self.image_files[self.current_index])
+        if self.leases.held.get(chunk) != LEASE_AHEAD:
+            return True
+        if self.leases.start(chunk):
+            self._lease_ahead()
+            return True
+        self._drop_chunks([chunk])
+        return False
+
+    def _drop_chunks(self, chunks: list[int]) -> bool:
+        """Forget the undecided images of chunks another operator now has; True if that includes the current one."""
+        dropped = {name for chunk in chunks for name in self.leases.chunks[chunk]}
+        current = self.image_files[self.current_index] if self.current_index < len(self.image_files) else None
+        self.image_files = [name for name in self.image_files
+                            if name not in dropped or self.image_status.get(name) in [STATUS_DELETED, STATUS_KEPT]]
+        if current in self.image_files:
+            self.current_index = self.image_files.index(current)
+            return False
+        self.current_index = min(self.current_index, max(len(self.image_files) - 1, 0))
+        return True
+
+    def poll_leases(self, leases: LeaseManager) -> None:
+        """Renew leases in the background every LEASE_RENEW_MS while this folder is open."""
+        if leases is not self.leases:
+            return
+        self.scheduler.submit(leases.renew, priority=PRIORITY_BACKGROUND, callback=self._leases_renewed)
+        self.root.after(LEASE_RENEW_MS, self.poll_leases, leases)
+
+    def _leases_renewed(self, task) -> None:
+        if task.exception() is not None:
+            logging.warning(f"Could not renew leases: {task.exception()}")
+        elif task.result() and self.leases is not None:
+            if self._drop_chunks(task.result()):
+                self.display_current_image()
+            else:
+                self._update_status_bar()
+
+    def _decided(self, filename: str) -> None:
+        """Mark a chunk done once its last image has a decision."""
+        if self.leases is not None:
+            chunk = self.leases.decided(filename)
+            if chunk is not None:
+                self.scheduler.submit(self.leases.finish, chunk, priority=PRIORITY_MOVE)
+
+    def release_leases(self) -> None:
+        """Give unfinished chunks back to the other operators."""
+        if self.leases is not None:
+            try:
+                self.leases.release()
+            except OSError as e:
+                logging.warning(f"Could not release leases: {e}")
+        self.leases = None
+        self.lease_task = None
+
+    def _clear_image(self) -> None:
+        self.current_image = None
+        self.image_label.configure(image='')
+        self.image_label.image = None
+
+    def _show_waiting_status(self) -> None:
+        """In watch mode, wait for new files instead of finishing."""
+        self._clear_image()
+        self.status_var.set(f"All {len(self.image_files)} images sorted, waiting for new files in {self.directory}")
+
     def display_current_image(self) -> None:
         """Display the current image and update status."""
         if not hasattr(self, 'status_var') or not self.status_var:
@@ -213,10 +522,18 @@ class ImageSorter:
             self.current_index = 0
             
         if self._all_images_processed():
-            self._show_completion_status()
+            # Leasing more shows them once they are in
+            if not self._lease_more():
+                if self.watch is not None:
+                    self._show_waiting_status()
+                else:
+                    self._show_completion_status()
             return
             
         self._skip_processed_images()
+        if not self._start_chunk():
+            self.display_current_image()
+            return
         self._load_and_display_current_image()
         self._update_status_bar()
 
@@ -249,6 +566,9 @@ class ImageSorter:
 
     def reset_and_restart(self):
         """Reset the application state and start over with a new folder."""
+        self.stop_watch()
+        self.release_leases()
+        self._drop_ahead()
         # Clear all state
         self.stats = {STATUS_KEPT: 0, STATUS_DELETED: 0}
         self.current_index = 0
@@ -271,23 +591,94 @@ class ImageSorter:
             self.current_index = (self.current_index + 1) % len(self.image_files)
 
     def _load_and_display_current_image(self) -> None:
-        """Load and display the current image."""
+        """Load and display the current image, holding back background work meanwhile."""
         filename = self.image_files[self.current_index]
-        filepath = os.path.join(self.directory, filename)
-        self.current_image = self.processor.load_image(filepath)
-        self.resize_image()
+        ahead, self.ahead = self.ahead, None
+        with self.scheduler.interactive():
+            with self.metrics.stage('decode'):
+                prepared = (self._take_ahead(ahead, filename)
+                            or (self.processor.load_image(self.processor.local_path(filename)), None, None))
+                self.current_image = prepared[0]
+            self.resize_image(*prepared[1:])
+        self.metrics.bytes_read += ImageProcessor.bytes_read - self.bytes_seen
+        self.bytes_seen = ImageProcessor.bytes_read
+        self.processor.prefetch(self._upcoming_files())
+        self._decode_ahead()
+
+    def _take_ahead(self, task, filename: str) -> tuple | None:
+        """
+        The decode-ahead's (image, display image, PhotoImage) if it was for
+        filename, waiting for it if it is under way; None if the image has
+        to be decoded here.
+        """
+        photo, self.ahead_photo = self.ahead_photo, None
+        if task is None:
+            return None
+        # Stale, or still waiting for a worker: decoding here is quicker than waiting in line
+        if task.args[0] != filename or task.cancel():
+            task.cancel()
+            return None
+        image, display_image = task.result()
+        if image is None:
+            return None
+        if task.args[1] != self._display_size():
+            return image, None, None
+        return image, display_image, photo
+
+    def _decode_ahead(self) -> None:
+        """Decode and scale the next undecided image in the background."""
+        upcoming = self._upcoming_files()
+        if upcoming:
+            self.ahead = self.scheduler.submit(self._prepare_image, upcoming[0], self._display_size(),
+                                              priority=PRIORITY_LOOKAHEAD, key='decode-ahead',
+                                              callback=self._ahead_ready)
+
+    def _prepare_image(self, filename: str, size: tuple[int, int]) -> tuple:
+        """Runs on a worker thread; Tk objects are made in _ahead_ready()."""
+        image = self.processor.load_image(self.processor.local_path(filename))
+        return image, image and self.processor.fit_image(image, size)
+
+    def _ahead_ready(self, task) -> None:
+        """On the Tk thread once the next image is decoded: make its PhotoImage too."""
+        if task is self.ahead and task.exception() is None and task.result()[1] is not None:
+            self.ahead_photo = ImageTk.PhotoImage(task.result()[1])
+
+    def _drop_ahead(self) -> None:
+        if self.ahead is not None:
+            self.ahead.cancel()
+        self.ahead = None
+        self.ahead_photo = None
+
+    def poll_scheduler(self) -> None:
+        """Run callbacks of finished background work on the Tk thread."""
+        self.scheduler.poll()
+        self.root.after(SCHEDULER_POLL_MS, self.poll_scheduler)
+
+    def _upcoming_files(self) -> list[str]:
+        """The next undecided files after the current one."""
+        upcoming = []
+        for filename in self.image_files[self.current_index + 1:]:
+            if len(upcoming) == self.processor.lookahead:
+                break
+            if self.image_status.get(filename) not in [STATUS_DELETED, STATUS_KEPT]:
+                upcoming.append(filename)
+        return upcoming
 
     def _update_status_bar(self) -> None:
         """Update the status bar with current progress."""
         total_images = len(self.image_files)
         current_position = self.current_index + 1
         filename = self.image_files[self.current_index]
-        self.status_var.set(f"Image {current_position} of {total_images}: {filename}")
+        filter_expr = self.filter_var.get().strip()
+        if filter_expr:
+            status = f"Image {current_position} of {total_images} [{filter_expr}]: {filename}"
+        else:
+            status = f"Image {current_position} of {total_images}: {filename}"
+        if self.leases is not None and filename in self.leases.chunk_of:
+            status += f" (shared, chunk {self.leases.chunk_of[filename] + 1} of {len(self.leases.chunks)})"
+        self.status_var.set(status)
         
-    def resize_image(self):
-        if not self.current_image:
-            return
-            
+    def _display_size(self) -> tuple[int, int]:
         # Get current window size
         window_width = self.root.winfo_width() - 40  # Account for padding
         window_height = self.root.winfo_height() - 100  # Account for controls and padding
@@ -295,18 +686,26 @@ class ImageSorter:
         if window_width <= 1 or window_height <= 1:  # Window not properly initialized yet
             window_width = 800
             window_height = 500
+        return window_width, window_height
+
+    def resize_image(self, resized_image=None, photo=None):
+        """Show the current image scaled to the window; the decode-ahead may have done either step already."""
+        if not self.current_image:
+            return
             
-        # Calculate resize dimensions maintaining aspect ratio
-        display_size = (window_width, window_height)
-        
-        # Create a copy of the original image for resizing
-        resized_image = self.current_image.copy()
-        resized_image.thumbnail(display_size, Image.Resampling.LANCZOS)
-        
-        # Convert to PhotoImage
-        photo = ImageTk.PhotoImage(resized_image)
+        if photo is None:
+            if resized_image is None:
+                # Scale a display version straight from the original
+                with self.metrics.stage('resize'):
+                    resized_image = self.processor.fit_image(self.current_image, self._display_size())
+            
+            # Convert to PhotoImage
+            with self.metrics.stage('photo'):
+                photo = ImageTk.PhotoImage(resized_image)
         self.image_label.configure(image=photo)
         self.image_label.image = photo  # Keep a reference
+        self.metrics.paint_started()
+        self.root.after_idle(self._painted)
         
     def center_image_container(self):
         # Update the size of the canvas window to encompass the inner frame
@@ -320,8 +719,9 @@ class ImageSorter:
     def on_resize(self, event):
         # Only handle main window resize events
         if event.widget == self.root:
-            self.resize_image()
-            self.center_image_container()
+            with span('on_resize', 'tk'):
+                self.resize_image()
+                self.center_image_container()
         
     def delete_image(self):
         if not self.image_files or self.current_index >= len(self.image_files):
@@ -331,7 +731,14 @@ class ImageSorter:
         if self.image_status.get(current_file) in ['deleted', 'kept']:
             return
             
-        self.processor.move_to_delete(current_file)
+        with self.metrics.stage('move'):
+            recorded = self.decisions.record(current_file, ACTION_DELETE)
+        if not recorded:
+            self.status_var.set(f"Could not delete {current_file}")
+            return
+        self.metrics.decision()
+        self.scheduler.submit(self.processor.evict, current_file, priority=PRIORITY_MOVE)
+        self._decided(current_file)
         self.history.append((current_file, "delete"))
         self.stats["deleted"] += 1
         self.image_status[current_file] = 'deleted'
@@ -350,7 +757,14 @@ class ImageSorter:
         if self.image_status.get(current_file) in ['deleted', 'kept']:
             return
             
-        self.processor.move_to_keep(current_file)
+        with self.metrics.stage('move'):
+            recorded = self.decisions.record(current_file, ACTION_KEEP)
+        if not recorded:
+            self.status_var.set(f"Could not keep {current_file}")
+            return
+        self.metrics.decision()
+        self.scheduler.submit(self.processor.evict, current_file, priority=PRIORITY_MOVE)
+        self._decided(current_file)
         self.history.append((current_file, "keep"))
         self.stats["kept"] += 1
         self.image_status[current_file] = 'kept'
@@ -391,15 +805,15 @@ class ImageSorter:
             return
             
         filename, action = self.history.pop()
-        
+        if not self.decisions.revert(filename, action):
+            self.status_var.set(f"Could not undo {action} of {filename}")
+            return
+        if self.leases is not None:
+            self.leases.undone(filename)
+
         if action == "delete":
-            # Move file back from delete folder
-            self.processor.restore_from_delete(filename)
             self.stats["deleted"] -= 1
-            
         elif action == "keep":
-            # Move file back from keep folder
-            self.processor.restore_from_keep(filename)
             self.stats["kept"] -= 1
             
         # Remove the status for this file, so it can be processed again
@@ -416,12 +830,26 @@ class ImageSorter:
         self.display_current_image()
 
 
-def main():
+def main(directory: str | None = None, filter_expr: str | None = None, decisions: str | None = None,
+         watch: bool = False, stage: bool | None = None, stats_path: str | None = None,
+         record_path: str | None = None, share: bool = False):
     root = tk.Tk()
     root.geometry(INITIAL_WINDOW_SIZE)
-    app = ImageSorter(root)
+    app = ImageSorter(root, filter_expr=filter_expr, directory=directory, decisions=decisions, watch=watch,
+                      stage=stage, stats_path=stats_path, record_path=record_path, share=share)
     root.mainloop()
+    app.stop_watch()
+    app.scheduler.shutdown()
+    app.release_leases()
+    if app.processor is not None:
+        app.processor.close()
+    if app.decisions is not None:
+        app.decisions.close()
+    if app.stats_path:
+        app.metrics.export(app.stats_path)
+    if app.recorder is not None:
+        app.recorder.save()
 
 
 if __name__ == "__main__":
-    main()
+    main(get_cli_path())
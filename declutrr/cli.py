@@ -0,0 +1,391 @@
+"""
+Command line entry point.
+
+Only argparse and the standard library are imported up front; each
+subcommand imports what it needs (PIL, numpy, tkinter, cv2, ultralytics)
+when it runs, so --help and headless runs start quickly and work without
+a display.
+"""
+import os
+import sys
+import logging
+import argparse
+import contextlib
+import importlib.util
+
+from declutrr.constants import *
+from declutrr.utils import setup_logging, stop_logging, log_summary, get_directory
+
+
+def resolve_directory(args: argparse.Namespace) -> str | None:
+    """Directory from the command line, or a folder dialog if a display is available."""
+    directory = get_directory(args.directory, use_argv=False)
+    if not directory:
+        logging.error("No directory selected. Exiting.")
+        return None
+    logging.info(f"Processing directory: {directory}")
+    return directory
+
+
+def progress_bar(desc: str):
+    """tqdm progress bar if installed, otherwise a context yielding None."""
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        return contextlib.nullcontext()
+    return tqdm(desc=desc, unit="file")
+
+
+def run_pipeline(directory: str, analyzers: list, actions: list = (), desc: str = "Processing") -> dict | None:
+    """Run analyzers over directory; returns the pipeline stats, or None if it has no images."""
+    from declutrr.pipeline import Pipeline
+
+    with progress_bar(desc) as pbar:
+        pipeline = Pipeline(directory, analyzers, actions,
+                            progress=pbar.update if pbar is not None else None)
+        total = len(pipeline.list_files())
+        if not total:
+            logging.warning("No valid image files found in the directory")
+            return None
+        if pbar is not None:
+            pbar.total = total
+        logging.info(f"Found {total} images to process")
+        stats = pipeline.run()
+
+    log_summary("Processing", stats)
+    return stats
+
+
+def blur_analyzer(workers: int | None = None):
+    # Laplacian variance is CPU-bound, so it runs in worker processes
+    # that read frames from shared memory
+    from declutrr.shm import ProcessAnalyzer
+    from declutrr.analyzers import laplacian_variance
+    return ProcessAnalyzer('blur', laplacian_variance, workers=workers)
+
+
+def tag_analyzer(batch_size: int = TAG_BATCH_SIZE, required: bool = True):
+    """
+    YOLO tag analyzer, served by the inference daemon if it's running,
+    otherwise loaded in process on first use. Returns None if neither is
+    available and required is False.
+    """
+    from declutrr.analyzers import TagAnalyzer
+    from declutrr.inference import get_predictor, is_running
+
+    if not required and not is_running() and importlib.util.find_spec('ultralytics') is None:
+        logging.warning("ultralytics not installed, skipping tagging")
+        return None
+    return TagAnalyzer(get_predictor(TAG_CLS_MODEL), get_predictor(TAG_DET_MODEL), batch_size=batch_size)
+
+
+def cmd_gui(args: argparse.Namespace) -> int:
+    from declutrr.app import main as gui_main
+    gui_main(args.directory, filter_expr=args.filter, decisions=args.decisions, watch=args.watch,
+             stage=args.stage, stats_path=args.stats_json, record_path=args.record, share=args.share)
+    return 0
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    from declutrr.web import serve
+
+    directory = get_directory(args.directory, use_argv=False) if args.directory else None
+    if not directory:
+        logging.error("No directory given. Exiting.")
+        return 1
+    if args.host not in ('127.0.0.1', 'localhost', '::1'):
+        logging.warning(f"Listening on {args.host}: anyone who can reach it can sort and delete photos")
+    return serve(directory, args.host, args.port, filter_expr=args.filter, decisions=args.decisions,
+                 share=args.share)
+
+
+def cmd_scan(args: argparse.Namespace) -> int:
+    """Run every analyzer in one pass, storing results without moving files."""
+    from declutrr.analyzers import ScreenshotAnalyzer, HashAnalyzer
+
+    directory = resolve_directory(args)
+    if not directory:
+        return 1
+    analyzers = [blur_analyzer(args.workers), ScreenshotAnalyzer(), HashAnalyzer()]
+    if not args.no_tags:
+        analyzer = tag_analyzer(required=False)
+        if analyzer is not None:
+            analyzers.append(analyzer)
+    run_pipeline(directory, analyzers, desc="Analyzing")
+    return 0
+
+
+def cmd_blur(args: argparse.Namespace) -> int:
+    from declutrr.pipeline import MoveAction
+
+    directory = resolve_directory(args)
+    if not directory:
+        return 1
+    threshold = args.threshold
+    actions = []
+    if not args.no_move:
+        actions.append(MoveAction(directory, 'blurry', lambda results: results['blur'] < threshold))
+    stats = run_pipeline(directory, [blur_analyzer(args.workers)], actions)
+    if stats and not args.no_move:
+        logging.info(f"Blurry images moved: {stats['blurry']}")
+    return 0
+
+
+def cmd_screenshots(args: argparse.Namespace) -> int:
+    from declutrr.pipeline import MoveAction
+    from declutrr.analyzers import ScreenshotAnalyzer, ScreenContentAnalyzer, is_likely_screenshot
+
+    directory = resolve_directory(args)
+    if not directory:
+        return 1
+    analyzers = [ScreenshotAnalyzer()]
+    if not args.header_only:
+        from declutrr.inference import get_predictor
+        detector = None if args.no_yolo else get_predictor(SCREEN_DETECTION_MODEL)
+        analyzers.append(ScreenContentAnalyzer(detector))
+    actions = []
+    if not args.no_move:
+        actions.append(MoveAction(directory, 'screenshots', is_likely_screenshot))
+    stats = run_pipeline(directory, analyzers, actions)
+    if stats and not args.no_move:
+        logging.info(f"Screenshots detected and moved: {stats['screenshots']}")
+    return 0
+
+
+def cmd_tag(args: argparse.Namespace) -> int:
+    directory = resolve_directory(args)
+    if not directory:
+        return 1
+
+    if args.find:
+        from declutrr.query import select_files
+        for name in select_files(directory, args.find):
+            print(name)
+        return 0
+
+    from declutrr.pipeline import MirrorAction
+    from declutrr.tag_mirror import get_tag_mirror
+
+    # Tags live in the store; the mirror copies them where other tools look
+    actions = [] if args.mirror == 'none' else [MirrorAction(get_tag_mirror(args.mirror))]
+    stats = run_pipeline(directory, [tag_analyzer(args.batch_size)], actions, desc="Tagging")
+    if stats and actions:
+        logging.info(f"Successfully tagged: {stats['tagged']}")
+    return 0
+
+
+def cmd_dedupe(args: argparse.Namespace) -> int:
+    from declutrr.analyzers import HashAnalyzer
+    from declutrr.dedupe import find_duplicates
+
+    directory = resolve_directory(args)
+    if not directory:
+        return 1
+
+    # Collect hashes of the files present now, fresh or stored
+    hashes = {}
+
+    def collect(frame, results):
+        if results.get('dhash') is not None:
+            hashes[frame.name] = results['dhash']
+        return False
+    collect.name = 'hashed'
+
+    if run_pipeline(directory, [HashAnalyzer()], [collect], desc="Hashing") is None:
+        return 0
+    groups = find_duplicates(hashes, args.distance)
+    logging.info(f"Found {len(groups)} groups of near-duplicates")
+
+    if args.move:
+        from declutrr.image_processor import ImageProcessor
+        dest_dir = os.path.join(directory, 'duplicates')
+        os.makedirs(dest_dir, exist_ok=True)
+    for group in groups:
+        print("\t".join(group))
+        if args.move:
+            # Keep the largest file of each group, which is usually the original
+            keep = max(group, key=lambda name: os.path.getsize(os.path.join(directory, name)))
+            for name in group:
+                if name != keep:
+                    ImageProcessor.move_file(name, directory, dest_dir)
+    return 0
+
+
+def cmd_apply(args: argparse.Namespace) -> int:
+    from declutrr.manifest import read_manifest, apply_manifest, undo_last_apply
+
+    if args.undo:
+        directory = args.directory or os.getcwd()
+        stats = undo_last_apply(directory)
+        log_summary("Undo", stats)
+        return 0
+    if not args.manifest:
+        logging.error("No manifest given. Exiting.")
+        return 1
+
+    # Manifest entries are relative to the folder the manifest sits in, unless given
+    directory = args.directory or os.path.dirname(os.path.abspath(args.manifest))
+    if not os.path.isdir(directory):
+        logging.error(f"Invalid directory path: {directory}")
+        return 1
+    try:
+        entries = read_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        logging.error(f"Cannot read manifest: {e}")
+        return 1
+
+    logging.info(f"Applying {len(entries)} decisions to {directory}" + (" (dry run)" if args.dry_run else ""))
+    stats = apply_manifest(directory, entries, dry_run=args.dry_run, workers=args.workers,
+                           backend=args.decisions)
+    log_summary("Apply", stats)
+    return 1 if stats['failed'] else 0
+
+
+# Kept here rather than imported from declutrr.decisions, which loads PIL
+DECISION_BACKEND_NAMES = ('subfolder', 'prefix', 'xattr', 'xmp', 'manifest')
+DECISIONS_HELP = ("how keep/delete decisions are recorded: keep/ and delete/ subfolders, G_ prefix, "
+                  "extended attribute, XMP sidecar, or a manifest without touching the files "
+                  f"(default: $DECLUTRR_DECISIONS or {DEFAULT_DECISION_BACKEND})")
+
+
+def cmd_organize(args: argparse.Namespace) -> int:
+    from declutrr.organizer import organize, undo_last_organize
+
+    directory = resolve_directory(args)
+    if not directory:
+        return 1
+    if args.undo:
+        stats = undo_last_organize(directory)
+        log_summary("Undo", stats)
+        return 0
+
+    with progress_bar("Reading dates") as pbar:
+        stats = organize(directory, rename=not args.no_rename, bucket=not args.no_buckets,
+                         dry_run=args.dry_run, workers=args.workers,
+                         progress=pbar.update if pbar is not None else None)
+    log_summary("Organize", stats)
+    return 1 if stats['failed'] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='declutrr', description="Sort, analyze and organize photo folders")
+    subparsers = parser.add_subparsers(dest='command', metavar='command')
+
+    # Every command can be traced, so UI and workers show up in one timeline
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--profile', metavar='TRACE_JSON',
+                        help="write a Chrome/Perfetto trace-event file of the run")
+    common.add_argument('--cprofile', metavar='DIR', help="with --profile, also write a cProfile dump per span")
+    common.add_argument('--log-level', type=str.upper, choices=LOG_LEVELS,
+                        help=f"lowest level logged (default: $DECLUTRR_LOG_LEVEL or {LOG_LEVEL})")
+    common.add_argument('--log-sample', type=int, default=LOG_SAMPLE_EVERY, metavar='N',
+                        help=f"log 1 in N per-file messages of each kind, 1 for all (default: {LOG_SAMPLE_EVERY})")
+
+    def add(name, handler, help):
+        subparser = subparsers.add_parser(name, help=help, description=help, parents=[common])
+        subparser.add_argument('directory', nargs='?',
+                               help="folder of images (default: ask with a folder dialog)")
+        subparser.set_defaults(handler=handler)
+        return subparser
+
+    gui = add('gui', cmd_gui, "Sort images into keep/delete in the GUI")
+    gui.add_argument('--filter', help="only show matching images, e.g. 'blur < 90'")
+    gui.add_argument('--decisions', choices=DECISION_BACKEND_NAMES, help=DECISIONS_HELP)
+    gui.add_argument('--watch', action='store_true', help="keep adding new images as they arrive in the folder")
+    gui.add_argument('--stage', action=argparse.BooleanOptionalAction, default=None,
+                     help="copy upcoming images to a local cache first (default: on for network mounts)")
+    gui.add_argument('--share', action='store_true',
+                     help="sort the folder together with others running --share on it, each seeing different images")
+    gui.add_argument('--stats-json', metavar='PATH', help="write latency stats to PATH when quitting")
+    gui.add_argument('--record', metavar='PATH',
+                     help="write the keypresses and their timing to PATH when quitting, for benchmarks/replay.py")
+
+    serve = add('serve', cmd_serve, "Sort images in a browser, e.g. through an SSH tunnel to the NAS")
+    serve.add_argument('--host', default=WEB_HOST, help=f"address to listen on (default: {WEB_HOST})")
+    serve.add_argument('--port', type=int, default=WEB_PORT, help=f"(default: {WEB_PORT})")
+    serve.add_argument('--filter', help="only show matching images, e.g. 'blur < 90'")
+    serve.add_argument('--decisions', choices=DECISION_BACKEND_NAMES, help=DECISIONS_HELP)
+    serve.add_argument('--share', action='store_true', help="sort the folder together with other --share sessions")
+
+    scan = add('scan', cmd_scan, "Analyze blur, screenshots, hashes and tags without moving files")
+    scan.add_argument('--no-tags', action='store_true', help="skip YOLO tagging")
+    scan.add_argument('--workers', type=int, help="blur worker processes (default: CPU count)")
+
+    blur = add('blur', cmd_blur, "Move blurry images to blurry/")
+    blur.add_argument('--threshold', type=float, default=BLUR_THRESHOLD,
+                      help=f"Laplacian variance below which an image is blurry (default: {BLUR_THRESHOLD})")
+    blur.add_argument('--no-move', action='store_true', help="only store scores")
+    blur.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+
+    screenshots = add('screenshots', cmd_screenshots, "Move screenshots to screenshots/")
+    screenshots.add_argument('--header-only', action='store_true',
+                             help="use file header rules only, without decoding pixels")
+    screenshots.add_argument('--no-yolo', action='store_true', help="skip the YOLO screen detector")
+    screenshots.add_argument('--no-move', action='store_true', help="only store scores")
+
+    tag = add('tag', cmd_tag, "Tag images with YOLO and mirror the tags onto the files")
+    tag.add_argument('--mirror', choices=['xattr', 'finder', 'xmp', 'none'],
+                     default=os.environ.get('DECLUTRR_TAG_MIRROR'),
+                     help="where to copy tags (default: Finder tags on macOS, xattrs elsewhere)")
+    tag.add_argument('--batch-size', type=int, default=TAG_BATCH_SIZE)
+    tag.add_argument('--find', metavar='FILTER',
+                     help="list stored matches instead of tagging, e.g. 'tag:dog and blur > 200'")
+
+    dedupe = add('dedupe', cmd_dedupe, "Find near-duplicate images")
+    dedupe.add_argument('--distance', type=int, default=DEDUPE_MAX_DISTANCE,
+                        help=f"maximum differing hash bits (default: {DEDUPE_MAX_DISTANCE})")
+    dedupe.add_argument('--move', action='store_true',
+                        help="keep the largest file of each group, move the rest to duplicates/")
+
+    organize = add('organize', cmd_organize, "Rename images by capture date and sort them into YYYYMM folders")
+    organize.add_argument('--no-rename', action='store_true', help="keep file names, only sort into folders")
+    organize.add_argument('--no-buckets', action='store_true', help="only rename, in place")
+    organize.add_argument('--dry-run', action='store_true', help="only report what would be moved")
+    organize.add_argument('--workers', type=int,
+                          help=f"concurrent renames (default: adapt between 1 and {ORGANIZE_MAX_WORKERS})")
+    organize.add_argument('--undo', action='store_true', help="revert the last organize run in the folder")
+
+    apply = subparsers.add_parser('apply', help="Apply keep/delete/skip decisions from a manifest",
+                                  description="Apply keep/delete/skip decisions from a CSV, JSON or NDJSON manifest",
+                                  parents=[common])
+    apply.add_argument('manifest', nargs='?', help="manifest of file, decision rows")
+    apply.add_argument('-d', '--directory', help="folder the files are in (default: the manifest's folder)")
+    apply.add_argument('--dry-run', action='store_true', help="only report what would be moved")
+    apply.add_argument('--workers', type=int,
+                       help=f"concurrent moves (default: adapt between 1 and {MANIFEST_MAX_WORKERS})")
+    apply.add_argument('--decisions', choices=DECISION_BACKEND_NAMES, help=DECISIONS_HELP)
+    apply.add_argument('--undo', action='store_true', help="revert the last apply run in the folder")
+    apply.set_defaults(handler=cmd_apply)
+    return parser
+
+
+COMMANDS = ('gui', 'serve', 'scan', 'blur', 'screenshots', 'tag', 'dedupe', 'organize', 'apply')
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # Plain `declutrr` and `declutrr <folder>` keep opening the GUI
+    if not argv or (argv[0] not in COMMANDS and not argv[0].startswith('-')):
+        argv.insert(0, 'gui')
+    args = build_parser().parse_args(argv)
+
+    if args.command != 'gui':
+        setup_logging(args.command, args.log_level, args.log_sample)
+    if args.profile:
+        from declutrr.tracing import start_tracing
+        start_tracing(args.profile, args.cprofile)
+    try:
+        return args.handler(args)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {str(e)}")
+        return 1
+    finally:
+        if args.profile:
+            from declutrr.tracing import stop_tracing
+            stop_tracing()
+        if args.command != 'gui':
+            stop_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Photos made of several files.
+
+Cameras shooting RAW+JPEG write IMG_0001.CR2 and IMG_0001.JPG, and editors
+keep their metadata in IMG_0001.xmp next to them. Such files are one photo:
+listings show it once, by the file that decodes fastest (the JPEG, else the
+RAW's embedded preview), and its companions are moved, renamed and restored
+along with it, so a pair never ends up split between keep and delete.
+"""
+import os
+import stat
+
+from declutrr.constants import *
+
+COMPANION_EXTENSIONS = VALID_IMAGE_EXTENSIONS + SIDECAR_EXTENSIONS
+
+
+def photo_key(filename: str) -> str:
+    """What the files of one photo have in common: their name without extension."""
+    return os.path.splitext(filename)[0].lower()
+
+
+def display_rank(filename: str) -> int:
+    """Lower is preferred for showing a photo."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in DISPLAY_EXTENSIONS:
+        return 0
+    if extension in HEIF_EXTENSIONS:
+        return 1
+    return 2
+
+
+def group_photos(filenames: list[str]) -> dict[str, list[str]]:
+    """{shown file: its companion images} for the image files among filenames, in their order."""
+    groups = {}
+    for name in filenames:
+        if name.lower().endswith(VALID_IMAGE_EXTENSIONS):
+            groups.setdefault(photo_key(name), []).append(name)
+    photos = {}
+    for files in groups.values():
+        files.sort(key=lambda name: (display_rank(name), name))
+        photos[files[0]] = files[1:]
+    return photos
+
+
+def photo_names(filenames: list[str]) -> list[str]:
+    """filenames with every photo listed once, by the file it is shown by."""
+    photos = group_photos(filenames)
+    return [name for name in filenames if name in photos]
+
+
+def companions(filepath: str) -> list[str]:
+    """
+    Names of the other files of the photo at filepath: its RAW or JPEG twin
+    and sidecars. Only the likely names are looked up, so this stays cheap
+    in folders of thousands of files.
+    """
+    stem = os.path.splitext(filepath)[0]
+    try:
+        own = os.stat(filepath)
+        seen = {(own.st_dev, own.st_ino)}
+    except OSError:
+        seen = set()
+    found = []
+    for extension in COMPANION_EXTENSIONS:
+        for candidate in dict.fromkeys((extension, extension.upper())):
+            try:
+                st = os.stat(stem + candidate)
+            except OSError:
+                continue
+            # Case-insensitive file systems find the same file under both spellings
+            if (st.st_dev, st.st_ino) in seen or not stat.S_ISREG(st.st_mode):
+                continue
+            seen.add((st.st_dev, st.st_ino))
+            found.append(os.path.basename(stem + candidate))
+    return found
+
+
+def companion_name(companion: str, old_name: str, new_name: str) -> str:
+    """companion's name after its photo is renamed from old_name to new_name."""
+    return os.path.splitext(new_name)[0] + companion[len(os.path.splitext(old_name)[0]):]
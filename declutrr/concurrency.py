@@ -0,0 +1,145 @@
+"""
+Self-tuning concurrency for I/O-bound worker pools.
+
+How many reads or renames are worth running at once depends on the disk:
+a local NVMe drive keeps getting faster up to dozens, a card reader or an
+SMB share stops gaining after a few and only queues up more. Pools limit
+how many tasks run at once and adjust the limit with AIMD: after every
+window of tasks the limit goes up by one, unless tasks got slower (mean
+latency above AIMD_LATENCY_TOLERANCE times the best window so far) without
+finishing faster overall, in which case it is halved.
+
+A pool's size can be fixed with an explicit worker count or an environment
+variable, e.g. DECLUTRR_WORKERS_DECODE=2. The limit is logged when a pool
+finishes and shows up as a counter track in --profile traces.
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from declutrr.constants import *
+from declutrr.tracing import counter
+
+
+def fixed_workers(name: str, workers: int | None = None) -> int | None:
+    """The manual override for pool name: workers if given, else DECLUTRR_WORKERS_<NAME>, else None."""
+    if workers is not None:
+        return max(1, workers)
+    value = os.environ.get(WORKERS_ENV_PREFIX + name.upper().replace('-', '_'))
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            logging.warning(f"Ignoring {WORKERS_ENV_PREFIX}{name.upper()}={value}: not a number")
+    return None
+
+
+class ConcurrencyLimiter:
+    """
+    Lets at most limit tasks run at once (slot()) and adapts limit between
+    minimum and maximum from the latency and throughput of finished tasks.
+    """
+    def __init__(self, name: str, maximum: int, workers: int | None = None, minimum: int = 1,
+                 initial: int = AIMD_INITIAL_WORKERS, window: int = AIMD_WINDOW_TASKS):
+        self.name = name
+        fixed = fixed_workers(name, workers)
+        self.adaptive = fixed is None
+        self.minimum = minimum if self.adaptive else fixed
+        self.maximum = max(maximum, minimum) if self.adaptive else fixed
+        self.limit = min(max(initial, self.minimum), self.maximum) if self.adaptive else fixed
+        self.window = window
+        self.active = 0
+        self.condition = threading.Condition()
+        self.best_latency = None
+        self.throughput = None
+        self.history = []  # (seconds since start, limit, tasks/s, mean latency) per window
+        self.started = time.perf_counter()
+        self._reset_window()
+        counter(f"{name} workers", limit=self.limit)
+
+    def _reset_window(self) -> None:
+        self.window_start = time.perf_counter()
+        self.window_done = 0
+        self.window_latency = 0.0
+        # Only a window with the limit reached says anything about more concurrency
+        self.saturated = self.active >= self.limit
+
+    @contextmanager
+    def slot(self):
+        """Wait for a free slot and hold it while the block runs, timing it."""
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.active += 1
+            if self.active >= self.limit:
+                self.saturated = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            latency = time.perf_counter() - start
+            with self.condition:
+                self.active -= 1
+                self._finished(latency)
+                self.condition.notify_all()
+
+    def run(self, function: Callable, *args, **kwargs):
+        with self.slot():
+            return function(*args, **kwargs)
+
+    def _finished(self, latency: float) -> None:
+        if not self.adaptive:
+            return
+        self.window_done += 1
+        self.window_latency += latency
+        if self.window_done < max(self.window, 2 * self.limit):
+            return
+        elapsed = time.perf_counter() - self.window_start
+        throughput = self.window_done / elapsed if elapsed > 0 else float('inf')
+        mean_latency = self.window_latency / self.window_done
+        if self.saturated:
+            self._adjust(throughput, mean_latency)
+        self.history.append((round(time.perf_counter() - self.started, 3), self.limit,
+                             round(throughput, 1), round(mean_latency, 5)))
+        self._reset_window()
+
+    def _adjust(self, throughput: float, latency: float) -> None:
+        """Additive increase, multiplicative decrease; the caller holds the lock."""
+        if self.best_latency is None or latency < self.best_latency:
+            self.best_latency = latency
+        previous, self.throughput = self.throughput, throughput
+        slower = latency > self.best_latency * AIMD_LATENCY_TOLERANCE
+        gained = previous is None or throughput > previous * (1 + AIMD_MIN_GAIN)
+        if slower and not gained:
+            limit = max(self.minimum, int(self.limit * AIMD_DECREASE))
+        else:
+            limit = min(self.maximum, self.limit + 1)
+        if limit != self.limit:
+            logging.debug(f"{self.name} workers {self.limit} -> {limit} "
+                          f"({throughput:.1f} tasks/s, {latency * 1000:.1f} ms each)")
+            self.limit = limit
+            counter(f"{self.name} workers", limit=limit)
+
+    def report(self) -> None:
+        if self.adaptive and self.history:
+            _, _, throughput, latency = self.history[-1]
+            logging.info(f"{self.name}: ended at {self.limit} workers (of {self.minimum}-{self.maximum}), "
+                         f"{throughput} tasks/s, {latency * 1000:.1f} ms each")
+
+
+class AdaptivePool(ThreadPoolExecutor):
+    """A ThreadPoolExecutor whose tasks run at most limiter.limit at a time."""
+    def __init__(self, name: str, maximum: int, workers: int | None = None, initial: int = AIMD_INITIAL_WORKERS):
+        self.limiter = ConcurrencyLimiter(name, maximum, workers, initial=initial)
+        super().__init__(max_workers=self.limiter.maximum, thread_name_prefix=name)
+
+    def submit(self, function: Callable, /, *args, **kwargs):
+        return super().submit(self.limiter.run, function, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        super().shutdown(wait=wait, cancel_futures=cancel_futures)
+        self.limiter.report()
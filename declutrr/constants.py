@@ -1,5 +1,11 @@
-# Image file extensions
-VALID_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+from importlib.util import find_spec as _find_spec
+
+# Formats the viewers decode themselves; RAW files are shown by their embedded JPEG (see raw.py)
+DISPLAY_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+RAW_EXTENSIONS = ('.cr2', '.cr3', '.nef', '.arw', '.dng', '.orf', '.rw2', '.pef')
+HEIF_EXTENSIONS = ('.heic', '.heif')  # Only with pillow-heif installed
+HEIF_SUPPORTED = _find_spec('pillow_heif') is not None
+VALID_IMAGE_EXTENSIONS = DISPLAY_EXTENSIONS + (HEIF_EXTENSIONS if HEIF_SUPPORTED else ()) + RAW_EXTENSIONS
 
 # UI Constants
 INITIAL_WINDOW_SIZE = "900x700"
@@ -48,3 +54,158 @@ PADDING = {'padx': 5, 'pady': 5}
 STARTUP_TITLE = "Declutrr"
 COMPLETION_TITLE = "Processing Complete"
 COMPLETION_MESSAGE = "Would you like to process another folder?"
+
+# Header-only screenshot classification
+# Screen resolutions stored as (short side, long side) so orientation doesn't matter
+SCREEN_RESOLUTIONS = {
+    # iPhone
+    (640, 1136), (750, 1334), (828, 1792), (1080, 1920), (1125, 2436),
+    (1170, 2532), (1179, 2556), (1206, 2622), (1242, 2208), (1242, 2688),
+    (1284, 2778), (1290, 2796), (1320, 2868),
+    # Android
+    (720, 1280), (720, 1600), (1080, 2280), (1080, 2340), (1080, 2400),
+    (1440, 2560), (1440, 3040), (1440, 3120), (1440, 3200),
+    # Desktop and laptop
+    (768, 1366), (800, 1280), (864, 1536), (900, 1440), (1050, 1680),
+    (1080, 1920), (1200, 1920), (1440, 2560), (1600, 2560), (1800, 2880),
+    (1912, 2940), (1964, 3024), (2160, 3840), (2234, 3456),
+}
+SCREENSHOT_SOFTWARE = (
+    'screenshot', 'snipping', 'flameshot', 'spectacle', 'greenshot',
+    'sharex', 'shutter', 'ksnip',
+)
+SCREENSHOT_SCORE_THRESHOLD = 4
+
+# Per-folder analysis store
+STORE_FILENAME = '.declutrr.db'
+
+# Auto tagging
+TAG_BATCH_SIZE = 16
+TAG_DECODE_SIZE = 640  # Models run at 640px, so decode no larger than that
+TAG_MAX_TAGS = 10
+
+# Triage filters; presets expand to filter expressions
+FILTER_PRESETS = {
+    'screenshots': f'screenshot >= {SCREENSHOT_SCORE_THRESHOLD}',
+    'blurry': 'blur < 90',
+}
+
+# Analysis pipeline
+ANALYSIS_SIZE = 1024  # Longest side frames are decoded at for analysis
+PIPELINE_QUEUE_SIZE = 16  # Frames per queue; bounds memory held by decoded frames
+PIPELINE_DECODE_WORKERS = 4  # Starting level; the decode pool adapts up to the maximum
+PIPELINE_DECODE_MAX_WORKERS = 16
+PIPELINE_COMMIT_EVERY = 100
+BLUR_THRESHOLD = 90
+
+# Inference daemon
+INFERENCE_SOCKET_NAME = 'declutrr-inference.sock'
+INFERENCE_BATCH_WINDOW = 0.01  # Seconds to wait for other clients' images
+INFERENCE_MAX_BATCH = 32
+
+# Pixel-based screen detection
+SCREEN_CLASSES = ('tv', 'laptop', 'cell phone', 'monitor')
+SCREEN_DETECTION_MODEL = 'yolov8n.pt'
+
+# Tagging models
+TAG_CLS_MODEL = 'util/yolo11l-cls.pt'
+TAG_DET_MODEL = 'util/yolo11l.pt'
+
+# Duplicate detection
+DEDUPE_MAX_DISTANCE = 4  # Hamming distance between 64-bit dHashes
+
+# Manifest apply
+ACTION_SKIP = "skip"
+MANIFEST_ACTIONS = (ACTION_KEEP, ACTION_DELETE, ACTION_SKIP)
+MANIFEST_WORKERS = 16  # Concurrent moves to start with; renames mostly wait on the filesystem
+MANIFEST_MAX_WORKERS = 64
+JOURNAL_DIRNAME = '.declutrr-journal'
+
+# Decision backends
+DEFAULT_DECISION_BACKEND = 'subfolder'
+DECISIONS_MANIFEST_FILENAME = 'declutrr-decisions.ndjson'
+
+# Organizer
+ORGANIZE_PREFIX = 'IMG_'
+ORGANIZE_NAME_FORMAT = '%Y%m%d_%H%M%S'
+ORGANIZE_BUCKET_FORMAT = '%Y%m'
+ORGANIZE_WORKERS = 16
+ORGANIZE_MAX_WORKERS = 64
+
+# Watch mode
+WATCH_WAIT = 0.5  # Seconds the watcher thread blocks per poll
+WATCH_POLL_INTERVAL = 1.0  # Seconds between listings when inotify is unavailable
+WATCH_WORKERS = 4
+WATCH_UI_INTERVAL_MS = 100
+
+# Image loading
+READAHEAD_FILES = 3  # Upcoming files the kernel is asked to start reading
+BUFFER_POOL_SIZE = 2  # Read buffers kept for reuse, each as large as the largest file read
+
+# Staging cache for network mounts
+STAGING_DIRNAME = 'declutrr/staging'  # Under XDG_CACHE_HOME or ~/.cache
+STAGING_MAX_BYTES = 2 * 1024 ** 3
+STAGING_AHEAD = 8  # Upcoming files copied to the local disk
+STAGING_WORKERS = 2
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', 'afpfs', 'davfs', 'fuse.rclone')
+
+# Session latency stats
+HISTOGRAM_MIN_SECONDS = 1e-5  # Upper bound of the first bucket
+HISTOGRAM_GROWTH = 1.1  # Bucket width ratio, i.e. percentiles are within 10%
+HISTOGRAM_BUCKETS = 200  # Up to about 30 minutes
+
+# Recording and replay benchmarks
+RECORDED_ACTIONS = ('delete', 'keep', 'skip', 'undo')
+REPLAY_THINK_TIME = 0.4  # Mean seconds between keypresses in a synthetic session
+REPLAY_ACTION_WEIGHTS = {'keep': 60, 'delete': 30, 'skip': 8, 'undo': 2}
+
+# Background work scheduling, most urgent first
+PRIORITY_INTERACTIVE = 0  # The image about to be shown
+PRIORITY_MOVE = 1  # Housekeeping after a decision
+PRIORITY_LOOKAHEAD = 2  # Read-ahead, staging and decoding of upcoming images
+PRIORITY_BACKGROUND = 3  # Metadata of newly arrived files
+SCHEDULER_WORKERS = 4  # One is kept free for interactive work
+SCHEDULER_POLL_MS = 50  # How often the UI runs callbacks of finished tasks
+STAGING_CHUNK_BYTES = 1024 * 1024  # Staging copies pause between chunks for interactive work
+
+# Adaptive worker pools (AIMD on task latency and throughput)
+AIMD_INITIAL_WORKERS = 4
+AIMD_WINDOW_TASKS = 16  # Tasks finished between adjustments, at least twice the limit
+AIMD_LATENCY_TOLERANCE = 1.5  # Tasks this much slower than at best...
+AIMD_MIN_GAIN = 0.05  # ...without this much more throughput halve the limit
+AIMD_DECREASE = 0.5
+WORKERS_ENV_PREFIX = 'DECLUTRR_WORKERS_'  # e.g. DECLUTRR_WORKERS_DECODE=2 fixes that pool's size
+SCAN_MAX_WORKERS = 32  # Header reads when listing a folder
+SCAN_POOL_MIN_FILES = 64  # Smaller folders are read one file at a time
+
+# Logging of the batch commands
+LOG_DIR = 'logs'
+LOG_LEVEL = 'INFO'  # Overridden by --log-level or DECLUTRR_LOG_LEVEL
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+LOG_SAMPLE_EVERY = 100  # Per-file messages below WARNING: log 1 in N of each kind
+FILE_LOGGER = 'declutrr.files'  # Per-file messages, which are sampled
+SUMMARY_LOGGER = 'declutrr.summary'  # Run summaries, also appended to LOG_DIR/SUMMARY_LOG
+SUMMARY_LOG = 'summary.jsonl'
+
+# Shared sorting of one folder by several operators (gui --share)
+LEASE_DIRNAME = '.declutrr-leases'
+LEASE_CHUNK_SIZE = 25  # Images per lease; small chunks balance better at the end
+LEASE_SECONDS = 60  # A lease not renewed for this long is taken over
+LEASE_RENEW_MS = 15000
+LEASE_ACTIVE = 'lease'
+LEASE_AHEAD = 'next'
+LEASE_DONE = 'done'
+
+# Browser frontend (declutrr serve)
+WEB_HOST = '127.0.0.1'  # Reach it from elsewhere through an SSH tunnel
+WEB_PORT = 8765
+PREVIEW_SIZE = (1600, 1280)  # When the page doesn't say how big the window is
+PREVIEW_STEP = 160  # Window sizes are rounded up to this, so previews are shared between similar windows
+PREVIEW_MAX_SIZE = 3840
+PREVIEW_QUALITY = 82  # About 200 KB for a 12 MP photo fitted into 1600x1280
+PREVIEW_CACHE_ITEMS = 32  # Encoded previews kept in memory
+PREVIEW_MAX_AGE = 86400  # Seconds browsers may reuse a preview
+
+# RAW+JPEG pairs and sidecars, handled as one photo (see companions.py)
+SIDECAR_EXTENSIONS = ('.xmp',)
+RAW_PREVIEW_MIN_BYTES = 32 * 1024  # Smaller embedded JPEGs are thumbnails, not worth showing
@@ -0,0 +1,252 @@
+import os
+import json
+import logging
+import threading
+import xml.etree.ElementTree as ET
+
+from declutrr.constants import *
+from declutrr.image_processor import ImageProcessor
+from declutrr.file_manager import is_kept_file, mark_as_kept, unmark_as_kept
+from declutrr.tag_mirror import load_xmp_sidecar, xmp_sidecar_path
+
+DECISION_ATTR = 'user.declutrr.decision'
+
+NS_XMP = 'http://ns.adobe.com/xap/1.0/'
+NS_DECLUTRR = 'https://github.com/vmatt/declutrr/ns/1.0/'
+ET.register_namespace('xmp', NS_XMP)
+ET.register_namespace('declutrr', NS_DECLUTRR)
+
+
+class DecisionBackend:
+    """
+    Where keep/delete decisions for the files of one folder are recorded.
+
+    Files are always referred to by their original name in the folder.
+    Undecided files are listed in the folder as usual; backends that leave
+    decided files there too filter them out in undecided().
+    """
+    name = None
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def record(self, filename: str, action: str) -> bool:
+        """Record keep or delete for filename; returns False on failure."""
+        try:
+            self._record(filename, action)
+            return True
+        except Exception as e:
+            logging.warning(f"Error recording {action} for {filename} ({self.name}): {e}")
+            return False
+
+    def revert(self, filename: str, action: str) -> bool:
+        """Undo a recorded decision, leaving the file undecided; returns False on failure."""
+        try:
+            self._revert(filename, action)
+            return True
+        except Exception as e:
+            logging.warning(f"Error reverting {action} for {filename} ({self.name}): {e}")
+            return False
+
+    def decision(self, filename: str) -> str | None:
+        """ACTION_KEEP or ACTION_DELETE if a decision is recorded, otherwise None."""
+        raise NotImplementedError
+
+    def exists(self, filename: str) -> bool:
+        """Whether the file is still around, decided or not."""
+        return os.path.exists(os.path.join(self.directory, filename))
+
+    def undecided(self, filenames: list[str]) -> list[str]:
+        """Drop files that already have a decision."""
+        return [name for name in filenames if self.decision(name) is None]
+
+    def close(self) -> None:
+        """Flush anything buffered."""
+
+    def _record(self, filename: str, action: str) -> None:
+        raise NotImplementedError
+
+    def _revert(self, filename: str, action: str) -> None:
+        raise NotImplementedError
+
+
+class SubfolderBackend(DecisionBackend):
+    """Moves files into keep/ and delete/ subfolders."""
+    name = 'subfolder'
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.processor = ImageProcessor(directory, create_dirs=False)
+        self.folders = {ACTION_KEEP: self.processor.keep_dir, ACTION_DELETE: self.processor.delete_dir}
+
+    def _record(self, filename: str, action: str) -> None:
+        os.makedirs(self.folders[action], exist_ok=True)
+        ImageProcessor.move_file(filename, self.directory, self.folders[action])
+
+    def _revert(self, filename: str, action: str) -> None:
+        ImageProcessor.move_file(filename, self.folders[action], self.directory)
+
+    def decision(self, filename: str) -> str | None:
+        for action, folder in self.folders.items():
+            if os.path.exists(os.path.join(folder, filename)):
+                return action
+        return None
+
+    def exists(self, filename: str) -> bool:
+        return super().exists(filename) or self.decision(filename) is not None
+
+    def undecided(self, filenames: list[str]) -> list[str]:
+        # Decided files have left the folder, e.g. through another operator sharing it
+        return [name for name in filenames if os.path.exists(os.path.join(self.directory, name))]
+
+
+class PrefixBackend(SubfolderBackend):
+    """Renames kept files in place with a G_ prefix; deleted files go to delete/."""
+    name = 'prefix'
+
+    def _record(self, filename: str, action: str) -> None:
+        if action == ACTION_KEEP:
+            if not mark_as_kept(os.path.join(self.directory, filename)):
+                raise OSError(f"Could not rename {filename}")
+        else:
+            super()._record(filename, action)
+
+    def _revert(self, filename: str, action: str) -> None:
+        if action == ACTION_KEEP:
+            if not unmark_as_kept(os.path.join(self.directory, f"G_{filename}")):
+                raise OSError(f"Could not rename G_{filename}")
+        else:
+            super()._revert(filename, action)
+
+    def decision(self, filename: str) -> str | None:
+        if os.path.exists(os.path.join(self.directory, f"G_{filename}")):
+            return ACTION_KEEP
+        if os.path.exists(os.path.join(self.folders[ACTION_DELETE], filename)):
+            return ACTION_DELETE
+        return None
+
+    def undecided(self, filenames: list[str]) -> list[str]:
+        return [name for name in super().undecided(filenames) if not is_kept_file(name)]
+
+
+class XattrBackend(DecisionBackend):
+    """Decision in the user.declutrr.decision extended attribute; files stay put."""
+    name = 'xattr'
+
+    def _record(self, filename: str, action: str) -> None:
+        os.setxattr(os.path.join(self.directory, filename), DECISION_ATTR, action.encode('utf-8'))
+
+    def _revert(self, filename: str, action: str) -> None:
+        os.removexattr(os.path.join(self.directory, filename), DECISION_ATTR)
+
+    def decision(self, filename: str) -> str | None:
+        try:
+            value = os.getxattr(os.path.join(self.directory, filename), DECISION_ATTR).decode('utf-8')
+        except OSError:
+            return None
+        return value if value in (ACTION_KEEP, ACTION_DELETE) else None
+
+
+class XmpBackend(DecisionBackend):
+    """
+    Decision in the file's XMP sidecar; files stay put.
+
+    Deleted files are also rated -1, which Lightroom, darktable and digiKam
+    show as rejected. A rating the file had before is restored on revert.
+    """
+    name = 'xmp'
+
+    def _record(self, filename: str, action: str) -> None:
+        filepath = os.path.join(self.directory, filename)
+        tree, description = load_xmp_sidecar(filepath)
+        description.set(f'{{{NS_DECLUTRR}}}Decision', action)
+        if action == ACTION_DELETE:
+            rating = description.get(f'{{{NS_XMP}}}Rating')
+            if rating is not None:
+                description.set(f'{{{NS_DECLUTRR}}}PreviousRating', rating)
+            description.set(f'{{{NS_XMP}}}Rating', '-1')
+        tree.write(xmp_sidecar_path(filepath), encoding='utf-8', xml_declaration=True)
+
+    def _revert(self, filename: str, action: str) -> None:
+        filepath = os.path.join(self.directory, filename)
+        tree, description = load_xmp_sidecar(filepath)
+        description.attrib.pop(f'{{{NS_DECLUTRR}}}Decision', None)
+        if action == ACTION_DELETE:
+            previous = description.attrib.pop(f'{{{NS_DECLUTRR}}}PreviousRating', None)
+            if previous is not None:
+                description.set(f'{{{NS_XMP}}}Rating', previous)
+            else:
+                description.attrib.pop(f'{{{NS_XMP}}}Rating', None)
+        tree.write(xmp_sidecar_path(filepath), encoding='utf-8', xml_declaration=True)
+
+    def decision(self, filename: str) -> str | None:
+        sidecar = xmp_sidecar_path(os.path.join(self.directory, filename))
+        if not os.path.exists(sidecar):
+            return None
+        try:
+            _, description = load_xmp_sidecar(os.path.join(self.directory, filename))
+        except ET.ParseError:
+            return None
+        value = description.get(f'{{{NS_DECLUTRR}}}Decision')
+        return value if value in (ACTION_KEEP, ACTION_DELETE) else None
+
+
+class ManifestBackend(DecisionBackend):
+    """
+    Decisions appended to declutrr-decisions.ndjson; photos are never touched.
+
+    The file is a manifest for `declutrr apply`, so the moves can be made
+    later, e.g. on the machine that holds the files.
+    """
+    name = 'manifest'
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.path = os.path.join(directory, DECISIONS_MANIFEST_FILENAME)
+        self.decisions = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            from declutrr.manifest import read_manifest
+            for filename, action in read_manifest(self.path):
+                self.decisions[filename] = action
+        self.file = None
+
+    def _append(self, filename: str, action: str) -> None:
+        with self._lock:
+            if self.file is None:
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(json.dumps({'file': filename, 'decision': action}) + '\n')
+            # One line per decision; flushed so a crash loses nothing
+            self.file.flush()
+            self.decisions[filename] = action
+
+    def _record(self, filename: str, action: str) -> None:
+        self._append(filename, action)
+
+    def _revert(self, filename: str, action: str) -> None:
+        self._append(filename, ACTION_SKIP)
+
+    def decision(self, filename: str) -> str | None:
+        action = self.decisions.get(filename)
+        return action if action != ACTION_SKIP else None
+
+    def close(self) -> None:
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+DECISION_BACKENDS = {
+    backend.name: backend
+    for backend in (SubfolderBackend, PrefixBackend, XattrBackend, XmpBackend, ManifestBackend)
+}
+
+
+def get_decision_backend(directory: str, name: str | None = None) -> DecisionBackend:
+    """Return the named backend for directory, defaulting to keep/ and delete/ subfolders."""
+    name = name or os.environ.get('DECLUTRR_DECISIONS') or DEFAULT_DECISION_BACKEND
+    try:
+        return DECISION_BACKENDS[name](directory)
+    except KeyError:
+        raise ValueError(f"Unknown decision backend '{name}', expected one of {', '.join(DECISION_BACKENDS)}")
@@ -0,0 +1,44 @@
+from declutrr.constants import *
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def find_duplicates(hashes: dict[str, int], max_distance: int = DEDUPE_MAX_DISTANCE) -> list[list[str]]:
+    """
+    Group names whose 64-bit hashes differ in at most max_distance bits.
+
+    Hashes are split into max_distance + 1 chunks; two hashes within the
+    distance must agree on at least one whole chunk (pigeonhole), so only
+    names sharing a chunk are compared instead of every pair. Groups are
+    sorted, with more than one name each.
+    """
+    chunks = max_distance + 1
+    bits = 64 // chunks
+    buckets = {}
+    for name, value in hashes.items():
+        for chunk in range(chunks):
+            # The last chunk takes the leftover bits
+            width = bits if chunk < chunks - 1 else 64 - bits * chunk
+            key = (chunk, (value >> (bits * chunk)) & ((1 << width) - 1))
+            buckets.setdefault(key, []).append(name)
+
+    parent = {name: name for name in hashes}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    for names in buckets.values():
+        for i, first in enumerate(names):
+            for second in names[i + 1:]:
+                if find(first) != find(second) and hamming(hashes[first], hashes[second]) <= max_distance:
+                    parent[find(first)] = find(second)
+
+    groups = {}
+    for name in hashes:
+        groups.setdefault(find(name), []).append(name)
+    return sorted(sorted(group) for group in groups.values() if len(group) > 1)
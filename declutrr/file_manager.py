@@ -1,5 +1,8 @@
 import os
 import logging
+from typing import Callable
+
+from declutrr.companions import companions
 
 
 def is_kept_file(filepath: str) -> bool:
@@ -19,7 +22,9 @@ def mark_as_kept(filepath: str) -> bool:
         new_path = os.path.join(directory, new_name)
         
         # Use os.rename instead of shutil.move to keep it in same filesystem
+        others = companions(filepath)
         os.rename(filepath, new_path)
+        _rename_companions(directory, others, 'G_{}'.format)
 
         return True
     except Exception as e:
@@ -39,9 +44,20 @@ def unmark_as_kept(filepath: str) -> bool:
         new_path = os.path.join(directory, new_name)
         
         # Use os.rename instead of shutil.move
+        others = companions(filepath)
         os.rename(filepath, new_path)
+        _rename_companions(directory, others, lambda name: name[2:])
 
         return True
     except Exception as e:
         logging.warning(f"Error unmarking file: {e}")
         return False
+
+
+def _rename_companions(directory: str, names: list[str], rename: Callable[[str], str]) -> None:
+    """Give a photo's RAW twin and sidecars the same prefix as the photo."""
+    for name in names:
+        try:
+            os.rename(os.path.join(directory, name), os.path.join(directory, rename(name)))
+        except OSError as e:
+            logging.warning(f"Could not rename {name} along with its photo: {e}")
@@ -1,72 +1,297 @@
 from typing import Tuple, Union, List
 from os import PathLike
+from concurrent.futures import Executor, ThreadPoolExecutor
+import io
 import os
 import logging
 import shutil
+import threading
 
 from PIL import Image
 from declutrr.constants import *
 from declutrr.file_manager import is_kept_file, mark_as_kept
+from declutrr.companions import companions, photo_names
+from declutrr.raw import is_raw, read_preview, raw_capture_time, register_heif
+from declutrr.query import select_files
+from declutrr.staging import StagingCache
+from declutrr.concurrency import AdaptivePool
+from declutrr.tracing import span, traced
 
 PathType = Union[str, PathLike[str]]
 
 
+class BufferPool:
+    """
+    Reusable read buffers, so loading a 50 MB file doesn't allocate (and
+    fault in) 50 MB of fresh memory on every keypress.
+    """
+    def __init__(self, size: int = BUFFER_POOL_SIZE):
+        self.size = size
+        self.free = []
+        self.lock = threading.Lock()
+
+    def acquire(self, nbytes: int) -> bytearray:
+        with self.lock:
+            for i, buffer in enumerate(self.free):
+                if len(buffer) >= nbytes:
+                    return self.free.pop(i)
+            if self.free:
+                # Grow the largest one rather than keeping many sizes around
+                buffer = self.free.pop()
+                buffer.extend(bytes(nbytes - len(buffer)))
+                return buffer
+        return bytearray(nbytes)
+
+    def release(self, buffer: bytearray) -> None:
+        with self.lock:
+            if len(self.free) < self.size:
+                self.free.append(buffer)
+                self.free.sort(key=len)
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable file object over a memoryview, for decoding without another copy."""
+    def __init__(self, view: memoryview):
+        self.view = view
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.view[self.position:self.position + len(buffer)]
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: len(self.view)}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+
+BUFFERS = BufferPool()
+
+
+@traced('fadvise')
+def advise(filepath: str, advice: int) -> bool:
+    """posix_fadvise() on a whole file; False where it isn't available or the file is gone."""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    try:
+        fd = os.open(filepath, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def read_file(filepath: str, pool: BufferPool = BUFFERS) -> tuple[bytearray, memoryview]:
+    """
+    Read a whole file into a pooled buffer with one sequential read.
+
+    Returns the buffer, to be given back with pool.release(), and a view
+    of the bytes read.
+    """
+    with open(filepath, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        buffer = pool.acquire(size)
+        view = memoryview(buffer)
+        filled = 0
+        try:
+            while filled < size:
+                count = f.readinto(view[filled:size])
+                if not count:
+                    break
+                filled += count
+        except BaseException:
+            view.release()
+            pool.release(buffer)
+            raise
+    return buffer, view[:filled]
+
+
 class ImageProcessor:
-    def __init__(self, base_directory: str):
+    # Bytes read by load_image() in this process, for session stats
+    bytes_read = 0
+
+    def __init__(self, base_directory: str, create_dirs: bool = True, staging: StagingCache | None = None,
+                 executor: Executor | None = None):
         self.directory = base_directory
         self.delete_dir = os.path.join(base_directory, 'delete')
         self.keep_dir = os.path.join(base_directory, 'keep')
-        os.makedirs(self.delete_dir, exist_ok=True)
-        os.makedirs(self.keep_dir, exist_ok=True)
+        self.creation_times = {}
+        # Where read-ahead hints run; a helper thread is started when none is given
+        self.readahead = executor
+        self.prefetched = set()
+        # Local copies of upcoming files when the folder is on a network mount
+        self.staging = staging
+        self.lookahead = STAGING_AHEAD if staging else READAHEAD_FILES
+        if create_dirs:
+            os.makedirs(self.delete_dir, exist_ok=True)
+            os.makedirs(self.keep_dir, exist_ok=True)
 
     @staticmethod
     def load_image(filepath: str) -> Image.Image | None:
         """
         Load an image from the given filepath and apply EXIF rotation if needed.
         Returns None if file doesn't exist or can't be opened.
+
+        The file is read into a pooled buffer in one go and decoded from
+        memory, so a cold read is one long sequential request rather than
+        the decoder's many small ones. Of RAW files only the embedded JPEG
+        is read.
         """
         if not os.path.exists(filepath):
             return None
-            
+        if is_raw(filepath):
+            return ImageProcessor.load_raw_preview(filepath)
+        if filepath.lower().endswith(HEIF_EXTENSIONS):
+            register_heif()
+
+        try:
+            with span('read', file=os.path.basename(filepath)):
+                buffer, view = read_file(filepath)
+        except OSError as e:
+            logging.warning(f"Error reading {filepath}: {e}")
+            return None
+        ImageProcessor.bytes_read += len(view)
+
         image = None
         try:
-            image = Image.open(filepath)
-            # Get EXIF data
-            exif = image._getexif()
-            if exif is not None:
-                # EXIF orientation tag
-                orientation = exif.get(274)  # 274 is the orientation tag
-                if orientation is not None:
-                    # Create new image with correct dimensions for 90/270 degree rotations
-                    if orientation in [5, 6, 7, 8]:
-                        # For 90° or 270° rotations, swap width and height
-                        new_width = image.height
-                        new_height = image.width
-                        rotated_image = Image.new(image.mode, (new_width, new_height))
-                    else:
-                        rotated_image = Image.new(image.mode, image.size)
-
-                    # Rotate and/or flip based on EXIF orientation
-                    if orientation == 2:
-                        image = image.transpose(Image.FLIP_LEFT_RIGHT)
-                    elif orientation == 3:
-                        image = image.rotate(180, expand=True)
-                    elif orientation == 4:
-                        image = image.transpose(Image.FLIP_TOP_BOTTOM)
-                    elif orientation == 5:
-                        image = image.rotate(-90, expand=True).transpose(Image.FLIP_LEFT_RIGHT)
-                    elif orientation == 6:
-                        image = image.rotate(-90, expand=True)
-                    elif orientation == 7:
-                        image = image.rotate(90, expand=True).transpose(Image.FLIP_LEFT_RIGHT)
-                    elif orientation == 8:
-                        image = image.rotate(90, expand=True)
+            image = Image.open(BufferReader(view))
+            # Decode now, the buffer is reused for the next file
+            image.load()
+        except Exception as e:
+            # Truncated or corrupt files: a half-decoded image is no use to anyone
+            logging.warning(f"Error decoding {filepath}: {e}")
+            image = None
+        finally:
+            if image is not None:
+                # Nothing may read from the buffer after it is reused
+                image.fp = None
+            view.release()
+            BUFFERS.release(buffer)
+        if image is None:
+            return None
 
+        try:
+            image = ImageProcessor.apply_orientation(image, image.getexif().get(274))  # 274 is the orientation tag
         except Exception as e:
             logging.warning(f"Error processing EXIF rotation for {filepath}: {e}")
-            
         return image
 
+    @staticmethod
+    def load_raw_preview(filepath: str) -> Image.Image | None:
+        """Decode the JPEG embedded in a RAW file, turned by the RAW's orientation."""
+        with span('read', file=os.path.basename(filepath)):
+            preview = read_preview(filepath)
+        if preview is None:
+            return None
+        data, orientation = preview
+        ImageProcessor.bytes_read += len(data)
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+            return ImageProcessor.apply_orientation(image, orientation or image.getexif().get(274))
+        except Exception as e:
+            logging.warning(f"Error decoding preview of {filepath}: {e}")
+            return None
+
+    @staticmethod
+    def apply_orientation(image: Image.Image, orientation: int | None) -> Image.Image:
+        """Rotate and/or flip image as its EXIF orientation says."""
+        if orientation == 2:
+            image = image.transpose(Image.FLIP_LEFT_RIGHT)
+        elif orientation == 3:
+            image = image.rotate(180, expand=True)
+        elif orientation == 4:
+            image = image.transpose(Image.FLIP_TOP_BOTTOM)
+        elif orientation == 5:
+            image = image.rotate(-90, expand=True).transpose(Image.FLIP_LEFT_RIGHT)
+        elif orientation == 6:
+            image = image.rotate(-90, expand=True)
+        elif orientation == 7:
+            image = image.rotate(90, expand=True).transpose(Image.FLIP_LEFT_RIGHT)
+        elif orientation == 8:
+            image = image.rotate(90, expand=True)
+        return image
+
+    def prefetch(self, filenames: list[str]) -> None:
+        """
+        Ask the kernel to start reading upcoming files in the background
+        (POSIX_FADV_WILLNEED), so they are in the page cache by the time
+        they are shown. Runs on a helper thread, since opening a file on a
+        network mount can itself take a round trip.
+        """
+        if self.staging is not None:
+            self.staging.stage(filenames)
+            return
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        new = [f for f in filenames if f not in self.prefetched]
+        if not new:
+            return
+        self.prefetched.update(new)
+        if self.readahead is None:
+            self.readahead = ThreadPoolExecutor(max_workers=1, thread_name_prefix='readahead')
+        for filename in new:
+            self.readahead.submit(advise, os.path.join(self.directory, filename), os.POSIX_FADV_WILLNEED)
+
+    def local_path(self, filename: str) -> str:
+        """Where to read filename from: its staged copy if there is one."""
+        if self.staging is not None:
+            return self.staging.path(filename)
+        return os.path.join(self.directory, filename)
+
+    def evict(self, filename: str) -> None:
+        """
+        Drop a decided file's staged copy, and the file from the page cache
+        (POSIX_FADV_DONTNEED) to make room for upcoming ones.
+        """
+        self.prefetched.discard(filename)
+        if self.staging is not None:
+            self.staging.evict(filename)
+        elif hasattr(os, 'posix_fadvise'):
+            # Decisions may have moved it to one of the subfolders
+            for folder in (self.directory, self.keep_dir, self.delete_dir):
+                if advise(os.path.join(folder, filename), os.POSIX_FADV_DONTNEED):
+                    break
+
+    def close(self) -> None:
+        if self.readahead is not None:
+            self.readahead.shutdown(wait=False, cancel_futures=True)
+            self.readahead = None
+        if self.staging is not None:
+            self.staging.close()
+            self.staging = None
+
+    @staticmethod
+    def fit_image(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """
+        Scale image down to fit size, keeping its aspect ratio; like
+        thumbnail(), but without first copying the full-resolution image.
+        Images that already fit are returned as they are.
+        """
+        scale = min(size[0] / image.width, size[1] / image.height, 1)
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        if target == image.size:
+            return image
+        return image.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
     @staticmethod
     def get_display_dimensions(window_width: int, window_height: int) -> Tuple[int, int]:
         """Calculate proper display dimensions accounting for UI elements."""
@@ -79,11 +304,18 @@ class ImageProcessor:
         )
 
     @staticmethod
+    @traced('move')
     def move_file(filename: PathType, source_dir: PathType, dest_dir: PathType) -> None:
-        """Move a file between directories."""
+        """Move a file between directories, with its companions (RAW or JPEG twin, sidecars)."""
         source = os.path.join(source_dir, filename)
         destination = os.path.join(dest_dir, filename)
+        others = companions(source)
         shutil.move(source, destination)
+        for companion in others:
+            try:
+                shutil.move(os.path.join(source_dir, companion), os.path.join(dest_dir, companion))
+            except OSError as e:
+                logging.warning(f"Could not move {companion} along with {filename}: {e}")
 
     def move_to_delete(self, filename: str) -> None:
         """Move file to delete directory."""
@@ -102,11 +334,18 @@ class ImageProcessor:
         self.move_file(filename, self.directory, self.keep_dir)
 
     @staticmethod
+    @traced('metadata')
     def get_creation_time(filepath: str) -> float:
         """Get creation time from EXIF data or file system."""
+        if is_raw(filepath):
+            # Straight from the RAW's IFDs; PIL would only see a TIFF thumbnail, if anything
+            captured = raw_capture_time(filepath)
+            return captured if captured is not None else os.path.getctime(filepath)
+        if filepath.lower().endswith(HEIF_EXTENSIONS):
+            register_heif()
         try:
             with Image.open(filepath) as img:
-                exif = img._getexif()
+                exif = img._getexif() if hasattr(img, '_getexif') else None
                 if exif is not None:
                     # Try different EXIF tags for creation date
                     for tag in [36867, 36868, 306]:  # DateTimeOriginal, DateTimeDigitized, DateTime
@@ -127,16 +366,36 @@ class ImageProcessor:
         # Fallback to filesystem creation time
         return os.path.getctime(filepath)
 
-    def get_image_files(self) -> list[str]:
-        """Get list of valid image files in directory, sorted by creation date."""
-        files = [
-            f for f in os.listdir(self.directory)
-            if f.lower().endswith(VALID_IMAGE_EXTENSIONS) and
-            os.path.isfile(os.path.join(self.directory, f))
-        ]
+    @traced('scan')
+    def get_image_files(self, filter_expr: str | None = None) -> list[str]:
+        """
+        Get list of valid image files in directory, sorted by creation date.
+
+        With a filter expression (see declutrr.query) only files matching
+        stored analyzer results are returned, without listing the directory.
+        RAW+JPEG pairs are listed once, by their JPEG.
+        """
+        if filter_expr:
+            files = [
+                f for f in select_files(self.directory, filter_expr)
+                if f.lower().endswith(VALID_IMAGE_EXTENSIONS)
+            ]
+        else:
+            files = [
+                f for f in os.listdir(self.directory)
+                if f.lower().endswith(VALID_IMAGE_EXTENSIONS) and
+                os.path.isfile(os.path.join(self.directory, f))
+            ]
+        files = photo_names(files)
         
-        # Sort files by creation time (EXIF or filesystem)
-        return sorted(
-            files,
-            key=lambda x: self.get_creation_time(os.path.join(self.directory, x))
-        )
+        # Sort files by creation time (EXIF or filesystem); the times are kept
+        # so files arriving later can be inserted in order. Headers of large
+        # folders are read concurrently, as many at once as the disk handles well
+        paths = [os.path.join(self.directory, f) for f in files]
+        if len(paths) < SCAN_POOL_MIN_FILES:
+            times = [self.get_creation_time(path) for path in paths]
+        else:
+            with AdaptivePool('scan', SCAN_MAX_WORKERS) as pool:
+                times = list(pool.map(self.get_creation_time, paths))
+        self.creation_times = dict(zip(files, times))
+        return sorted(files, key=self.creation_times.__getitem__)
@@ -0,0 +1,298 @@
+import os
+import json
+import stat
+import queue
+import socket
+import struct
+import logging
+import argparse
+import threading
+import tempfile
+import socketserver
+from concurrent.futures import Future
+from typing import Callable
+
+from PIL import Image
+from declutrr.constants import *
+from declutrr.tagging import summarize_result
+
+# Frame header: JSON length, payload length
+HEADER = struct.Struct('!II')
+
+
+def default_socket_path() -> str:
+    """Per-user socket in XDG_RUNTIME_DIR, falling back to a private directory in the temp dir."""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, INFERENCE_SOCKET_NAME)
+    return os.path.join(tempfile.gettempdir(), f"declutrr-{os.getuid()}", INFERENCE_SOCKET_NAME)
+
+
+def private_dir(path: str) -> None:
+    """
+    Create directory path for this user alone, or make sure it is. The temp
+    dir is shared, so anyone could have created it first to plant a socket.
+    Raises RuntimeError if it belongs to someone else or others have access.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"{path} isn't private to this user, not serving there")
+
+
+def is_owned(socket_path: str) -> bool:
+    """Whether the socket at socket_path was made by this user, so a daemon of someone else gets no images."""
+    try:
+        return os.lstat(socket_path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def load_yolo(name: str) -> Callable:
+    """Load a YOLO model and run it once, so the first real request isn't slow."""
+    from ultralytics import YOLO
+    model = YOLO(name)
+    model(Image.new('RGB', (64, 64)), verbose=False)
+    return lambda images: model(images, verbose=False)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    while view:
+        received = sock.recv_into(view)
+        if not received:
+            raise ConnectionError("Connection closed")
+        view = view[received:]
+    return bytes(buffer)
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b'') -> None:
+    encoded = json.dumps(header).encode('utf-8')
+    sock.sendall(HEADER.pack(len(encoded), len(payload)) + encoded + payload)
+
+
+def recv_message(sock: socket.socket) -> tuple[dict, bytes]:
+    header_size, payload_size = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    header = json.loads(_recv_exact(sock, header_size))
+    return header, _recv_exact(sock, payload_size) if payload_size else b''
+
+
+def encode_images(images: list[Image.Image]) -> tuple[list, bytes]:
+    """Raw RGB pixels, so the daemon never decodes a file a second time."""
+    rgb = [image.convert('RGB') for image in images]
+    return [list(image.size) for image in rgb], b''.join(image.tobytes() for image in rgb)
+
+
+def decode_images(sizes: list, payload: bytes) -> list[Image.Image]:
+    images = []
+    offset = 0
+    for width, height in sizes:
+        length = width * height * 3
+        images.append(Image.frombytes('RGB', (width, height), payload[offset:offset + length]))
+        offset += length
+    return images
+
+
+class ModelBatcher:
+    """
+    Runs one resident model on batches merged from concurrent requests.
+
+    The first waiting request opens a short window in which requests from
+    other clients join the same batch, up to max_batch images.
+    """
+    def __init__(self, model: Callable, window: float = INFERENCE_BATCH_WINDOW,
+                 max_batch: int = INFERENCE_MAX_BATCH):
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, images: list[Image.Image]) -> Future:
+        future = Future()
+        self.requests.put((images, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.requests.get()]
+            count = len(batch[0][0])
+            while count < self.max_batch:
+                try:
+                    request = self.requests.get(timeout=self.window)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                count += len(request[0])
+
+            images = [image for request_images, _ in batch for image in request_images]
+            try:
+                summaries = [summarize_result(result) for result in self.model(images)]
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_images, future in batch:
+                future.set_result(summaries[offset:offset + len(request_images)])
+                offset += len(request_images)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        # One connection carries any number of requests
+        while True:
+            try:
+                header, payload = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                batcher = self.server.get_batcher(header['model'])
+                results = batcher.submit(decode_images(header['sizes'], payload)).result()
+                send_message(self.request, {'results': results})
+            except Exception as e:
+                logging.error(f"Inference request failed: {e}")
+                send_message(self.request, {'error': str(e)})
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Keeps models loaded between runs and serves them on a Unix domain socket."""
+    daemon_threads = True
+
+    def __init__(self, socket_path: str | None = None, loader: Callable[[str], Callable] = load_yolo,
+                 window: float = INFERENCE_BATCH_WINDOW, max_batch: int = INFERENCE_MAX_BATCH):
+        self.socket_path = socket_path or default_socket_path()
+        if socket_path is None:
+            private_dir(os.path.dirname(self.socket_path))
+        self.loader = loader
+        self.window = window
+        self.max_batch = max_batch
+        self.batchers = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.socket_path):
+            if is_running(self.socket_path):
+                raise RuntimeError(f"Inference daemon already running on {self.socket_path}")
+            os.unlink(self.socket_path)  # Left behind by a daemon that crashed
+        super().__init__(self.socket_path, _RequestHandler)
+        os.chmod(self.socket_path, 0o600)
+
+    def get_batcher(self, name: str) -> ModelBatcher:
+        """Return the batcher for a model, loading the model on first use."""
+        with self._lock:
+            if name not in self.batchers:
+                logging.info(f"Loading model {name}")
+                self.batchers[name] = ModelBatcher(self.loader(name), self.window, self.max_batch)
+            return self.batchers[name]
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def is_running(socket_path: str | None = None) -> bool:
+    """Check whether a daemon of this user accepts connections on socket_path."""
+    socket_path = socket_path or default_socket_path()
+    if os.path.exists(socket_path) and not is_owned(socket_path):
+        logging.warning(f"Ignoring {socket_path}, it belongs to another user")
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+class LocalPredictor:
+    """Runs a model in this process, loading it on first use."""
+    def __init__(self, name: str, loader: Callable[[str], Callable] = load_yolo):
+        self.name = name
+        self.loader = loader
+        self.model = None
+
+    def __call__(self, images: list[Image.Image]) -> list[dict]:
+        if self.model is None:
+            self.model = self.loader(self.name)
+        return [summarize_result(result) for result in self.model(images)]
+
+
+class RemotePredictor:
+    """
+    Sends images to the inference daemon.
+
+    If the daemon goes away mid-run, inference continues in process.
+    """
+    def __init__(self, name: str, socket_path: str | None = None,
+                 loader: Callable[[str], Callable] = load_yolo):
+        # The daemon resolves relative weight paths against its own directory
+        self.name = os.path.abspath(name) if os.path.exists(name) else name
+        self.socket_path = socket_path or default_socket_path()
+        self.loader = loader
+        self.sock = None
+        self.fallback = None
+        self._lock = threading.Lock()
+
+    def __call__(self, images: list[Image.Image]) -> list[dict]:
+        if self.fallback is None:
+            sizes, payload = encode_images(images)
+            try:
+                with self._lock:
+                    if self.sock is None:
+                        if not is_owned(self.socket_path):
+                            raise PermissionError(f"{self.socket_path} missing or not this user's")
+                        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        self.sock.connect(self.socket_path)
+                    send_message(self.sock, {'model': self.name, 'sizes': sizes}, payload)
+                    header, _ = recv_message(self.sock)
+            except OSError as e:
+                logging.warning(f"Inference daemon unavailable ({e}), running {self.name} in process")
+                self.close()
+                self.fallback = LocalPredictor(self.name, self.loader)
+            else:
+                if 'error' in header:
+                    raise RuntimeError(header['error'])
+                return header['results']
+        return self.fallback(images)
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def get_predictor(name: str, socket_path: str | None = None,
+                  loader: Callable[[str], Callable] = load_yolo) -> LocalPredictor | RemotePredictor:
+    """Use the daemon if one is running, otherwise run the model in process."""
+    if is_running(socket_path):
+        logging.info(f"Using inference daemon for {name}")
+        return RemotePredictor(name, socket_path, loader)
+    return LocalPredictor(name, loader)
+
+
+def serve(models: list[str], socket_path: str | None = None) -> None:
+    """Run the daemon in the foreground, preloading models."""
+    with InferenceServer(socket_path) as server:
+        for name in models:
+            server.get_batcher(name)
+        logging.info(f"Inference daemon listening on {server.socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keep YOLO models loaded for declutrr tools")
+    parser.add_argument('models', nargs='*', help="models to preload, e.g. yolov8n.pt")
+    parser.add_argument('--socket', help=f"socket path (default: {default_socket_path()})")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    serve(args.models, args.socket)
+
+
+if __name__ == "__main__":
+    main()
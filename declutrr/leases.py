@@ -0,0 +1,283 @@
+"""
+Shared triage of one folder by several operators (declutrr gui --share).
+
+The folder's undecided images are split, oldest first, into chunks of
+LEASE_CHUNK_SIZE, and every running instance leases chunks through small
+files in .declutrr-leases/, so each operator sees a stream of images no
+one else is looking at:
+
+    queue-000000.json   chunks of file names; later segments add new arrivals
+    7.lease             chunk 7 is being sorted; holds the owner
+    8.next              chunk 8 is leased ahead by its owner, not started yet
+    6.done              every image of chunk 6 has a decision
+
+All coordination is create-if-absent (O_EXCL, link) and rename, which are
+atomic on local disks, NFS and SMB alike. Owners touch their leases every
+LEASE_RENEW_MS; a lease untouched for LEASE_SECONDS belongs to an instance
+that crashed or lost the share, and is taken over by the next operator
+looking for work. Once no chunk is free, operators that run out take the
+chunks others leased ahead but haven't started, so everyone keeps working
+until the queue is empty. Chunks with images left undecided (skipped) are
+released on quit and go back to the queue.
+"""
+import os
+import json
+import time
+import socket
+import getpass
+import logging
+import threading
+from typing import Callable
+
+from declutrr.constants import *
+
+
+def default_owner() -> str:
+    return f"{getpass.getuser()}@{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseManager:
+    """One operator's leases on the triage queue of directory."""
+    def __init__(self, directory: str, owner: str | None = None, chunk_size: int = LEASE_CHUNK_SIZE,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.directory = directory
+        self.lease_dir = os.path.join(directory, LEASE_DIRNAME)
+        self.owner = owner or default_owner()
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+        self.chunks = []  # file names per chunk, in queue order
+        self.chunk_of = {}
+        self.segments = 0
+        self.held = {}  # chunk -> LEASE_ACTIVE or LEASE_AHEAD
+        self.remaining = {}  # chunk -> its undecided files, while held
+        self.lock = threading.Lock()
+        os.makedirs(self.lease_dir, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.lease_dir, name)
+
+    def _create(self, name: str, data: dict | list) -> bool:
+        """Create name with data unless it exists, so readers never see it half written."""
+        path = self._path(name)
+        temp = self._path(f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp, 'w') as f:
+            json.dump(data, f)
+        try:
+            os.link(temp, path)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            # No hard links (some SMB servers): exclusive create, written after the fact
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            except FileExistsError:
+                return False
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            return True
+        finally:
+            os.unlink(temp)
+
+    def _read_segments(self) -> None:
+        while True:
+            try:
+                with open(self._path(f"queue-{self.segments:06d}.json")) as f:
+                    segment = json.load(f)
+            except FileNotFoundError:
+                return
+            except ValueError:
+                # Written without a hard link and not finished yet
+                return
+            for files in segment:
+                for name in files:
+                    self.chunk_of.setdefault(name, len(self.chunks))
+                self.chunks.append(files)
+            self.segments += 1
+
+    def sync(self, filenames: list[str]) -> None:
+        """Add files (oldest first) that aren't in the queue yet, as new chunks."""
+        with self.lock:
+            while True:
+                self._read_segments()
+                new = [name for name in filenames if name not in self.chunk_of]
+                if not new:
+                    return
+                segment = [new[i:i + self.chunk_size] for i in range(0, len(new), self.chunk_size)]
+                # Whoever writes the next segment first wins; the others reread and add what's left
+                if self._create(f"queue-{self.segments:06d}.json", segment):
+                    logging.info(f"Added {len(new)} files in {len(segment)} chunks to the shared queue")
+
+    def _states(self) -> dict[int, dict[str, float]]:
+        """Lease files per chunk: {chunk: {'lease': mtime, 'next': mtime, 'done': mtime}}."""
+        states = {}
+        with os.scandir(self.lease_dir) as entries:
+            for entry in entries:
+                chunk, _, kind = entry.name.partition('.')
+                if chunk.isdigit() and kind in (LEASE_ACTIVE, LEASE_AHEAD, LEASE_DONE):
+                    try:
+                        states.setdefault(int(chunk), {})[kind] = entry.stat().st_mtime
+                    except FileNotFoundError:
+                        pass
+        return states
+
+    def _take_over(self, chunk: int, kind: str, mtime: float | None) -> bool:
+        """
+        Move chunk's kind lease out of the way. With mtime, only if the lease is
+        still the one seen at mtime, i.e. nobody renewed or replaced it since.
+        """
+        path = self._path(f"{chunk}.{kind}")
+        taken = self._path(f"{chunk}.{kind}.{self.owner.replace('/', '_')}.taken")
+        try:
+            os.rename(path, taken)
+        except FileNotFoundError:
+            return False
+        if mtime is not None and os.stat(taken).st_mtime != mtime:
+            # Renewed or replaced in between: give it back
+            try:
+                os.link(taken, path)
+            except OSError:
+                pass
+            os.unlink(taken)
+            return False
+        os.unlink(taken)
+        return True
+
+    def acquire(self, undecided: Callable[[list[str]], list[str]], ahead: bool = False) -> list[str]:
+        """
+        Lease the next chunk with undecided files and return those files, []
+        if there is none. ahead leases it as next (see start()); otherwise it
+        is started right away, and may be taken from an operator who leased
+        it ahead once no chunk is free.
+        """
+        kind = LEASE_AHEAD if ahead else LEASE_ACTIVE
+        with self.lock:
+            self._read_segments()
+            states = self._states()
+            now = time.time()
+            free, expired, unstarted = [], [], []
+            for chunk in range(len(self.chunks)):
+                state = states.get(chunk, {})
+                if chunk in self.held or LEASE_DONE in state:
+                    continue
+                leases = [(k, state[k]) for k in (LEASE_ACTIVE, LEASE_AHEAD) if k in state]
+                if not leases:
+                    free.append((chunk, None, None))
+                elif all(now - mtime > self.lease_seconds for _, mtime in leases):
+                    expired.append((chunk, *leases[0]))
+                elif not ahead and [k for k, _ in leases] == [LEASE_AHEAD]:
+                    unstarted.append((chunk, LEASE_AHEAD, None))
+
+            for chunk, old_kind, mtime in free + expired + unstarted:
+                if old_kind is not None and not self._take_over(chunk, old_kind, mtime):
+                    continue
+                if not self._create(f"{chunk}.{kind}", {'owner': self.owner, 'time': now}):
+                    continue
+                if os.path.exists(self._path(f"{chunk}.{LEASE_DONE}")):
+                    # Finished while the folder was listed: the listing missed its .done, not its lease
+                    self._release(chunk, kind)
+                    continue
+                if old_kind is not None:
+                    logging.info(f"Took over chunk {chunk} ({'expired' if mtime else 'not started'})")
+                # Released and expired chunks can be partly decided, and files can vanish meanwhile
+                files = [name for name in undecided(self.chunks[chunk])
+                         if os.path.exists(os.path.join(self.directory, name))]
+                if not files:
+                    # Decided in an earlier session
+                    self._finish(chunk, kind)
+                    continue
+                self.held[chunk] = kind
+                self.remaining[chunk] = set(files)
+                return files
+        return []
+
+    def start(self, chunk: int) -> bool:
+        """Start sorting a chunk leased ahead; False if another operator took it meanwhile."""
+        with self.lock:
+            if self.held.get(chunk) != LEASE_AHEAD:
+                return chunk in self.held
+            try:
+                os.rename(self._path(f"{chunk}.{LEASE_AHEAD}"), self._path(f"{chunk}.{LEASE_ACTIVE}"))
+            except FileNotFoundError:
+                self._drop(chunk)
+                return False
+            self.held[chunk] = LEASE_ACTIVE
+            return True
+
+    def _owned(self, chunk: int, kind: str) -> bool:
+        try:
+            with open(self._path(f"{chunk}.{kind}")) as f:
+                return json.load(f).get('owner') == self.owner
+        except (OSError, ValueError):
+            return False
+
+    def renew(self) -> list[int]:
+        """Touch held leases; returns the chunks lost to other operators, e.g. after a long stall."""
+        lost = []
+        with self.lock:
+            for chunk, kind in list(self.held.items()):
+                if self._owned(chunk, kind):
+                    try:
+                        os.utime(self._path(f"{chunk}.{kind}"))
+                        continue
+                    except OSError:
+                        pass
+                logging.warning(f"Lost the lease on chunk {chunk} to another operator")
+                self._drop(chunk)
+                lost.append(chunk)
+        return lost
+
+    def _drop(self, chunk: int) -> None:
+        self.held.pop(chunk, None)
+        self.remaining.pop(chunk, None)
+
+    def held_files(self, chunk: int) -> list[str]:
+        """Files of a held chunk that are still undecided, in queue order."""
+        remaining = self.remaining.get(chunk, ())
+        return [name for name in self.chunks[chunk] if name in remaining]
+
+    def decided(self, filename: str) -> int | None:
+        """Note a decision; returns the file's chunk if that was its last undecided file."""
+        chunk = self.chunk_of.get(filename)
+        with self.lock:
+            remaining = self.remaining.get(chunk)
+            if remaining is None:
+                return None
+            remaining.discard(filename)
+            return chunk if not remaining else None
+
+    def undone(self, filename: str) -> None:
+        chunk = self.chunk_of.get(filename)
+        with self.lock:
+            if chunk in self.remaining:
+                self.remaining[chunk].add(filename)
+
+    def finish(self, chunk: int) -> None:
+        """Mark a chunk whose files all have decisions as done and let go of it."""
+        with self.lock:
+            kind = self.held.get(chunk)
+            if kind is not None and not self.remaining.get(chunk):
+                self._finish(chunk, kind)
+                self._drop(chunk)
+
+    def _finish(self, chunk: int, kind: str) -> None:
+        self._create(f"{chunk}.{LEASE_DONE}", {'owner': self.owner, 'time': time.time()})
+        try:
+            os.unlink(self._path(f"{chunk}.{kind}"))
+        except FileNotFoundError:
+            pass
+
+    def release(self) -> None:
+        """Give back unfinished chunks, e.g. with skipped files, when quitting."""
+        with self.lock:
+            for chunk, kind in list(self.held.items()):
+                if self._owned(chunk, kind):
+                    self._release(chunk, kind)
+                self._drop(chunk)
+
+    def _release(self, chunk: int, kind: str) -> None:
+        try:
+            os.unlink(self._path(f"{chunk}.{kind}"))
+        except FileNotFoundError:
+            pass
+
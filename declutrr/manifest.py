@@ -0,0 +1,206 @@
+import os
+import csv
+import json
+import logging
+import threading
+from datetime import datetime
+
+from declutrr.constants import *
+from declutrr.decisions import DecisionBackend, get_decision_backend
+from declutrr.concurrency import AdaptivePool
+from declutrr.tracing import traced
+
+
+def _entry(name, action, where: str) -> tuple[str, str]:
+    action = str(action or '').strip().lower()
+    if not name or action not in MANIFEST_ACTIONS:
+        raise ValueError(f"{where}: expected a file and one of {', '.join(MANIFEST_ACTIONS)}, got {name!r}, {action!r}")
+    return str(name).strip(), action
+
+
+def read_manifest(path: str) -> list[tuple[str, str]]:
+    """
+    Read (file, keep|delete|skip) decisions from a CSV, JSON or NDJSON file.
+
+    CSV has file and decision columns, with an optional header row. JSON is
+    either a list of {"file": ..., "decision": ...} objects or a
+    {file: decision} mapping. NDJSON (.ndjson/.jsonl) has one object per
+    line. Raises ValueError on malformed entries.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    entries = []
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            for line, row in enumerate(csv.reader(f), 1):
+                if not row or (line == 1 and row[0].strip().lower() in ('file', 'filename', 'path')):
+                    continue
+                entries.append(_entry(row[0], row[1] if len(row) > 1 else None, f"{path}:{line}"))
+        elif extension in ('.ndjson', '.jsonl'):
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    record = json.loads(text)
+                    entries.append(_entry(record.get('file'), record.get('decision'), f"{path}:{line}"))
+        elif extension == '.json':
+            data = json.load(f)
+            records = data.items() if isinstance(data, dict) else (
+                (record.get('file'), record.get('decision')) for record in data)
+            for index, (name, action) in enumerate(records):
+                entries.append(_entry(name, action, f"{path}[{index}]"))
+        else:
+            raise ValueError(f"Unsupported manifest format: {path}")
+    return entries
+
+
+class Journal:
+    """
+    Append-only NDJSON record of the changes made by one run of a bulk
+    operation (kind is 'apply' or 'organize').
+
+    Each line is written by the worker that made the change, right after
+    it succeeded, so undo never touches a file the run didn't change and a
+    crash mid-run loses no record of what was changed.
+    """
+    def __init__(self, directory: str, kind: str):
+        journal_dir = os.path.join(directory, JOURNAL_DIRNAME)
+        os.makedirs(journal_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        self.path = os.path.join(journal_dir, f"{kind}_{timestamp}.ndjson")
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.lock = threading.Lock()
+
+    def record(self, entry: dict) -> None:
+        with self.lock:
+            self.file.write(json.dumps(entry) + '\n')
+            # One line per change; flushed so a crash loses nothing
+            self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def journal_paths(directory: str, kind: str = 'apply') -> list[str]:
+    """Journals of earlier runs of kind, oldest first."""
+    journal_dir = os.path.join(directory, JOURNAL_DIRNAME)
+    if not os.path.isdir(journal_dir):
+        return []
+    return [os.path.join(journal_dir, name) for name in sorted(os.listdir(journal_dir))
+            if name.startswith(f"{kind}_") and name.endswith('.ndjson')]
+
+
+def read_journal(path: str) -> list[dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def finish_journal(path: str, unrestored: list[dict]) -> None:
+    """After an undo: remove the journal, or keep only what couldn't be restored, for another try."""
+    if not unrestored:
+        os.remove(path)
+        return
+    temp = path + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(record) + '\n' for record in unrestored)
+    os.replace(temp, path)
+
+
+def change_decision(backend: DecisionBackend, name: str, before: str, after: str) -> bool:
+    """Go from one action to another (skip meaning undecided) through backend."""
+    if before != ACTION_SKIP and not backend.revert(name, before):
+        return False
+    return after == ACTION_SKIP or backend.record(name, after)
+
+
+@traced('apply')
+def _apply_one(backend: DecisionBackend, name: str, action: str, dry_run: bool) -> tuple[str, str]:
+    """Bring name to the decision its action asks for; returns (outcome, previous action)."""
+    if os.path.basename(name) != name or name in ('', '.', '..'):
+        logging.warning(f"Skipping {name!r}: manifest entries must be file names in {backend.directory}")
+        return 'failed', ACTION_SKIP
+    if not backend.exists(name):
+        return 'missing', ACTION_SKIP
+
+    # The manifest describes the end state, so a rerun, even with changed
+    # decisions, only changes what isn't there yet
+    current = backend.decision(name) or ACTION_SKIP
+    if current == action:
+        return 'unchanged', current
+    if not dry_run and not change_decision(backend, name, current, action):
+        return 'failed', current
+    return action, current
+
+
+def apply_manifest(directory: str, entries: list[tuple[str, str]], dry_run: bool = False,
+                   workers: int | None = None, backend: str | None = None) -> dict:
+    """
+    Record the manifest's decisions for the files in directory through a
+    decision backend; with the default one, files move to keep/ and
+    delete/ (or back, for skip).
+
+    Changes run on a thread pool, since each mostly waits on the
+    filesystem; how many at once adapts to the filesystem unless workers
+    is given. Files that already have the manifest's decision are left
+    alone, so reruns are cheap and safe. Every change is journaled; see
+    undo_last_apply(). With dry_run, nothing is changed or journaled.
+    Returns counts per action plus unchanged, missing and failed.
+    """
+    # Later entries for the same file win
+    decisions = dict(entries)
+    decision_backend = get_decision_backend(directory, backend)
+    stats = {ACTION_KEEP: 0, ACTION_DELETE: 0, ACTION_SKIP: 0, 'unchanged': 0, 'missing': 0, 'failed': 0}
+
+    journal = None if dry_run else Journal(directory, 'apply')
+
+    def apply_one(item: tuple[str, str]) -> tuple[str, str]:
+        name, action = item
+        outcome, before = _apply_one(decision_backend, name, action, dry_run)
+        if journal is not None and outcome in MANIFEST_ACTIONS:
+            journal.record({'file': name, 'from': before, 'to': outcome, 'backend': decision_backend.name})
+        return outcome, before
+
+    try:
+        with AdaptivePool('apply', MANIFEST_MAX_WORKERS, workers, initial=MANIFEST_WORKERS) as pool:
+            outcomes = pool.map(apply_one, decisions.items())
+            for name, (outcome, before) in zip(decisions, outcomes):
+                stats[outcome] += 1
+                if outcome in MANIFEST_ACTIONS and dry_run:
+                    logging.info(f"Would change {name}: {before} -> {outcome}")
+                elif outcome == 'missing':
+                    logging.warning(f"Not found: {name}")
+    finally:
+        if journal is not None:
+            journal.close()
+        decision_backend.close()
+    return stats
+
+
+def undo_last_apply(directory: str) -> dict:
+    """
+    Revert the changes recorded by the newest journal, then remove it; if
+    some couldn't be reverted, the journal is kept with just those.
+    """
+    paths = journal_paths(directory)
+    stats = {'restored': 0, 'missing': 0}
+    if not paths:
+        logging.warning(f"No apply journal in {directory}")
+        return stats
+
+    records = read_journal(paths[-1])
+    backends = {}
+    unrestored = []
+    for record in reversed(records):
+        name = record['backend']
+        if name not in backends:
+            backends[name] = get_decision_backend(directory, name)
+        backend = backends[name]
+        current = backend.decision(record['file']) or ACTION_SKIP
+        if (backend.exists(record['file']) and current == record['to']
+                and change_decision(backend, record['file'], record['to'], record['from'])):
+            stats['restored'] += 1
+        else:
+            logging.warning(f"Cannot restore {record['file']}: changed since")
+            stats['missing'] += 1
+            unrestored.append(record)
+    for backend in backends.values():
+        backend.close()
+    finish_journal(paths[-1], unrestored[::-1])
+    return stats
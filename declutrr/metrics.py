@@ -0,0 +1,152 @@
+import json
+import math
+import time
+from contextlib import contextmanager
+
+from declutrr.constants import *
+from declutrr.tracing import add_span, span
+
+# Hot path stages, in order; total is keypress to pixels on screen
+STAGES = ('key', 'move', 'decode', 'resize', 'photo', 'paint', 'total')
+
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets, each HISTOGRAM_GROWTH times
+    wider than the one before. Constant memory and cost per sample, and
+    percentiles accurate to about one bucket width.
+    """
+    def __init__(self):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+
+    @staticmethod
+    def bucket(seconds: float) -> int:
+        if seconds <= HISTOGRAM_MIN_SECONDS:
+            return 0
+        index = int(math.log(seconds / HISTOGRAM_MIN_SECONDS, HISTOGRAM_GROWTH)) + 1
+        return min(index, HISTOGRAM_BUCKETS - 1)
+
+    @staticmethod
+    def upper_bound(index: int) -> float:
+        return HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH ** index
+
+    def add(self, seconds: float) -> None:
+        self.counts[self.bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, p: float) -> float | None:
+        """Upper bound of the bucket holding the p-th percentile, in seconds."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.upper_bound(index)
+        return self.upper_bound(HISTOGRAM_BUCKETS - 1)
+
+    def to_dict(self) -> dict:
+        """Counts and mean/p50/p95/p99 in ms, plus the non-empty buckets by upper bound."""
+        ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+        return {
+            'count': self.count,
+            'mean_ms': ms(self.total / self.count) if self.count else None,
+            'p50_ms': ms(self.percentile(50)),
+            'p95_ms': ms(self.percentile(95)),
+            'p99_ms': ms(self.percentile(99)),
+            'buckets_ms': {ms(self.upper_bound(i)): count for i, count in enumerate(self.counts) if count},
+        }
+
+
+class SessionMetrics:
+    """
+    Per-stage latencies and throughput of a sorting session.
+
+    A keypress starts a measurement (key_pressed), stages are timed with
+    stage(), and paint_finished() closes it once Tk has drawn the new image.
+    """
+    def __init__(self):
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        self.started = time.time()
+        self.decisions = 0
+        self.bytes_read = 0
+        self.pressed = None
+        self.painting = None
+        # Smallest seen difference between our clock and event timestamps
+        self.clock_offset = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.histograms[stage].add(seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            with span(name, 'ui'):
+                yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def key_pressed(self, event_time: int | None = None) -> None:
+        """
+        Start timing a keypress. With the event's timestamp (ms, any epoch),
+        the time it waited in the event queue is recorded as the key stage,
+        measured against the quickest-handled event so far.
+        """
+        now = time.perf_counter()
+        self.pressed = now
+        if event_time:
+            offset = now * 1000 - event_time
+            if self.clock_offset is None or offset < self.clock_offset:
+                self.clock_offset = offset
+            self.add('key', (offset - self.clock_offset) / 1000)
+
+    def paint_started(self) -> None:
+        self.painting = time.perf_counter()
+
+    def paint_finished(self) -> None:
+        now = time.perf_counter()
+        if self.painting is not None:
+            self.add('paint', now - self.painting)
+            add_span('paint', self.painting, now, 'ui')
+            self.painting = None
+        if self.pressed is not None:
+            self.add('total', now - self.pressed)
+            add_span('keypress to pixels', self.pressed, now, 'ui')
+            self.pressed = None
+
+    def decision(self) -> None:
+        self.decisions += 1
+
+    def summary(self) -> dict:
+        elapsed = time.time() - self.started
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'duration_s': round(elapsed, 1),
+            'decisions': self.decisions,
+            'decisions_per_minute': round(self.decisions / elapsed * 60, 1) if elapsed else None,
+            'mb_read': round(self.bytes_read / 1e6, 1),
+            'stages': {stage: histogram.to_dict() for stage, histogram in self.histograms.items()},
+        }
+
+    def overlay_text(self) -> str:
+        """Multi-line p50/p95/p99 table with the session's throughput."""
+        def ms(seconds):
+            return f"{seconds * 1000:7.1f}" if seconds is not None else f"{'-':>7}"
+
+        lines = [f"{'stage':<7} {'p50':>7} {'p95':>7} {'p99':>7} {'n':>5}  (ms)"]
+        for stage, histogram in self.histograms.items():
+            percentiles = ' '.join(ms(histogram.percentile(p)) for p in (50, 95, 99))
+            lines.append(f"{stage:<7} {percentiles} {histogram.count:>5}")
+        minutes = (time.time() - self.started) / 60
+        rate = self.decisions / minutes if minutes else 0
+        lines.append(f"{self.decisions} decisions, {rate:.1f}/min, {self.bytes_read / 1e6:.0f} MB read")
+        return '\n'.join(lines)
+
+    def export(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
@@ -0,0 +1,224 @@
+import os
+import re
+import logging
+from datetime import datetime, timezone
+from typing import Callable
+
+from declutrr.constants import *
+from declutrr.store import MetadataStore
+from declutrr.pipeline import Pipeline
+from declutrr.analyzers import CaptureTimeAnalyzer
+from declutrr.manifest import Journal, finish_journal, journal_paths, read_journal
+from declutrr.companions import COMPANION_EXTENSIONS, companions, companion_name, photo_key
+from declutrr.concurrency import AdaptivePool
+from declutrr.tracing import traced
+
+
+def capture_times(directory: str, progress: Callable[[], None] | None = None) -> dict[str, float | None]:
+    """
+    Capture time of every image in directory, None where there is no EXIF date.
+
+    Times come from the folder's store; only new or changed files have their
+    headers read.
+    """
+    times = {}
+
+    def collect(frame, results):
+        times[frame.name] = results['captured']
+        return False
+    collect.name = 'dated'
+
+    Pipeline(directory, [CaptureTimeAnalyzer()], [collect], progress=progress).run()
+    return times
+
+
+def plan_moves(directory: str, times: dict[str, float | None], rename: bool = True,
+               bucket: bool = True) -> list[tuple[str, str]]:
+    """
+    Work out (old name, new path relative to directory) for every dated image.
+
+    New names are IMG_YYYYmmdd_HHMMSS.ext, numbered _1, _2... on collision,
+    in YYYYMM subfolders when bucketing. Collisions are resolved against one
+    listing per target folder plus the names already handed out, so nothing
+    is probed on disk per file. Names of files that are moving stay taken,
+    because the renames run concurrently. A photo's RAW twin and sidecars
+    take its new name with their own extensions, so the name is only
+    handed out if it is free for all of them. Files that are already named and
+    placed correctly are left out, which makes reruns no-ops.
+    """
+    taken = {}
+
+    def names_in(folder):
+        if folder not in taken:
+            path = os.path.join(directory, folder)
+            # Lowercase, so names that only differ in case can't clash on case-insensitive disks
+            taken[folder] = {n.lower() for n in os.listdir(path)} if os.path.isdir(path) else set()
+        return taken[folder]
+
+    # RAW twins and sidecars move along under the photo's new name, so that name has to be free for them too
+    extras = {}
+    for other in os.listdir(directory):
+        if other not in times and other.lower().endswith(COMPANION_EXTENSIONS):
+            extras.setdefault(photo_key(other), []).append(other)
+
+    moves = []
+    for captured, name in sorted((t, name) for name, t in times.items() if t is not None):
+        captured = datetime.fromtimestamp(captured, timezone.utc)
+        folder = captured.strftime(ORGANIZE_BUCKET_FORMAT) if bucket else ''
+        stem, ext = os.path.splitext(name)
+        base = ORGANIZE_PREFIX + captured.strftime(ORGANIZE_NAME_FORMAT) if rename else stem
+        # A file renamed in an earlier run keeps its name, number included
+        candidate = name if re.fullmatch(re.escape(base) + r'(_\d+)?', stem) else base + ext
+        if not folder and candidate == name:
+            continue
+
+        group = [name] + extras.get(photo_key(name), [])
+        names = names_in(folder)
+        counter = 1
+        while any(companion_name(f, name, candidate).lower() in names for f in group):
+            candidate = f"{base}_{counter}{ext}"
+            counter += 1
+        names.update(companion_name(f, name, candidate).lower() for f in group)
+        moves.append((name, os.path.join(folder, candidate)))
+    return moves
+
+
+def _rename_new(source: str, destination: str) -> None:
+    """
+    Rename source to destination, raising FileExistsError rather than
+    replacing a file that is already there, even one that appeared just now.
+    """
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        raise
+    except OSError:
+        # No hard links here (FAT, some SMB shares): the check can race, but os.rename would replace silently
+        if os.path.lexists(destination):
+            raise FileExistsError(destination)
+        os.rename(source, destination)
+        return
+    os.unlink(source)
+
+
+@traced('move')
+def _move(directory: str, old_name: str, new_path: str, journal: Journal | None = None) -> list[tuple[str, str]]:
+    """
+    Rename old_name to new_path, and its companions (RAW twin, sidecars) to
+    the same new name with their own extensions, journaling each rename as
+    soon as it is done. Returns the renames done, [] if the file couldn't
+    be moved.
+    """
+    folder = os.path.dirname(new_path)
+    renames = [(old_name, new_path)] + [
+        (companion, os.path.join(folder, companion_name(companion, old_name, os.path.basename(new_path))))
+        for companion in companions(os.path.join(directory, old_name))
+    ]
+    done = []
+    for name, path in renames:
+        try:
+            # Planned names are free unless something appeared since the listing, which is never replaced
+            _rename_new(os.path.join(directory, name), os.path.join(directory, path))
+        except OSError as e:
+            if not done:
+                logging.error(f"Error moving {old_name} to {new_path}: {e}")
+                return []
+            logging.warning(f"Could not move {name} along with {old_name}: {e}")
+            continue
+        if journal is not None:
+            journal.record({'from': name, 'to': path})
+        done.append((name, path))
+    return done
+
+
+def organize(directory: str, rename: bool = True, bucket: bool = True, dry_run: bool = False,
+             workers: int | None = None, progress: Callable[[], None] | None = None) -> dict:
+    """
+    Rename images by capture date and sort them into YYYYMM folders in one pass.
+
+    Replaces scripts/renamer.sh followed by scripts/move.sh: every target
+    folder is created once up front, and the renames run concurrently, as
+    many at once as the filesystem handles well unless workers is given.
+    Files without an EXIF date stay where they are. RAW twins and sidecars
+    are renamed along with their photo. Every rename is
+    journaled; see undo_last_organize(). With dry_run, nothing changes.
+    Returns counts of moved, unchanged, undated and failed files.
+    """
+    times = capture_times(directory, progress)
+    moves = plan_moves(directory, times, rename=rename, bucket=bucket)
+    stats = {
+        'moved': 0,
+        'unchanged': sum(1 for t in times.values() if t is not None) - len(moves),
+        'undated': sum(1 for t in times.values() if t is None),
+        'failed': 0,
+    }
+    if dry_run:
+        for old_name, new_path in moves:
+            logging.info(f"Would move {old_name} -> {new_path}")
+        stats['moved'] = len(moves)
+        return stats
+    if not moves:
+        return stats
+
+    for folder in {os.path.dirname(new_path) for _, new_path in moves} - {''}:
+        os.makedirs(os.path.join(directory, folder), exist_ok=True)
+
+    journal = Journal(directory, 'organize')
+    try:
+        with AdaptivePool('organize', ORGANIZE_MAX_WORKERS, workers, initial=ORGANIZE_WORKERS) as pool, \
+                MetadataStore.for_directory(directory) as store:
+            outcomes = pool.map(lambda move: _move(directory, *move, journal), moves)
+            for (old_name, new_path), renames in zip(moves, outcomes):
+                if not renames:
+                    stats['failed'] += 1
+                    continue
+                stats['moved'] += 1
+                # Results follow renames, into bucket folders too, so undo finds them again
+                for name, path in renames:
+                    store.rename_file(name, path)
+            store.commit()
+    finally:
+        journal.close()
+    return stats
+
+
+def undo_last_organize(directory: str) -> dict:
+    """
+    Rename files back as recorded by the newest organize journal, then
+    remove it; if some couldn't be renamed back, the journal is kept with
+    just those.
+    """
+    paths = journal_paths(directory, 'organize')
+    stats = {'restored': 0, 'missing': 0}
+    if not paths:
+        logging.warning(f"No organize journal in {directory}")
+        return stats
+
+    folders = set()
+    unrestored = []
+    with MetadataStore.for_directory(directory) as store:
+        for record in reversed(read_journal(paths[-1])):
+            current = os.path.join(directory, record['to'])
+            original = os.path.join(directory, record['from'])
+            try:
+                if not os.path.exists(current):
+                    raise FileNotFoundError(current)
+                _rename_new(current, original)
+            except OSError:
+                logging.warning(f"Cannot restore {record['from']}: {record['to']} moved or replaced since")
+                stats['missing'] += 1
+                unrestored.append(record)
+                continue
+            store.rename_file(record['to'], record['from'])
+            folders.add(os.path.dirname(record['to']))
+            stats['restored'] += 1
+        store.commit()
+
+    # Remove bucket folders the run created, if nothing else was put there
+    for folder in folders - {''}:
+        try:
+            os.rmdir(os.path.join(directory, folder))
+        except OSError:
+            pass
+    finish_journal(paths[-1], unrestored[::-1])
+    return stats
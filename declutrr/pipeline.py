@@ -0,0 +1,326 @@
+import os
+import queue
+import logging
+import threading
+from typing import Any, Callable
+
+from declutrr.constants import *
+from declutrr.store import MetadataStore
+from declutrr.companions import photo_names
+from declutrr.tagging import decode_for_inference
+from declutrr.image_processor import ImageProcessor
+from declutrr.tag_mirror import TagMirror
+from declutrr.tracing import span
+from declutrr.concurrency import ConcurrencyLimiter
+
+# Per-file messages, sampled by setup_logging
+file_log = logging.getLogger(FILE_LOGGER)
+
+# End-of-stream marker passed between stages
+DONE = object()
+
+
+class Frame:
+    """One image travelling through the pipeline, decoded at most once."""
+    def __init__(self, name: str, path: str, stat: os.stat_result, todo: list['Analyzer']):
+        self.name = name
+        self.path = path
+        self.stat = stat
+        self.todo = todo
+        self.image = None
+        self._gray = None
+
+    @property
+    def gray(self):
+        """Grayscale pixels as a uint8 NumPy array, computed on first use."""
+        if self._gray is None:
+            import numpy as np
+            self._gray = np.asarray(self.image.convert('L'))
+        return self._gray
+
+
+class Analyzer:
+    """
+    Base class for pipeline analyzers.
+
+    Subclasses set a unique name, implement analyze() or analyze_batch(),
+    and may override store() to persist results other than a single score.
+    """
+    name = None
+    needs_pixels = True
+    size = ANALYSIS_SIZE
+    batch_size = 1
+
+    def start(self) -> None:
+        """Acquire resources such as worker pools before the run."""
+
+    def close(self) -> None:
+        """Release resources acquired in start(); called even if the run fails."""
+
+    def analyze(self, frame: Frame) -> Any:
+        raise NotImplementedError
+
+    def analyze_batch(self, frames: list[Frame]) -> list[Any]:
+        return [self.analyze(frame) for frame in frames]
+
+    def store(self, store: MetadataStore, frame: Frame, result: Any) -> None:
+        store.set_score(frame.name, frame.stat, self.name, result)
+
+    def load(self, store: MetadataStore, name: str) -> Any:
+        """Return a stored result for a file analyzed in an earlier run."""
+        return store.get_scores(name).get(self.name)
+
+
+class MoveAction:
+    """Move a file into a subfolder when predicate(results) is true."""
+    def __init__(self, directory: str, subfolder: str, predicate: Callable[[dict], bool]):
+        self.name = subfolder
+        self.directory = directory
+        self.dest_dir = os.path.join(directory, subfolder)
+        self.predicate = predicate
+
+    def __call__(self, frame: Frame, results: dict) -> bool:
+        try:
+            if not self.predicate(results):
+                return False
+        except (KeyError, TypeError):
+            return False
+        os.makedirs(self.dest_dir, exist_ok=True)
+        ImageProcessor.move_file(frame.name, self.directory, self.dest_dir)
+        file_log.info("Moved %s to %s/", frame.name, self.name)
+        return True
+
+
+class MirrorAction:
+    """Copy freshly computed tags onto the file with a TagMirror."""
+    name = 'tagged'
+
+    def __init__(self, mirror: TagMirror, analyzer_name: str = 'tags'):
+        self.mirror = mirror
+        self.analyzer_name = analyzer_name
+
+    def __call__(self, frame: Frame, results: dict) -> bool:
+        # Files tagged in an earlier run were mirrored back then
+        if not frame.todo:
+            return False
+        classifications = results.get(self.analyzer_name)
+        if not classifications:
+            file_log.info("No classifications above threshold for %s", frame.name)
+            return False
+        if file_log.isEnabledFor(logging.INFO):
+            file_log.info("Classifications for %s: %s", frame.name,
+                          ", ".join(f"{class_name} ({conf:.2f})" for class_name, conf in classifications))
+        return self.mirror.write(frame.path, [class_name for class_name, _ in classifications])
+
+
+Action = Callable[[Frame, dict], bool]
+
+
+class Pipeline:
+    """
+    scan -> decode -> analyzers -> aggregate -> actions
+
+    Every stage runs in its own thread and hands work on through bounded
+    queues, so a slow stage stalls the ones before it instead of piling up
+    decoded frames. Decoding runs on several threads, as many at once as
+    the disk and CPU keep up with (see declutrr.concurrency) unless
+    decode_workers fixes it. Each image is decoded once, at the largest resolution any
+    of its pending analyzers needs, and shared by all of them. Results are
+    written to the folder's MetadataStore; analyzers that already ran on the
+    current version of a file are skipped, so reruns only analyze new or
+    changed files.
+    """
+    def __init__(self, directory: str, analyzers: list[Analyzer], actions: list[Action] = (),
+                 decode_workers: int | None = None, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 progress: Callable[[], None] | None = None):
+        self.directory = directory
+        self.progress = progress
+        self.analyzers = list(analyzers)
+        self.actions = list(actions)
+        self.decode_workers = decode_workers
+        self.decode_limiter = None
+        self.queue_size = queue_size
+        self.db_path = os.path.join(directory, STORE_FILENAME)
+        self.stats = {'processed': 0, 'analyzed': 0, 'cached': 0, 'failed': 0}
+        for action in self.actions:
+            self.stats[getattr(action, 'name', 'actions')] = 0
+
+    def list_files(self) -> list[str]:
+        # RAW+JPEG pairs are analyzed once, by their JPEG; actions carry the RAW along
+        with os.scandir(self.directory) as entries:
+            return photo_names(sorted(
+                entry.name for entry in entries
+                if entry.name.lower().endswith(VALID_IMAGE_EXTENSIONS) and entry.is_file()
+            ))
+
+    def _scan(self, frames: queue.Queue) -> None:
+        # Runs in its own thread, so it needs its own connection
+        with MetadataStore(self.db_path) as store, span('scan'):
+            for name in self.list_files():
+                if self._stop.is_set():
+                    break
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                todo = [a for a in self.analyzers if not store.is_analyzed(name, stat, a.name)]
+                frames.put(Frame(name, path, stat, todo))
+        for _ in range(self.decode_limiter.maximum):
+            frames.put(DONE)
+
+    def _decode(self, frames: queue.Queue, analyzer_queues: dict, results: queue.Queue) -> None:
+        while (frame := frames.get()) is not DONE:
+            pixel_analyzers = [a for a in frame.todo if a.needs_pixels]
+            if pixel_analyzers:
+                with self.decode_limiter.slot(), span('decode', file=frame.name):
+                    frame.image = decode_for_inference(frame.path, max(a.size for a in pixel_analyzers))
+                if frame.image is None:
+                    results.put((frame, None, None))
+                    continue
+            if not frame.todo:
+                results.put((frame, None, None))
+            for analyzer in frame.todo:
+                analyzer_queues[analyzer.name].put(frame)
+
+        with self._lock:
+            self._decoders_left -= 1
+            last = self._decoders_left == 0
+        if last:
+            for analyzer_queue in analyzer_queues.values():
+                analyzer_queue.put(DONE)
+            results.put(DONE)
+
+    def _analyze(self, analyzer: Analyzer, frames: queue.Queue, results: queue.Queue) -> None:
+        finished = False
+        while not finished:
+            batch = [frames.get()]
+            # Fill the batch with whatever is already waiting, without stalling
+            while len(batch) < analyzer.batch_size and batch[-1] is not DONE:
+                try:
+                    batch.append(frames.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is DONE:
+                batch.pop()
+                finished = True
+            if not batch:
+                continue
+            try:
+                with span(analyzer.name, batch=len(batch)):
+                    outputs = analyzer.analyze_batch(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    logging.error(f"{analyzer.name} failed on {batch[0].name}: {e}")
+                    outputs = [e]
+                else:
+                    # One bad file shouldn't fail the others of its batch
+                    logging.warning(f"{analyzer.name} failed on a batch of {len(batch)} ({e}), retrying one by one")
+                    outputs = [self._analyze_one(analyzer, frame) for frame in batch]
+            for frame, output in zip(batch, outputs):
+                results.put((frame, analyzer, output))
+        results.put(DONE)
+
+    def _analyze_one(self, analyzer: Analyzer, frame: Frame) -> Any:
+        """The result of analyzer on frame alone, or the exception it raised."""
+        try:
+            with span(analyzer.name, batch=1):
+                return analyzer.analyze_batch([frame])[0]
+        except Exception as e:
+            logging.error(f"{analyzer.name} failed on {frame.name}: {e}")
+            return e
+
+    def _finish(self, store: MetadataStore, frame: Frame, fresh: dict) -> None:
+        frame.image = None
+        frame._gray = None
+        if self.progress is not None:
+            self.progress()
+        if frame.todo and not fresh:
+            # Decoding failed, nothing was analyzed
+            self.stats['failed'] += 1
+            return
+
+        # Successful results are kept even if another analyzer failed,
+        # so a rerun only repeats the failed analysis
+        results = {}
+        failed = False
+        for analyzer in self.analyzers:
+            if analyzer.name not in fresh:
+                results[analyzer.name] = analyzer.load(store, frame.name)
+            elif isinstance(fresh[analyzer.name], Exception):
+                failed = True
+            else:
+                analyzer.store(store, frame, fresh[analyzer.name])
+                results[analyzer.name] = fresh[analyzer.name]
+        if failed:
+            self.stats['failed'] += 1
+            return
+
+        self.stats['analyzed' if fresh else 'cached'] += 1
+        self.stats['processed'] += 1
+
+        for action in self.actions:
+            try:
+                if action(frame, results):
+                    self.stats[getattr(action, 'name', 'actions')] += 1
+            except Exception as e:
+                logging.error(f"Action failed for {frame.name}: {e}")
+
+    def run(self) -> dict:
+        """Analyze the folder and return statistics."""
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Threads for the most decoders that may run; the limiter decides how many do
+        self.decode_limiter = ConcurrencyLimiter('decode', PIPELINE_DECODE_MAX_WORKERS, self.decode_workers,
+                                                 initial=PIPELINE_DECODE_WORKERS)
+        self._decoders_left = self.decode_limiter.maximum
+
+        frames = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue(maxsize=self.queue_size)
+        analyzer_queues = {a.name: queue.Queue(maxsize=self.queue_size) for a in self.analyzers}
+
+        threads = [threading.Thread(target=self._scan, args=(frames,), name='scan', daemon=True)]
+        threads += [
+            threading.Thread(target=self._decode, args=(frames, analyzer_queues, results),
+                             name=f'decode-{i}', daemon=True)
+            for i in range(self.decode_limiter.maximum)
+        ]
+        threads += [
+            threading.Thread(target=self._analyze, args=(a, analyzer_queues[a.name], results),
+                             name=f'analyze-{a.name}', daemon=True)
+            for a in self.analyzers
+        ]
+
+        pending = {}
+        finished = 0
+        remaining_streams = 1 + len(self.analyzers)
+        with MetadataStore(self.db_path) as store:
+            try:
+                for analyzer in self.analyzers:
+                    analyzer.start()
+                for thread in threads:
+                    thread.start()
+                while remaining_streams:
+                    message = results.get()
+                    if message is DONE:
+                        remaining_streams -= 1
+                        continue
+                    frame, analyzer, output = message
+                    fresh = pending.setdefault(id(frame), {})
+                    if analyzer is not None:
+                        fresh[analyzer.name] = output
+                    if analyzer is None or len(fresh) == len(frame.todo):
+                        del pending[id(frame)]
+                        with span('store', file=frame.name):
+                            self._finish(store, frame, fresh)
+                        # Failed frames count too, so a run of failures doesn't commit on every message
+                        finished += 1
+                        if finished % PIPELINE_COMMIT_EVERY == 0:
+                            store.commit()
+            finally:
+                self._stop.set()
+                store.commit()
+                for analyzer in self.analyzers:
+                    analyzer.close()
+                self.decode_limiter.report()
+        return self.stats
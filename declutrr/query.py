@@ -0,0 +1,88 @@
+import os
+import re
+
+from declutrr.constants import *
+from declutrr.store import MetadataStore, tag_lookups
+
+SCORE_TERM = re.compile(r'^(\w+)\s*(<=|>=|!=|<|>|=)\s*(-?\d+(?:\.\d+)?)$')
+TAG_TERM = re.compile(r'^(?:tag:|tagged\s+)(.+)$', re.IGNORECASE)
+TERM_SEPARATOR = re.compile(r'\s+and\s+|\s*,\s*', re.IGNORECASE)
+
+
+def parse_filter(text: str) -> list[tuple]:
+    """
+    Parse a filter expression into conditions.
+
+    Terms are joined with 'and' or commas and are either score comparisons
+    ('blur < 90'), tags ('tag:document' or 'tagged document') or a preset
+    name from FILTER_PRESETS ('screenshots').
+
+    Raises ValueError for terms that can't be parsed.
+    """
+    conditions = []
+    for term in TERM_SEPARATOR.split(text.strip()):
+        term = term.strip()
+        if not term:
+            continue
+        if term.lower() in FILTER_PRESETS:
+            conditions.extend(parse_filter(FILTER_PRESETS[term.lower()]))
+        elif match := TAG_TERM.match(term):
+            conditions.append(('tag', match.group(1).strip()))
+        elif match := SCORE_TERM.match(term):
+            name, operator, value = match.groups()
+            conditions.append(('score', name, operator, float(value)))
+        else:
+            raise ValueError(f"Can't parse filter term '{term}'")
+
+    if not conditions:
+        raise ValueError("Empty filter")
+    return conditions
+
+
+def compile_filter(conditions: list[tuple]) -> tuple[str, list]:
+    """Turn parsed conditions into a query over the store, one index lookup per term."""
+    subqueries = []
+    params = []
+    for condition in conditions:
+        if condition[0] == 'tag':
+            # Looked up like MetadataStore.find_files() does
+            lookups, values = tag_lookups([condition[1]])
+            subqueries.extend(lookups)
+            params.extend(values)
+        else:
+            _, name, operator, value = condition
+            # Operator comes from the SCORE_TERM whitelist, never from raw input
+            subqueries.append(f"SELECT file_id FROM file_scores WHERE name = ? AND value {operator} ?")
+            params.extend([name, value])
+
+    sql = (f"SELECT name, size, mtime_ns FROM files "
+           f"WHERE id IN ({' INTERSECT '.join(subqueries)}) ORDER BY name")
+    return sql, params
+
+
+def select_files(directory: str, text: str) -> list[str]:
+    """
+    Return images in directory matching a filter, using only stored results.
+
+    Only the matches are stat'ed, to drop files that were moved away or
+    changed since they were analyzed; the rest of the folder is never touched.
+    """
+    sql, params = compile_filter(parse_filter(text))
+    db_path = os.path.join(directory, STORE_FILENAME)
+    if not os.path.exists(db_path):
+        return []
+
+    with MetadataStore(db_path) as store:
+        rows = store.conn.execute(sql, params).fetchall()
+
+    files = []
+    for name, size, mtime_ns in rows:
+        if os.path.dirname(name):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+            files.append(name)
+    return files
@@ -0,0 +1,288 @@
+"""
+Embedded previews of RAW files, and HEIC decoding.
+
+Cameras store a full-size (or nearly full-size) JPEG inside every RAW file
+for their own screen. Reading just that JPEG costs a few MB of a 25-60 MB
+file, and decoding it is as fast as any other JPEG, with no demosaicing.
+
+TIFF-based formats (CR2, NEF, ARW, DNG, ORF, RW2, PEF) point at their
+JPEGs from IFD entries: JPEGInterchangeFormat, or a single JPEG strip.
+Sensor data stored as lossless JPEG (CR2, DNG) looks the same from the
+IFDs, so candidates are told apart by their SOF marker. Canon's CR3 is
+ISO base media, like MP4; its first track holds the full-size JPEG.
+
+HEIC/HEIF files are decoded by pillow-heif when it is installed.
+"""
+import io
+import os
+import struct
+import logging
+import functools
+from datetime import datetime
+
+from PIL import Image
+
+from declutrr.constants import *
+
+# TIFF/EXIF tags
+TAG_COMPRESSION = 259
+TAG_STRIP_OFFSETS = 273
+TAG_ORIENTATION = 274
+TAG_STRIP_BYTE_COUNTS = 279
+TAG_DATETIME = 306
+TAG_SUB_IFDS = 330
+TAG_JPEG_OFFSET = 513
+TAG_JPEG_LENGTH = 514
+TAG_EXIF_IFD = 34665
+TAG_DATETIME_ORIGINAL = 36867
+JPEG_COMPRESSIONS = (6, 7)
+
+# TIFF field type -> (struct format, size); rationals and floats aren't needed
+TIFF_TYPES = {1: ('B', 1), 2: ('s', 1), 3: ('H', 2), 4: ('I', 4), 7: ('B', 1), 9: ('i', 4), 13: ('I', 4), 16: ('Q', 8)}
+MAX_IFDS = 32
+MAX_IFD_ENTRIES = 1024
+
+# Baseline, extended and progressive JPEG; lossless (SOF3) is sensor data
+LOSSY_SOF_MARKERS = (0xC0, 0xC1, 0xC2)
+
+# Where CR3 files keep their TIFF-style metadata (CMT1 = IFD0, CMT2 = EXIF)
+CANON_UUID = bytes.fromhex('85c0b687820f11e08111f4ce462b6a48')
+
+
+def is_raw(filename: str) -> bool:
+    return filename.lower().endswith(RAW_EXTENSIONS)
+
+
+def _read_at(f, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError(f"truncated at {offset}")
+    return data
+
+
+def _read_ifd(f, base: int, offset: int, order: str) -> tuple[dict, int]:
+    """Entries of the IFD at offset as {tag: (type, count, value or offset bytes)}, and the next IFD's offset."""
+    count = struct.unpack(order + 'H', _read_at(f, base + offset, 2))[0]
+    if count > MAX_IFD_ENTRIES:
+        raise ValueError(f"implausible IFD at {offset}")
+    data = _read_at(f, base + offset + 2, count * 12 + 4)
+    entries = {}
+    for i in range(count):
+        tag, kind, n, value = struct.unpack_from(order + 'HHI4s', data, i * 12)
+        entries[tag] = (kind, n, value)
+    return entries, struct.unpack_from(order + 'I', data, count * 12)[0]
+
+
+def _values(f, base: int, order: str, entries: dict, tag: int) -> list:
+    if tag not in entries:
+        return []
+    kind, n, value = entries[tag]
+    if kind not in TIFF_TYPES or n > MAX_IFD_ENTRIES * 16:
+        return []
+    fmt, size = TIFF_TYPES[kind]
+    data = value if n * size <= 4 else _read_at(f, base + struct.unpack(order + 'I', value)[0], n * size)
+    if fmt == 's':
+        return [data[:n].split(b'\0')[0].decode('ascii', 'replace')]
+    return list(struct.unpack_from(f"{order}{n}{fmt}", data))
+
+
+def _inspect_tiff(f, base: int = 0) -> dict:
+    """JPEG candidates as (offset, length), orientation and capture time of the TIFF at base."""
+    header = _read_at(f, base, 8)
+    order = {b'II': '<', b'MM': '>'}.get(header[:2])
+    if order is None:
+        raise ValueError("not a TIFF container")
+    # The magic number differs between makers (42, 'RO' for ORF, 0x55 for RW2), so it isn't checked
+    info = {'previews': [], 'orientation': None, 'captured': None}
+    pending, seen = [struct.unpack(order + 'I', header[4:])[0]], set()
+    while pending and len(seen) < MAX_IFDS:
+        offset = pending.pop(0)
+        if not offset or offset in seen:
+            continue
+        first = not seen
+        seen.add(offset)
+        entries, next_ifd = _read_ifd(f, base, offset, order)
+        get = functools.partial(_values, f, base, order, entries)
+        if first:
+            info['orientation'] = (get(TAG_ORIENTATION) or [None])[0]
+            # CR3's CMT2 is an EXIF IFD on its own, with the capture time in its first IFD
+            dates = get(TAG_DATETIME_ORIGINAL) or get(TAG_DATETIME)
+            for exif_offset in get(TAG_EXIF_IFD)[:1]:
+                exif, _ = _read_ifd(f, base, exif_offset, order)
+                dates = _values(f, base, order, exif, TAG_DATETIME_ORIGINAL) or dates
+            info['captured'] = (dates or [None])[0]
+        offsets, lengths = get(TAG_JPEG_OFFSET), get(TAG_JPEG_LENGTH)
+        if offsets and lengths:
+            info['previews'].append((base + offsets[0], lengths[0]))
+        strips, counts = get(TAG_STRIP_OFFSETS), get(TAG_STRIP_BYTE_COUNTS)
+        if get(TAG_COMPRESSION)[:1] in ([c] for c in JPEG_COMPRESSIONS) and len(strips) == len(counts) == 1:
+            info['previews'].append((base + strips[0], counts[0]))
+        pending.extend(get(TAG_SUB_IFDS))
+        pending.append(next_ifd)
+    return info
+
+
+def _boxes(f, start: int, end: int):
+    """(type, payload start, end) of the ISO base media boxes between start and end."""
+    position = start
+    while position + 8 <= end:
+        size, kind = struct.unpack('>I4s', _read_at(f, position, 8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', _read_at(f, position + 8, 8))[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header:
+            return
+        yield kind, position + header, position + size
+        position += size
+
+
+def _find_box(f, start: int, end: int, *path: bytes) -> tuple[int, int] | None:
+    for kind, payload, box_end in _boxes(f, start, end):
+        if kind == path[0]:
+            return (payload, box_end) if len(path) == 1 else _find_box(f, payload, box_end, *path[1:])
+    return None
+
+
+def _first_sample(f, stbl: tuple[int, int]) -> tuple[int, int] | None:
+    """Offset and size of a track's first sample, from its sample table."""
+    sizes = _find_box(f, *stbl, b'stsz')
+    wide_offsets = _find_box(f, *stbl, b'co64')
+    offsets = wide_offsets or _find_box(f, *stbl, b'stco')
+    if sizes is None or offsets is None:
+        return None
+    sample_size, count = struct.unpack('>II', _read_at(f, sizes[0] + 4, 8))
+    if not sample_size and count:
+        sample_size = struct.unpack('>I', _read_at(f, sizes[0] + 12, 4))[0]
+    wide = wide_offsets is not None
+    data = _read_at(f, offsets[0] + 4, 12 if wide else 8)
+    if not struct.unpack('>I', data[:4])[0]:
+        return None
+    offset = struct.unpack('>Q' if wide else '>I', data[4:])[0]
+    return offset, sample_size
+
+
+def _inspect_cr3(f, size: int) -> dict:
+    info = {'previews': [], 'orientation': None, 'captured': None}
+    moov = _find_box(f, 0, size, b'moov')
+    if moov is None:
+        raise ValueError("no moov box")
+    tracks = 0
+    for kind, payload, end in _boxes(f, *moov):
+        if kind == b'uuid' and _read_at(f, payload, 16) == CANON_UUID:
+            for name, start, _ in _boxes(f, payload + 16, end):
+                if name in (b'CMT1', b'CMT2'):
+                    meta = _inspect_tiff(f, start)
+                    info['orientation'] = info['orientation'] or meta['orientation']
+                    info['captured'] = meta['captured'] if name == b'CMT2' and meta['captured'] else info['captured']
+        elif kind == b'trak':
+            tracks += 1
+            # Track 1 is the full-size JPEG, the others are small previews and sensor data
+            stbl = _find_box(f, payload, end, b'mdia', b'minf', b'stbl') if tracks == 1 else None
+            sample = _first_sample(f, stbl) if stbl else None
+            if sample:
+                info['previews'].append(sample)
+    return info
+
+
+def _is_lossy_jpeg(f, offset: int) -> bool:
+    """Whether the JPEG at offset is a picture rather than lossless sensor data."""
+    if _read_at(f, offset, 2) != b'\xff\xd8':
+        return False
+    position = offset + 2
+    for _ in range(64):
+        marker = _read_at(f, position, 4)
+        if marker[0] != 0xFF:
+            return False
+        if marker[1] in LOSSY_SOF_MARKERS:
+            return True
+        if marker[1] == 0xDA or 0xC3 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+            return False
+        position += 2 + struct.unpack('>H', marker[2:])[0]
+    return False
+
+
+def inspect_raw(filepath: str) -> dict:
+    """
+    Where filepath's largest embedded JPEG is ('preview': (offset, length) or
+    None), its EXIF orientation and capture time ('YYYY:MM:DD HH:MM:SS').
+    Raises OSError or ValueError for unreadable files.
+    """
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        try:
+            if filepath.lower().endswith('.cr3'):
+                info = _inspect_cr3(f, size)
+            else:
+                info = _inspect_tiff(f)
+            info['preview'] = next(
+                (candidate for candidate in sorted(set(info.pop('previews')), key=lambda c: -c[1])
+                 if RAW_PREVIEW_MIN_BYTES <= candidate[1] and sum(candidate) <= size
+                 and _is_lossy_jpeg(f, candidate[0])),
+                None)
+        except struct.error as e:
+            raise ValueError(f"corrupt container: {e}")
+    return info
+
+
+def read_preview(filepath: str) -> tuple[bytes, int | None] | None:
+    """The embedded JPEG of a RAW file and the orientation to show it in; None if there is none."""
+    try:
+        info = inspect_raw(filepath)
+        if info['preview'] is None:
+            logging.warning(f"No embedded preview in {filepath}")
+            return None
+        with open(filepath, 'rb') as f:
+            return _read_at(f, *info['preview']), info['orientation']
+    except (OSError, ValueError) as e:
+        logging.warning(f"Error reading preview of {filepath}: {e}")
+        return None
+
+
+def raw_capture_date(filepath: str) -> datetime | None:
+    """Capture time of a RAW file on the camera's clock, without reading its preview."""
+    try:
+        captured = inspect_raw(filepath)['captured']
+        return datetime.strptime(captured.strip('\x00 '), '%Y:%m:%d %H:%M:%S') if captured else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def raw_capture_time(filepath: str) -> float | None:
+    """raw_capture_date() as a timestamp, like ImageProcessor.get_creation_time()."""
+    captured = raw_capture_date(filepath)
+    return captured.timestamp() if captured else None
+
+
+@functools.cache
+def register_heif() -> bool:
+    """Let PIL open HEIC/HEIF files; False if pillow-heif isn't installed."""
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError:
+        return False
+    register_heif_opener()
+    return True
+
+
+def open_image(filepath: str) -> Image.Image:
+    """
+    Image.open() for every supported format: RAW files open at their
+    embedded JPEG, with the RAW's orientation in its EXIF for
+    ImageOps.exif_transpose().
+    """
+    if is_raw(filepath):
+        preview = read_preview(filepath)
+        if preview is None:
+            raise ValueError(f"No usable preview in {filepath}")
+        data, orientation = preview
+        image = Image.open(io.BytesIO(data))
+        if orientation and not image.getexif().get(TAG_ORIENTATION):
+            image.getexif()[TAG_ORIENTATION] = orientation
+        return image
+    if filepath.lower().endswith(HEIF_EXTENSIONS):
+        register_heif()
+    return Image.open(filepath)
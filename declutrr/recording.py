@@ -0,0 +1,66 @@
+"""
+Key sequence recording for replay benchmarks.
+
+`declutrr gui --record session.json` writes every sorting keypress with its
+time since the first image was shown; benchmarks/replay.py plays it back
+against the GUI on a generated corpus.
+"""
+import json
+import time
+import random
+import logging
+
+from declutrr.constants import *
+
+RECORDING_VERSION = 1
+
+
+class SessionRecorder:
+    def __init__(self, path: str):
+        self.path = path
+        self.started = None
+        self.events = []
+
+    def start(self) -> None:
+        """Count from now, e.g. once the first image is on screen."""
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def record(self, action: str, keysym: str | None = None) -> None:
+        self.start()
+        self.events.append({'t': round(time.perf_counter() - self.started, 4), 'action': action, 'key': keysym})
+
+    def save(self) -> bool:
+        try:
+            with open(self.path, 'w') as f:
+                json.dump({'version': RECORDING_VERSION, 'events': self.events}, f, indent=1)
+        except OSError as e:
+            logging.warning(f"Could not write recording to {self.path}: {e}")
+            return False
+        logging.info(f"Recorded {len(self.events)} keypresses to {self.path}")
+        return True
+
+
+def load_recording(path: str) -> list[dict]:
+    """Events of a recording, in order; raises ValueError for files that aren't one."""
+    with open(path) as f:
+        recording = json.load(f)
+    if not isinstance(recording, dict) or recording.get('version') != RECORDING_VERSION:
+        raise ValueError(f"{path} is not a declutrr recording")
+    events = recording['events']
+    unknown = {event['action'] for event in events} - set(RECORDED_ACTIONS)
+    if unknown:
+        raise ValueError(f"{path} has unknown actions: {', '.join(sorted(unknown))}")
+    return sorted(events, key=lambda event: event['t'])
+
+
+def synthetic_recording(count: int, seed: int = 0, think_time: float = REPLAY_THINK_TIME) -> list[dict]:
+    """A made-up session of count keypresses: mostly keeps and deletes, some skips and undos."""
+    rng = random.Random(seed)
+    actions = rng.choices(list(REPLAY_ACTION_WEIGHTS), weights=list(REPLAY_ACTION_WEIGHTS.values()), k=count)
+    events = []
+    t = 0.0
+    for action in actions:
+        t += rng.expovariate(1 / think_time)
+        events.append({'t': round(t, 4), 'action': action, 'key': None})
+    return events
@@ -0,0 +1,285 @@
+"""
+Priority scheduling for the GUI's background work.
+
+Read-ahead, staging copies, decoding ahead and metadata reads for watched
+files all share one set of worker threads, and the work the user is
+waiting on always goes first:
+
+    PRIORITY_INTERACTIVE  the image being shown next
+    PRIORITY_MOVE         housekeeping after a decision
+    PRIORITY_LOOKAHEAD    read-ahead, staging and decoding of upcoming images
+    PRIORITY_BACKGROUND   metadata of newly arrived files
+
+Python threads can't be preempted, so preemption is cooperative: one
+worker is always kept free for interactive work, lower-priority tasks
+don't start while the UI thread is in an interactive() block, and long
+tasks pause at checkpoint(). Waiting on a task's result() promotes it to
+the waiter's priority, and so are the tasks it is waiting on in turn, e.g.
+the staging copy a decode waits for. Tasks submitted with a key replace a pending task
+with the same key, so stale work is dropped rather than run.
+
+Callbacks never run on worker threads: poll() runs them on the thread that
+calls it, i.e. the Tk thread from an after() loop.
+"""
+import heapq
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future, wait as wait_for
+from typing import Callable
+
+from declutrr.constants import *
+from declutrr.tracing import span
+
+_current = threading.local()
+
+
+class Task(Future):
+    """A Future with a priority; result() promotes it to the waiter's priority."""
+    def __init__(self, scheduler: 'Scheduler', priority: int, function: Callable, args: tuple, kwargs: dict,
+                 key=None, callback: Callable[['Task'], None] | None = None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.priority = priority
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.callback = callback
+        self.blocked_on = set()  # tasks this one is waiting for, promoted along with it
+
+    def result(self, timeout: float | None = None):
+        with self.scheduler.waiting(self):
+            return super().result(timeout)
+
+    def exception(self, timeout: float | None = None):
+        with self.scheduler.waiting(self):
+            return super().exception(timeout)
+
+
+def current_priority() -> int:
+    """Priority of the task running on this thread; interactive outside workers (i.e. the UI)."""
+    task = getattr(_current, 'task', None)
+    return task.priority if task is not None else PRIORITY_INTERACTIVE
+
+
+def checkpoint() -> None:
+    """Called from long tasks between chunks of work: pauses while interactive work runs."""
+    task = getattr(_current, 'task', None)
+    if task is not None:
+        task.scheduler._yield(task)
+
+
+class Scheduler:
+    def __init__(self, workers: int = SCHEDULER_WORKERS, name: str = 'worker'):
+        self.workers = max(2, workers)
+        self.name = name
+        self.queue = []  # (priority, sequence, task)
+        self.sequence = itertools.count()
+        self.keyed = {}  # key -> pending task
+        self.busy = 0  # workers running non-interactive tasks
+        self.interactive_busy = 0  # interactive() blocks and interactive tasks running
+        self.finished = []  # tasks with callbacks, for poll()
+        self.condition = threading.Condition()
+        self.threads = []
+        self.closed = False
+
+    def _start_workers(self) -> None:
+        """Workers start with the first task, so a scheduler that is never used costs nothing."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, function: Callable, *args, priority: int = PRIORITY_BACKGROUND, key=None,
+               callback: Callable[[Task], None] | None = None, **kwargs) -> Task:
+        """
+        Queue function(*args, **kwargs). A pending task with the same key is
+        cancelled. callback(task) runs from poll() once the task is done.
+        """
+        task = Task(self, priority, function, args, kwargs, key, callback)
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("Scheduler is shut down")
+            if not self.threads:
+                self._start_workers()
+            if key is not None:
+                stale = self.keyed.pop(key, None)
+                if stale is not None:
+                    stale.cancel()
+                self.keyed[key] = task
+            heapq.heappush(self.queue, (priority, next(self.sequence), task))
+            self.condition.notify()
+        return task
+
+    def executor(self, priority: int) -> 'PriorityExecutor':
+        """An Executor that submits here at priority, for code written against ThreadPoolExecutor."""
+        return PriorityExecutor(self, priority)
+
+    def cancel(self, key) -> bool:
+        """Cancel the pending task with key; False if there is none or it already started."""
+        with self.condition:
+            task = self.keyed.pop(key, None)
+        return task is not None and task.cancel()
+
+    def promote(self, task: Task, priority: int) -> None:
+        """Raise a task to priority, e.g. because someone is now waiting for it."""
+        with self.condition:
+            self._promote(task, priority)
+            self.condition.notify_all()
+
+    def _promote(self, task: Task, priority: int) -> None:
+        """promote() for task and whatever it waits on; the caller holds the lock."""
+        if priority >= task.priority or task.done():
+            return
+        task.priority = priority
+        if not task.running():
+            # The old queue entry is skipped, since its priority no longer matches
+            heapq.heappush(self.queue, (priority, next(self.sequence), task))
+        elif priority == PRIORITY_INTERACTIVE:
+            self.interactive_busy += 1
+            self.busy -= 1
+        # Otherwise a promoted task could sit waiting on one that pauses at checkpoint()
+        for blocker in list(task.blocked_on):
+            self._promote(blocker, priority)
+
+    @contextmanager
+    def waiting(self, task: Task):
+        """Promote task to this thread's priority while the block waits on it."""
+        waiter = getattr(_current, 'task', None)
+        with self.condition:
+            self._promote(task, current_priority())
+            if waiter is not None:
+                waiter.blocked_on.add(task)
+            self.condition.notify_all()
+        try:
+            yield
+        finally:
+            if waiter is not None:
+                with self.condition:
+                    waiter.blocked_on.discard(task)
+
+    @contextmanager
+    def interactive(self):
+        """Hold back other work while the block runs, e.g. decoding the image about to be shown."""
+        with self.condition:
+            self.interactive_busy += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.interactive_busy -= 1
+                self.condition.notify_all()
+
+    def _yield(self, task: Task) -> None:
+        with self.condition:
+            while self.interactive_busy and task.priority != PRIORITY_INTERACTIVE and not self.closed:
+                self.condition.wait()
+
+    def _runnable(self, priority: int) -> bool:
+        """Interactive tasks always run; the rest leave one worker free and wait for interactive work."""
+        if priority == PRIORITY_INTERACTIVE:
+            return True
+        return not self.interactive_busy and self.busy < self.workers - 1
+
+    def _next(self) -> Task | None:
+        with self.condition:
+            while True:
+                if self.closed:
+                    return None
+                while self.queue:
+                    priority, _, task = self.queue[0]
+                    if task.cancelled() or task.running() or task.done() or priority != task.priority:
+                        heapq.heappop(self.queue)
+                        continue
+                    break
+                if self.queue and self._runnable(self.queue[0][0]):
+                    priority, _, task = heapq.heappop(self.queue)
+                    if task.key is not None and self.keyed.get(task.key) is task:
+                        del self.keyed[task.key]
+                    if not task.set_running_or_notify_cancel():
+                        continue
+                    if priority == PRIORITY_INTERACTIVE:
+                        self.interactive_busy += 1
+                    else:
+                        self.busy += 1
+                    return task
+                self.condition.wait()
+
+    def _work(self) -> None:
+        while True:
+            task = self._next()
+            if task is None:
+                return
+            _current.task = task
+            try:
+                with span(getattr(task.function, '__name__', 'task'), 'scheduler', priority=task.priority):
+                    result = task.function(*task.args, **task.kwargs)
+            except BaseException as e:
+                task.set_exception(e)
+            else:
+                task.set_result(result)
+            finally:
+                _current.task = None
+                with self.condition:
+                    if task.priority == PRIORITY_INTERACTIVE:
+                        self.interactive_busy -= 1
+                    else:
+                        self.busy -= 1
+                    if task.callback is not None:
+                        self.finished.append(task)
+                    self.condition.notify_all()
+
+    def poll(self) -> int:
+        """Run the callbacks of finished tasks on this thread; returns how many ran."""
+        with self.condition:
+            finished, self.finished = self.finished, []
+        for task in finished:
+            try:
+                task.callback(task)
+            except Exception as e:
+                logging.warning(f"Callback of {getattr(task.function, '__name__', 'task')} failed: {e}")
+        return len(finished)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Cancel pending tasks and stop the workers once their current task is done."""
+        with self.condition:
+            self.closed = True
+            for _, _, task in self.queue:
+                task.cancel()
+            self.queue = []
+            self.keyed = {}
+            self.condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+
+class PriorityExecutor(Executor):
+    """Submits to a Scheduler at one priority; shutdown() only affects its own tasks."""
+    def __init__(self, scheduler: Scheduler, priority: int):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.tasks = set()
+        self.lock = threading.Lock()
+
+    def submit(self, function: Callable, /, *args, **kwargs) -> Task:
+        task = self.scheduler.submit(function, *args, priority=self.priority, **kwargs)
+        with self.lock:
+            self.tasks.add(task)
+        task.add_done_callback(self._forget)
+        return task
+
+    def _forget(self, task: Task) -> None:
+        with self.lock:
+            self.tasks.discard(task)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self.lock:
+            tasks = list(self.tasks)
+        if cancel_futures:
+            for task in tasks:
+                task.cancel()
+        if wait:
+            wait_for(tasks)
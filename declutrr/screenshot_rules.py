@@ -0,0 +1,120 @@
+import os
+import logging
+from typing import Callable
+
+from PIL import Image
+from declutrr.constants import *
+
+# EXIF tags read from the header
+TAG_MAKE = 271
+TAG_MODEL = 272
+TAG_SOFTWARE = 305
+
+# Only these formats are probed, so Image.open doesn't walk every plugin
+HEADER_FORMATS = ('JPEG', 'PNG')
+
+HeaderRule = Callable[[dict], bool]
+
+
+def read_header(filepath: str) -> dict | None:
+    """
+    Collect screenshot-relevant header fields without decoding pixel data.
+
+    Image.open only parses the file header; EXIF is taken from the raw
+    APP1/eXIf payload instead of getexif(), which loads PNGs completely.
+    """
+    try:
+        with Image.open(filepath, formats=HEADER_FORMATS) as img:
+            width, height = img.size
+            raw_exif = img.info.get('exif')
+            header = {
+                'width': width,
+                'height': height,
+                'format': img.format,
+                'has_exif': bool(raw_exif),
+                'srgb': 'srgb' in img.info,
+                'make': None,
+                'model': None,
+                'software': None,
+            }
+    except Exception as e:
+        logging.debug(f"Could not read header of {filepath}: {e}")
+        return None
+
+    if raw_exif:
+        try:
+            exif = Image.Exif()
+            exif.load(raw_exif)
+            header['make'] = exif.get(TAG_MAKE)
+            header['model'] = exif.get(TAG_MODEL)
+            header['software'] = exif.get(TAG_SOFTWARE)
+        except Exception as e:
+            logging.debug(f"Invalid EXIF in {filepath}: {e}")
+
+    return header
+
+
+def _matches_screen_resolution(header: dict) -> bool:
+    size = (min(header['width'], header['height']), max(header['width'], header['height']))
+    return size in SCREEN_RESOLUTIONS
+
+
+def _has_no_camera(header: dict) -> bool:
+    return not header['make'] and not header['model']
+
+
+def _has_screenshot_software(header: dict) -> bool:
+    software = header['software']
+    if not isinstance(software, str):
+        return False
+    software = software.lower()
+    return any(name in software for name in SCREENSHOT_SOFTWARE)
+
+
+def _is_png_srgb_without_exif(header: dict) -> bool:
+    return header['format'] == 'PNG' and header['srgb'] and not header['has_exif']
+
+
+# (name, weight, predicate) - append to this table to add new rules
+SCREENSHOT_RULES: list[tuple[str, int, HeaderRule]] = [
+    ('screen_resolution', 3, _matches_screen_resolution),
+    ('no_camera', 1, _has_no_camera),
+    ('screenshot_software', 4, _has_screenshot_software),
+    ('png_srgb_no_exif', 2, _is_png_srgb_without_exif),
+]
+
+
+def score_header(header: dict) -> tuple[int, list[str]]:
+    """Return the summed weight and names of all rules matching the header."""
+    score = 0
+    matched = []
+    for name, weight, rule in SCREENSHOT_RULES:
+        if rule(header):
+            score += weight
+            matched.append(name)
+    return score, matched
+
+
+def screenshot_score(filepath: str) -> int:
+    """Score a file against the screenshot rules; unreadable files score 0."""
+    header = read_header(filepath)
+    if header is None:
+        return 0
+    return score_header(header)[0]
+
+
+def is_screenshot(filepath: str, threshold: int = SCREENSHOT_SCORE_THRESHOLD) -> bool:
+    """Check whether a file looks like a screenshot from header data alone."""
+    return screenshot_score(filepath) >= threshold
+
+
+def find_screenshots(directory: str, threshold: int = SCREENSHOT_SCORE_THRESHOLD) -> list[str]:
+    """Return names of likely screenshots in directory."""
+    screenshots = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.lower().endswith(VALID_IMAGE_EXTENSIONS) or not entry.is_file():
+                continue
+            if is_screenshot(entry.path, threshold):
+                screenshots.append(entry.name)
+    return sorted(screenshots)
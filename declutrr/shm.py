@@ -0,0 +1,186 @@
+import atexit
+import signal
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Any, Callable, NamedTuple
+
+from declutrr.constants import *
+from declutrr.pipeline import Analyzer, Frame
+
+
+class FrameRef(NamedTuple):
+    """Where a frame sits in a ring; small enough to pickle for free."""
+    slot: int
+    shape: tuple
+    dtype: str
+
+
+class FrameRing:
+    """
+    Fixed number of frame-sized slots in one shared memory block.
+
+    The creating process writes frames into free slots and passes FrameRefs
+    to workers, which view the pixels in place. Slots are handed out by
+    acquire(), which blocks while all of them are in use, so the ring also
+    bounds how many frames are in flight.
+
+    Only the creator unlinks the block: on close(), at interpreter exit, or,
+    if the process is killed, through multiprocessing's resource tracker,
+    which removes shared memory its owner leaked.
+    """
+    def __init__(self, slots: int, slot_bytes: int, name: str | None = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+            self._free = list(range(slots))
+            self._available = threading.Condition()
+            atexit.register(self.close)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._closed = False
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slot_bytes: int) -> 'FrameRing':
+        """Open an existing ring from a worker process."""
+        return cls(slots, slot_bytes, name=name)
+
+    def acquire(self, timeout: float | None = None) -> int:
+        """Wait for a free slot and return its index."""
+        with self._available:
+            if not self._available.wait_for(lambda: self._free, timeout):
+                raise TimeoutError("No free frame slot")
+            return self._free.pop()
+
+    def release(self, slot: int) -> None:
+        """Return a slot once the worker is done with it."""
+        with self._available:
+            self._free.append(slot)
+            self._available.notify()
+
+    def write(self, slot: int, array) -> FrameRef:
+        """Copy a frame into a slot; the only copy on the way to the worker."""
+        if array.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {array.nbytes} bytes exceeds slot size {self.slot_bytes}")
+        view = self.view(FrameRef(slot, array.shape, array.dtype.str))
+        view[...] = array
+        return FrameRef(slot, array.shape, array.dtype.str)
+
+    def view(self, ref: FrameRef):
+        """NumPy array backed by the slot's shared memory, without copying."""
+        import numpy as np
+        return np.ndarray(ref.shape, dtype=np.dtype(ref.dtype), buffer=self.shm.buf,
+                          offset=ref.slot * self.slot_bytes)
+
+    def close(self) -> None:
+        """Detach, and unlink the block if this process created it."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.shm.close()
+        except BufferError:
+            # A view is still alive; the mapping goes away with the process
+            logging.debug(f"Shared memory {self.name} still referenced at close")
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            atexit.unregister(self.close)
+
+    def __enter__(self) -> 'FrameRing':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# Ring attached by each worker process in _init_worker
+_worker_ring = None
+
+
+def _init_worker(name: str, slots: int, slot_bytes: int) -> None:
+    global _worker_ring
+    # Ctrl-C is handled by the parent, which shuts the pool down and unlinks the ring
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_ring = FrameRing.attach(name, slots, slot_bytes)
+
+
+def _run_in_worker(function: Callable, ref: FrameRef) -> Any:
+    return function(_worker_ring.view(ref))
+
+
+class ProcessAnalyzer(Analyzer):
+    """
+    Runs a CPU-bound function on frames in a pool of worker processes.
+
+    Frames reach the workers through a FrameRing instead of being pickled.
+    function must be a module-level function taking a NumPy array, e.g.
+    declutrr.analyzers.laplacian_variance; pixels selects 'gray' or 'rgb'.
+    """
+    def __init__(self, name: str, function: Callable, pixels: str = 'gray',
+                 workers: int | None = None, size: int = ANALYSIS_SIZE):
+        self.name = name
+        self.function = function
+        self.pixels = pixels
+        self.size = size
+        self.workers = workers or multiprocessing.cpu_count()
+        # Enough frames per batch to keep every worker busy
+        self.batch_size = self.workers * 2
+        self.ring = None
+        self.pool = None
+
+    def start(self) -> None:
+        channels = 1 if self.pixels == 'gray' else 3
+        self.ring = FrameRing(self.batch_size, self.size * self.size * channels)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.ring.name, self.ring.slots, self.ring.slot_bytes)
+        )
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def _pixels(self, frame: Frame):
+        import numpy as np
+        image = frame.image
+        # Another analyzer may have asked for a larger decode than a slot holds
+        if max(image.size) > self.size:
+            image = image.copy()
+            image.thumbnail((self.size, self.size))
+        elif self.pixels == 'gray':
+            return frame.gray
+        return np.asarray(image.convert('L' if self.pixels == 'gray' else 'RGB'))
+
+    def analyze_batch(self, frames: list[Frame]) -> list[Any]:
+        submitted = []
+        try:
+            for frame in frames:
+                slot = self.ring.acquire()
+                ref = self.ring.write(slot, self._pixels(frame))
+                submitted.append((slot, self.pool.submit(_run_in_worker, self.function, ref)))
+            results = []
+            for _, future in submitted:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+            return results
+        finally:
+            # A slot can only be reused once no worker can still be reading it
+            wait([future for _, future in submitted if not future.cancel()])
+            for slot, _ in submitted:
+                self.ring.release(slot)
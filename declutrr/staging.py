@@ -0,0 +1,158 @@
+import os
+import re
+import sys
+import shutil
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from declutrr.constants import *
+from declutrr.tracing import traced
+from declutrr.scheduler import checkpoint
+
+
+def default_staging_root() -> str:
+    """Per-user cache folder, normally on the local disk."""
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_dir, STAGING_DIRNAME)
+
+
+def is_network_mount(path: str) -> bool:
+    """Whether path is on an NFS/SMB/sshfs mount, going by /proc/self/mounts (Linux only)."""
+    if not sys.platform.startswith('linux'):
+        return False
+    path = os.path.realpath(path)
+    best, fstype = '', None
+    try:
+        with open('/proc/self/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # Spaces etc. in mount points are octal escaped
+                mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+                inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+                if inside and len(mount_point) >= len(best):
+                    best, fstype = mount_point, fields[2]
+    except OSError:
+        return False
+    return fstype in NETWORK_FILESYSTEMS
+
+
+def copy_in_chunks(source: str, target: str) -> None:
+    """Copy a file, pausing between chunks while the file being shown is read."""
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        while chunk := src.read(STAGING_CHUNK_BYTES):
+            dst.write(chunk)
+            checkpoint()
+
+
+class StagingCache:
+    """
+    Local copies of the upcoming images of a folder on a network mount.
+
+    stage() copies files in the background, each with one sequential read
+    over the network; path() then hands out the local copy, so metadata
+    reads and decoding never wait on the network. Disk usage stays under
+    max_bytes by dropping the copies used longest ago. Copies live in a
+    per-session folder that close() removes.
+    """
+    def __init__(self, directory: str, root: str | None = None, max_bytes: int = STAGING_MAX_BYTES,
+                 workers: int = STAGING_WORKERS, executor: Executor | None = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        root = root or default_staging_root()
+        os.makedirs(root, exist_ok=True)
+        self.cache_dir = tempfile.mkdtemp(prefix='session-', dir=root)
+        self.staged = OrderedDict()  # name -> size, oldest first
+        self.pending = {}  # name -> Future of a running copy
+        self.wanted = set()
+        self.used = 0
+        self.lock = threading.Lock()
+        # The GUI passes its scheduler's lookahead lane; otherwise copies get their own threads
+        self.pool = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix='staging')
+
+    def _reserve(self, name: str, size: int) -> bool:
+        """Make room for size bytes, dropping copies that aren't wanted now."""
+        with self.lock:
+            for old in list(self.staged):
+                if self.used + size <= self.max_bytes:
+                    break
+                if old not in self.wanted:
+                    self._remove(old)
+            if self.used + size > self.max_bytes:
+                return False
+            self.used += size
+            return True
+
+    def _remove(self, name: str) -> None:
+        """Drop a copy; the caller holds the lock."""
+        self.used -= self.staged.pop(name)
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    @traced('stage')
+    def _copy(self, name: str) -> bool:
+        source = os.path.join(self.directory, name)
+        target = os.path.join(self.cache_dir, name)
+        try:
+            size = os.path.getsize(source)
+            if not self._reserve(name, size):
+                logging.debug(f"Not staging {name}: over the {self.max_bytes} byte limit")
+                return False
+            partial = target + '.part'
+            try:
+                copy_in_chunks(source, partial)
+                os.replace(partial, target)
+            except OSError:
+                with self.lock:
+                    self.used -= size
+                raise
+            with self.lock:
+                self.staged[name] = size
+            return True
+        except OSError as e:
+            logging.warning(f"Could not stage {name}: {e}")
+            return False
+        finally:
+            with self.lock:
+                self.pending.pop(name, None)
+
+    def stage(self, filenames: list[str]) -> None:
+        """Start copying the given upcoming files; earlier requests that aren't in the list may be dropped."""
+        with self.lock:
+            self.wanted = set(filenames)
+            new = [f for f in filenames if f not in self.staged and f not in self.pending]
+            for name in new:
+                self.pending[name] = self.pool.submit(self._copy, name)
+
+    def path(self, filename: str) -> str:
+        """Local copy of filename if there is one, waiting for a running copy; else the original."""
+        with self.lock:
+            future = self.pending.get(filename)
+            # Not started yet behind other copies: reading it directly is quicker
+            if future is not None and future.cancel():
+                del self.pending[filename]
+                future = None
+        if future is not None:
+            future.result()
+        with self.lock:
+            if filename in self.staged:
+                self.staged.move_to_end(filename)
+                return os.path.join(self.cache_dir, filename)
+        return os.path.join(self.directory, filename)
+
+    def evict(self, filename: str) -> None:
+        """Drop the copy of a decided file."""
+        with self.lock:
+            self.wanted.discard(filename)
+            if filename in self.staged:
+                self._remove(filename)
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,250 @@
+import os
+import sqlite3
+import logging
+
+from declutrr.constants import *
+from declutrr.staging import is_network_mount
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    analyzer TEXT NOT NULL,
+    PRIMARY KEY (file_id, analyzer)
+);
+CREATE TABLE IF NOT EXISTS file_tags (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    confidence REAL,
+    PRIMARY KEY (file_id, tag)
+);
+-- Inverted index: tag -> files, so tag queries never scan every file
+CREATE INDEX IF NOT EXISTS file_tags_by_tag ON file_tags (tag, file_id);
+CREATE TABLE IF NOT EXISTS file_scores (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (file_id, name)
+);
+-- Range queries like blur < 90 read only the matching slice
+CREATE INDEX IF NOT EXISTS file_scores_by_value ON file_scores (name, value, file_id);
+-- 64-bit hashes don't fit a REAL score exactly
+CREATE TABLE IF NOT EXISTS file_hashes (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (file_id, name)
+);
+"""
+
+ANALYZER_TAGS = 'tags'
+
+
+def tag_lookups(all_tags: list[str] = (), any_tags: list[str] = ()) -> tuple[list[str], list]:
+    """
+    Subqueries selecting the ids of files carrying each tag in all_tags and
+    one for any tag in any_tags, with their parameters, to be INTERSECTed.
+    """
+    subqueries = []
+    params = []
+    for tag in dict.fromkeys(all_tags):
+        subqueries.append("SELECT file_id FROM file_tags WHERE tag = ?")
+        params.append(tag)
+    if any_tags:
+        placeholders = ", ".join("?" for _ in any_tags)
+        subqueries.append(f"SELECT file_id FROM file_tags WHERE tag IN ({placeholders})")
+        params.extend(any_tags)
+    return subqueries, params
+
+
+class MetadataStore:
+    """
+    SQLite store for per-file analysis results of one folder.
+
+    Files are keyed by name relative to the folder together with their size
+    and mtime, so results of a file that changed on disk are discarded and the
+    file is analyzed again.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self._set_journal_mode()
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def _set_journal_mode(self) -> None:
+        """
+        WAL where it works, a rollback journal elsewhere: WAL's shared memory
+        only works between processes on one host, so not on network shares
+        opened from several, and it can't create its -wal and -shm files in
+        read-only folders.
+        """
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        for mode in ['DELETE'] if is_network_mount(directory) else ['WAL', 'DELETE']:
+            try:
+                if self.conn.execute(f"PRAGMA journal_mode={mode}").fetchone()[0].upper() == mode:
+                    return
+            except sqlite3.OperationalError as e:
+                logging.warning(f"Can't use {mode} journal for {self.db_path}: {e}")
+
+    @classmethod
+    def for_directory(cls, directory: str) -> 'MetadataStore':
+        """Open the store kept inside directory."""
+        return cls(os.path.join(directory, STORE_FILENAME))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'MetadataStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _file_id(self, name: str, stat: os.stat_result) -> int:
+        """Return the row id for name, resetting its results if the file changed."""
+        row = self.conn.execute(
+            "SELECT id, size, mtime_ns FROM files WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            cursor = self.conn.execute(
+                "INSERT INTO files (name, size, mtime_ns) VALUES (?, ?, ?)",
+                (name, stat.st_size, stat.st_mtime_ns)
+            )
+            return cursor.lastrowid
+
+        file_id, size, mtime_ns = row
+        if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            self.conn.execute("DELETE FROM analyses WHERE file_id = ?", (file_id,))
+            self.conn.execute("DELETE FROM file_tags WHERE file_id = ?", (file_id,))
+            self.conn.execute("DELETE FROM file_scores WHERE file_id = ?", (file_id,))
+            self.conn.execute("DELETE FROM file_hashes WHERE file_id = ?", (file_id,))
+            self.conn.execute(
+                "UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?",
+                (stat.st_size, stat.st_mtime_ns, file_id)
+            )
+        return file_id
+
+    def is_analyzed(self, name: str, stat: os.stat_result, analyzer: str) -> bool:
+        """Check whether analyzer already ran on the current version of a file."""
+        row = self.conn.execute(
+            """SELECT 1 FROM files JOIN analyses ON analyses.file_id = files.id
+               WHERE files.name = ? AND files.size = ? AND files.mtime_ns = ?
+               AND analyses.analyzer = ?""",
+            (name, stat.st_size, stat.st_mtime_ns, analyzer)
+        ).fetchone()
+        return row is not None
+
+    def _mark_analyzed(self, file_id: int, analyzer: str) -> None:
+        self.conn.execute(
+            "INSERT OR IGNORE INTO analyses (file_id, analyzer) VALUES (?, ?)",
+            (file_id, analyzer)
+        )
+
+    def mark_analyzed(self, name: str, stat: os.stat_result, analyzer: str) -> None:
+        """Mark an analyzer as done for a file that produced no result, e.g. no capture date."""
+        self._mark_analyzed(self._file_id(name, stat), analyzer)
+
+    def remove_file(self, name: str) -> None:
+        """Forget a file that left the folder."""
+        self.conn.execute("DELETE FROM files WHERE name = ?", (name,))
+
+    def rename_file(self, old_name: str, new_name: str) -> None:
+        """
+        Keep the results of a file that was renamed within the folder. Names
+        may be paths into subfolders, which folder queries leave out.
+        """
+        self.conn.execute("DELETE FROM files WHERE name = ?", (new_name,))
+        self.conn.execute("UPDATE files SET name = ? WHERE name = ?", (new_name, old_name))
+
+    def set_tags(self, name: str, stat: os.stat_result, tags: list[tuple[str, float]]) -> None:
+        """Replace the tags of a file; an empty list still marks it as tagged."""
+        file_id = self._file_id(name, stat)
+        self.conn.execute("DELETE FROM file_tags WHERE file_id = ?", (file_id,))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO file_tags (file_id, tag, confidence) VALUES (?, ?, ?)",
+            [(file_id, tag, confidence) for tag, confidence in tags]
+        )
+        self._mark_analyzed(file_id, ANALYZER_TAGS)
+
+    def get_tags(self, name: str) -> list[str]:
+        """Return the tags of a file, most confident first."""
+        return [tag for tag, _ in self.get_tag_confidences(name)]
+
+    def get_tag_confidences(self, name: str) -> list[tuple[str, float]]:
+        """Return (tag, confidence) pairs of a file, most confident first."""
+        return self.conn.execute(
+            """SELECT file_tags.tag, file_tags.confidence FROM file_tags
+               JOIN files ON files.id = file_tags.file_id
+               WHERE files.name = ? ORDER BY file_tags.confidence DESC""",
+            (name,)
+        ).fetchall()
+
+    def set_score(self, name: str, stat: os.stat_result, score_name: str, value: float) -> None:
+        """Store an analyzer score for a file and mark the analyzer as done."""
+        file_id = self._file_id(name, stat)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO file_scores (file_id, name, value) VALUES (?, ?, ?)",
+            (file_id, score_name, value)
+        )
+        self._mark_analyzed(file_id, score_name)
+
+    def get_scores(self, name: str) -> dict[str, float]:
+        """Return all scores of a file by name."""
+        rows = self.conn.execute(
+            """SELECT file_scores.name, file_scores.value FROM file_scores
+               JOIN files ON files.id = file_scores.file_id WHERE files.name = ?""",
+            (name,)
+        )
+        return dict(rows)
+
+    def set_hash(self, name: str, stat: os.stat_result, hash_name: str, value: int) -> None:
+        """Store an unsigned 64-bit hash for a file and mark the analyzer as done."""
+        file_id = self._file_id(name, stat)
+        # SQLite integers are signed
+        signed = value - (1 << 64) if value >= (1 << 63) else value
+        self.conn.execute(
+            "INSERT OR REPLACE INTO file_hashes (file_id, name, value) VALUES (?, ?, ?)",
+            (file_id, hash_name, signed)
+        )
+        self._mark_analyzed(file_id, hash_name)
+
+    def get_hash(self, name: str, hash_name: str) -> int | None:
+        row = self.conn.execute(
+            """SELECT file_hashes.value FROM file_hashes JOIN files ON files.id = file_hashes.file_id
+               WHERE files.name = ? AND file_hashes.name = ?""",
+            (name, hash_name)
+        ).fetchone()
+        return None if row is None else row[0] & ((1 << 64) - 1)
+
+    def find_files(self, all_tags: list[str] = (), any_tags: list[str] = ()) -> list[str]:
+        """
+        Return names of files carrying every tag in all_tags and, if given,
+        at least one tag in any_tags.
+        """
+        if not all_tags and not any_tags:
+            return []
+
+        # Each condition is a lookup on the tag index; INTERSECT combines them
+        subqueries, params = tag_lookups(all_tags, any_tags)
+        rows = self.conn.execute(
+            f"""SELECT name FROM files WHERE id IN ({" INTERSECT ".join(subqueries)})
+                ORDER BY name""",
+            params
+        )
+        return [name for name, in rows]
+
+    def all_tags(self) -> list[tuple[str, int]]:
+        """Return every tag with the number of files carrying it, most common first."""
+        return self.conn.execute(
+            "SELECT tag, COUNT(*) FROM file_tags GROUP BY tag ORDER BY COUNT(*) DESC, tag"
+        ).fetchall()
+
+    def commit(self) -> None:
+        self.conn.commit()
@@ -0,0 +1,132 @@
+import os
+import sys
+import logging
+import plistlib
+import xml.etree.ElementTree as ET
+
+# freedesktop.org convention, understood by KDE Dolphin/Baloo and others
+XDG_TAGS_ATTR = 'user.xdg.tags'
+FINDER_TAGS_ATTR = 'com.apple.metadata:_kMDItemUserTags'
+
+NS_X = 'adobe:ns:meta/'
+NS_RDF = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+NS_DC = 'http://purl.org/dc/elements/1.1/'
+ET.register_namespace('x', NS_X)
+ET.register_namespace('rdf', NS_RDF)
+ET.register_namespace('dc', NS_DC)
+
+
+class TagMirror:
+    """Copies tags from the store onto the files themselves for other tools to read."""
+    name = None
+
+    def write(self, filepath: str, tags: list[str]) -> bool:
+        """Replace the tags of filepath; returns False on failure."""
+        try:
+            self._write(filepath, tags)
+            return True
+        except Exception as e:
+            logging.warning(f"Error writing {self.name} tags to {filepath}: {e}")
+            return False
+
+    def read(self, filepath: str) -> list[str]:
+        """Return the tags of filepath, or an empty list if it has none."""
+        try:
+            return self._read(filepath)
+        except Exception:
+            return []
+
+    def _write(self, filepath: str, tags: list[str]) -> None:
+        raise NotImplementedError
+
+    def _read(self, filepath: str) -> list[str]:
+        raise NotImplementedError
+
+
+class XattrTagMirror(TagMirror):
+    """Comma-separated tags in the user.xdg.tags extended attribute (Linux)."""
+    name = 'xattr'
+
+    def _write(self, filepath: str, tags: list[str]) -> None:
+        os.setxattr(filepath, XDG_TAGS_ATTR, ','.join(tags).encode('utf-8'))
+
+    def _read(self, filepath: str) -> list[str]:
+        value = os.getxattr(filepath, XDG_TAGS_ATTR).decode('utf-8')
+        return [tag for tag in value.split(',') if tag]
+
+
+class FinderTagMirror(TagMirror):
+    """macOS Finder tags, stored as a binary plist extended attribute."""
+    name = 'finder'
+
+    def _write(self, filepath: str, tags: list[str]) -> None:
+        import xattr
+        xattr.setxattr(filepath, FINDER_TAGS_ATTR, plistlib.dumps(tags, fmt=plistlib.FMT_BINARY))
+
+    def _read(self, filepath: str) -> list[str]:
+        import xattr
+        return plistlib.loads(xattr.getxattr(filepath, FINDER_TAGS_ATTR))
+
+
+def xmp_sidecar_path(filepath: str) -> str:
+    """Return the Adobe-style sidecar path: IMG_0001.CR2 -> IMG_0001.xmp"""
+    return os.path.splitext(filepath)[0] + '.xmp'
+
+
+def load_xmp_sidecar(filepath: str) -> tuple[ET.ElementTree, ET.Element]:
+    """Parse the sidecar of filepath, or start a new one; returns the tree and its rdf:Description."""
+    sidecar = xmp_sidecar_path(filepath)
+    if os.path.exists(sidecar):
+        tree = ET.parse(sidecar)
+        root = tree.getroot()
+    else:
+        root = ET.Element(f'{{{NS_X}}}xmpmeta')
+        tree = ET.ElementTree(root)
+
+    rdf = root.find(f'{{{NS_RDF}}}RDF')
+    if rdf is None:
+        rdf = ET.SubElement(root, f'{{{NS_RDF}}}RDF')
+    description = rdf.find(f'{{{NS_RDF}}}Description')
+    if description is None:
+        description = ET.SubElement(rdf, f'{{{NS_RDF}}}Description', {f'{{{NS_RDF}}}about': ''})
+    return tree, description
+
+
+class XmpSidecarTagMirror(TagMirror):
+    """
+    Tags as dc:subject in an XMP sidecar, read by Lightroom, darktable and digiKam.
+
+    Existing sidecars are updated in place so other metadata in them survives.
+    """
+    name = 'xmp'
+
+    def _write(self, filepath: str, tags: list[str]) -> None:
+        tree, description = load_xmp_sidecar(filepath)
+        for subject in description.findall(f'{{{NS_DC}}}subject'):
+            description.remove(subject)
+        bag = ET.SubElement(ET.SubElement(description, f'{{{NS_DC}}}subject'), f'{{{NS_RDF}}}Bag')
+        for tag in tags:
+            ET.SubElement(bag, f'{{{NS_RDF}}}li').text = tag
+
+        tree.write(xmp_sidecar_path(filepath), encoding='utf-8', xml_declaration=True)
+
+    def _read(self, filepath: str) -> list[str]:
+        root = ET.parse(xmp_sidecar_path(filepath)).getroot()
+        path = f'.//{{{NS_DC}}}subject/{{{NS_RDF}}}Bag/{{{NS_RDF}}}li'
+        return [li.text for li in root.iterfind(path) if li.text]
+
+
+TAG_MIRRORS = {
+    mirror.name: mirror
+    for mirror in (XattrTagMirror, FinderTagMirror, XmpSidecarTagMirror)
+}
+
+
+def get_tag_mirror(name: str | None = None) -> TagMirror:
+    """Return the named mirror, defaulting to Finder tags on macOS and xattrs elsewhere."""
+    if name is None:
+        name = 'finder' if sys.platform == 'darwin' else 'xattr'
+    try:
+        return TAG_MIRRORS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown tag mirror '{name}', expected one of {', '.join(TAG_MIRRORS)}")
@@ -0,0 +1,75 @@
+import logging
+from typing import Any, Callable
+
+from PIL import Image, ImageOps
+from declutrr.constants import *
+from declutrr.raw import open_image
+
+# A model takes a batch of images and returns one result per image, either
+# ultralytics results (YOLO.__call__) or summaries (declutrr.inference predictors)
+Model = Callable[[list[Image.Image]], list[Any]]
+
+
+def decode_for_inference(filepath: str, size: int = TAG_DECODE_SIZE) -> Image.Image | None:
+    """
+    Decode an image once at model resolution.
+
+    JPEG draft mode lets libjpeg scale down while decoding, so a 50 MP file
+    costs a fraction of a full decode. RAW files are decoded from their
+    embedded JPEG.
+    """
+    try:
+        with open_image(filepath) as img:
+            img.draft('RGB', (size, size))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((size, size))
+            return img.convert('RGB')
+    except Exception as e:
+        logging.error(f"Error decoding {filepath}: {e}")
+        return None
+
+
+def summarize_result(result: Any) -> dict:
+    """
+    Reduce an ultralytics result to plain data: the top 5 classifications and
+    all detections as (class_name, confidence) pairs.
+    """
+    summary = {'classes': [], 'boxes': []}
+    probs = getattr(result, 'probs', None)
+    if probs is not None:
+        summary['classes'] = [(result.names[int(i)], float(conf))
+                              for i, conf in zip(probs.top5, probs.top5conf.tolist())]
+    boxes = getattr(result, 'boxes', None)
+    if boxes is not None:
+        summary['boxes'] = [(result.names[int(cls)], float(conf))
+                            for cls, conf in zip(boxes.cls.tolist(), boxes.conf.tolist())]
+    return summary
+
+
+def extract_tags(cls_result: Any, det_result: Any, max_tags: int = TAG_MAX_TAGS) -> list[tuple[str, float]]:
+    """
+    Merge the top 2 classifications and top 4 detections into unique tags.
+
+    Accepts ultralytics results or summaries from summarize_result().
+    """
+    classifications = []
+
+    if cls_result is not None:
+        if not isinstance(cls_result, dict):
+            cls_result = summarize_result(cls_result)
+        classifications.extend(cls_result['classes'][:2])
+
+    if det_result is not None:
+        if not isinstance(det_result, dict):
+            det_result = summarize_result(det_result)
+        pairs = sorted(det_result['boxes'], key=lambda x: x[1], reverse=True)
+        classifications.extend(pairs[:4])
+
+    classifications.sort(key=lambda x: x[1], reverse=True)
+    seen = set()
+    tags = []
+    for name, conf in classifications:
+        if name not in seen:
+            seen.add(name)
+            tags.append((name, conf))
+    return tags[:max_tags]
@@ -0,0 +1,157 @@
+"""
+Trace-event profiling.
+
+When tracing is on (declutrr <command> --profile trace.json), span()
+records where each thread spends its time and stop_tracing() writes a
+Chrome trace-event JSON file, which chrome://tracing and
+https://ui.perfetto.dev show as one timeline per thread. With a cProfile
+folder, every span name also gets a .prof file of the code run inside it.
+When tracing is off, span() costs one global lookup.
+"""
+import os
+import json
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+
+_tracer = None
+
+
+class Tracer:
+    def __init__(self, path: str, cprofile_dir: str | None = None):
+        self.path = path
+        self.cprofile_dir = cprofile_dir
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self.events = []
+        self.threads = {}
+        self.profiles = {}  # (span name, thread id) -> cProfile.Profile
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def now(self) -> float:
+        """Microseconds since tracing started."""
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def thread_id(self) -> int:
+        thread = threading.current_thread()
+        if thread.ident not in self.threads:
+            self.threads[thread.ident] = thread.name
+        return thread.ident
+
+    def complete(self, name: str, category: str, start: float, args: dict, end: float | None = None) -> None:
+        end = self.now() if end is None else end
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': round(start, 1),
+                 'dur': round(end - start, 1), 'pid': self.pid, 'tid': self.thread_id()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def instant(self, name: str, category: str, args: dict) -> None:
+        self.events.append({'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': round(self.now(), 1),
+                            'pid': self.pid, 'tid': self.thread_id(), 'args': args})
+
+    def counter(self, name: str, category: str, values: dict) -> None:
+        self.events.append({'name': name, 'cat': category, 'ph': 'C', 'ts': round(self.now(), 1),
+                            'pid': self.pid, 'args': values})
+
+    def start_profile(self, name: str):
+        """cProfile the span on this thread unless an outer span already is."""
+        if self.cprofile_dir is None or getattr(self.local, 'profiling', False):
+            return None
+        import cProfile
+        key = (name, threading.get_ident())
+        with self.lock:
+            profile = self.profiles.setdefault(key, cProfile.Profile())
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process
+            return None
+        self.local.profiling = True
+        return profile
+
+    def stop_profile(self, profile) -> None:
+        profile.disable()
+        self.local.profiling = False
+
+    def write(self) -> None:
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                    for tid, name in self.threads.items()]
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}, f)
+        logging.info(f"Wrote {len(self.events)} trace events to {self.path}")
+
+        if self.cprofile_dir is not None:
+            import pstats
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+            stats = {}
+            for (name, _), profile in self.profiles.items():
+                if name in stats:
+                    stats[name].add(profile)
+                else:
+                    stats[name] = pstats.Stats(profile)
+            for name, stat in stats.items():
+                stat.dump_stats(os.path.join(self.cprofile_dir, f"{name.replace(os.sep, '_')}.prof"))
+            logging.info(f"Wrote {len(stats)} cProfile dumps to {self.cprofile_dir}")
+
+
+def start_tracing(path: str, cprofile_dir: str | None = None) -> None:
+    global _tracer
+    _tracer = Tracer(path, cprofile_dir)
+
+
+def stop_tracing() -> None:
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.write()
+
+
+@contextmanager
+def span(name: str, category: str = 'declutrr', **args):
+    """Record the time spent in the block as a span on the current thread."""
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+    profile = tracer.start_profile(name)
+    start = tracer.now()
+    try:
+        yield
+    finally:
+        tracer.complete(name, category, start, args)
+        if profile is not None:
+            tracer.stop_profile(profile)
+
+
+def traced(name: str, category: str = 'declutrr'):
+    """Decorator form of span()."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add_span(name: str, start: float, end: float, category: str = 'declutrr', **args) -> None:
+    """Record a span measured elsewhere, from time.perf_counter() start and end."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.complete(name, category, (start - tracer.origin) * 1e6, args, (end - tracer.origin) * 1e6)
+
+
+def mark(name: str, category: str = 'declutrr', **args) -> None:
+    """Record a point in time, e.g. a keypress."""
+    if _tracer is not None:
+        _tracer.instant(name, category, args)
+
+
+def counter(name: str, category: str = 'declutrr', **values) -> None:
+    """Record the current value of something, e.g. a pool's size, shown as a counter track."""
+    if _tracer is not None:
+        _tracer.counter(name, category, values)
@@ -1,49 +1,177 @@
 import os
 import sys
+import json
+import queue
+import atexit
 import logging
+import threading
 from datetime import datetime
-import tkinter as tk
-from tkinter import filedialog
+from logging.handlers import QueueHandler, QueueListener
 
-def setup_logging(script_name: str) -> None:
+from declutrr.constants import *
+
+_listener = None
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves the process, so records are formatted on the
+        # listener thread rather than by the thread that logged them
+        return record
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """Writes through tqdm when it is installed, so messages land above progress bars."""
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        try:
+            from tqdm import tqdm
+            self.tqdm = tqdm
+        except ImportError:
+            self.tqdm = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.tqdm is None:
+            return super().emit(record)
+        try:
+            self.tqdm.write(self.format(record), file=self.stream)
+        except Exception:
+            self.handleError(record)
+
+
+class SampleFilter(logging.Filter):
+    """Lets through 1 in every messages of each kind below WARNING, and all others."""
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.every == 1:
+            return True
+        # Messages of one kind share a format string, e.g. "Moved %s to %s/"
+        with self.lock:
+            count = self.counts.get(record.msg, 0)
+            self.counts[record.msg] = count + 1
+        return count % self.every == 0
+
+
+class SummaryHandler(logging.Handler):
+    """Appends run summaries (log_summary) as JSON lines."""
+    def __init__(self, path: str, script_name: str):
+        super().__init__()
+        self.path = path
+        self.script_name = script_name
+        self.addFilter(lambda record: hasattr(record, 'stats'))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        entry = {'time': datetime.fromtimestamp(record.created).isoformat(timespec='seconds'),
+                 'command': self.script_name, 'summary': record.summary, **record.stats}
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging(script_name: str, level: str | None = None, sample_every: int = LOG_SAMPLE_EVERY) -> None:
     """
     Setup logging configuration with customizable script name
     
+    Logging calls only put records on a queue; a listener thread formats
+    them and writes them to the console and to logs/<script>_<time>.log.
+    Per-file messages (FILE_LOGGER) are sampled.
+    
     Parameters:
     -----------
     script_name : str
         Name of the script for the log file
+    level : str or None
+        Lowest level logged (default: $DECLUTRR_LOG_LEVEL or LOG_LEVEL)
+    sample_every : int
+        Log 1 in this many per-file messages of each kind; 1 logs them all
     """
+    global _listener
+    stop_logging()
+    level = (level or os.environ.get('DECLUTRR_LOG_LEVEL') or LOG_LEVEL).upper()
+    invalid = level not in LOG_LEVELS
+    if invalid:
+        level, invalid = LOG_LEVEL, level
+
     # Create logs directory if it doesn't exist
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
 
     # Setup logging with timestamp
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(f'logs/{script_name}_{timestamp}.log'),
-            logging.StreamHandler()
-        ]
-    )
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [logging.FileHandler(os.path.join(LOG_DIR, f'{script_name}_{timestamp}.log')), ConsoleHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    handlers.append(SummaryHandler(os.path.join(LOG_DIR, SUMMARY_LOG), script_name))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_QueueHandler(records))
+    # Logger filters run on the calling thread, so sampled-out messages never reach the queue
+    file_log = logging.getLogger(FILE_LOGGER)
+    for old in [f for f in file_log.filters if isinstance(f, SampleFilter)]:
+        file_log.removeFilter(old)
+    file_log.addFilter(SampleFilter(sample_every))
+
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    if invalid:
+        logging.warning(f"Unknown log level {invalid}, using {level}")
+
+
+def stop_logging() -> None:
+    """Write out queued records and close the handlers setup_logging added."""
+    global _listener
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, _QueueHandler)]:
+        root.removeHandler(handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def log_summary(title: str, stats: dict) -> None:
+    """Log a run's counts as one record, which the summary log keeps as JSON."""
+    logging.getLogger(SUMMARY_LOGGER).info(
+        "%s summary: %s", title, ", ".join(f"{key}={value}" for key, value in stats.items()),
+        extra={'summary': title, 'stats': dict(stats)})
 
 def get_cli_path() -> str | None:
     """Get directory path from command line arguments if provided"""
     return sys.argv[1] if len(sys.argv) > 1 else None
 
-def get_directory() -> str | None:
+def get_directory(path: str | None = None, use_argv: bool = True) -> str | None:
     """
-    Get directory path from CLI argument or file dialog
+    Get directory path from the given path, CLI argument or file dialog
+    
+    Parameters:
+    -----------
+    path : str or None
+        Directory to use instead of asking
+    use_argv : bool
+        Whether to look at sys.argv[1] when no path is given
     
     Returns:
     --------
     str or None
         Selected/provided directory path or None if cancelled/invalid
     """
-    # First try command line argument
-    cli_path = get_cli_path()
+    # First try the given path or command line argument
+    cli_path = path or (get_cli_path() if use_argv else None)
     if cli_path:
         if os.path.isdir(cli_path):
             return os.path.abspath(cli_path)
@@ -51,8 +179,16 @@ def get_directory() -> str | None:
             logging.error(f"Invalid directory path: {cli_path}")
             return None
             
-    # If no CLI path, use file dialog
-    root = tk.Tk()
+    # If no CLI path, use file dialog; tkinter is only imported when needed,
+    # so headless runs that pass a path work without a display
+    import tkinter as tk
+    from tkinter import filedialog
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        logging.error(f"No directory given and no display for a folder dialog: {e}")
+        return None
     root.withdraw()
     
     directory = filedialog.askdirectory(
@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import queue
+import select
+import struct
+import logging
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable
+
+from declutrr.constants import *
+from declutrr.tracing import traced
+from declutrr.companions import photo_key
+
+# inotify(7) event flags
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len; followed by the name
+
+
+def list_image_names(directory: str) -> list[str]:
+    with os.scandir(directory) as entries:
+        return [entry.name for entry in entries
+                if entry.name.lower().endswith(VALID_IMAGE_EXTENSIONS) and entry.is_file()]
+
+
+class Watcher:
+    """Reports image files that appear in a folder after the watcher was created."""
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def poll(self, timeout: float) -> list[str]:
+        """Wait up to timeout seconds and return names of newly completed files."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher(Watcher):
+    """
+    Linux inotify through ctypes, no dependency needed.
+
+    Files are reported when their writer closes them or when they are moved
+    in, so half-copied files never show up. If the kernel queue overflows
+    during a burst, the folder is listed once instead.
+    """
+    def __init__(self, directory: str):
+        import ctypes
+        import ctypes.util
+        super().__init__(directory)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Cannot watch {directory}")
+
+    def poll(self, timeout: float) -> list[str]:
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        names = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = IN_EVENT.unpack_from(data, offset)
+                offset += IN_EVENT.size
+                if mask & IN_Q_OVERFLOW:
+                    logging.warning(f"Too many new files at once in {self.directory}, rescanning")
+                    return list_image_names(self.directory)
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if name.lower().endswith(VALID_IMAGE_EXTENSIONS):
+                    names.append(name)
+        return names
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class PollingWatcher(Watcher):
+    """
+    Portable fallback that lists the folder with scandir.
+
+    A new file is reported once its size and mtime stayed the same across
+    two listings, i.e. once it has finished copying.
+    """
+    def __init__(self, directory: str, interval: float = WATCH_POLL_INTERVAL):
+        super().__init__(directory)
+        self.interval = interval
+        self.known = set(list_image_names(directory))
+        self.pending = {}
+
+    def poll(self, timeout: float) -> list[str]:
+        if timeout:
+            time.sleep(min(timeout, self.interval))
+        current = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name in self.known or not entry.name.lower().endswith(VALID_IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                current[entry.name] = (stat.st_size, stat.st_mtime_ns)
+
+        ready = [name for name, signature in current.items() if self.pending.get(name) == signature]
+        self.known.update(ready)
+        self.pending = {name: signature for name, signature in current.items() if name not in self.known}
+        return ready
+
+
+def get_watcher(directory: str) -> Watcher:
+    """inotify on Linux, polling elsewhere or if inotify is unavailable."""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify unavailable ({e}), polling {directory} instead")
+    return PollingWatcher(directory)
+
+
+class FolderWatch:
+    """
+    Watches a folder in a background thread and prepares new files for the UI.
+
+    Sort keys (e.g. capture times) are computed on a thread pool, so bursts
+    of new files don't hold up the watcher or the UI. The UI thread collects
+    (key, name) pairs with drain(), e.g. from a Tk after() callback.
+    """
+    def __init__(self, directory: str, key: Callable[[str], float], known: set[str] | None = None,
+                 watcher: Watcher | None = None, workers: int = WATCH_WORKERS, executor: Executor | None = None):
+        self.directory = directory
+        self.key = key
+        # Files present now are already in the UI's list
+        self.known = set(list_image_names(directory) if known is None else known)
+        # One file per photo goes to the UI; the other of a RAW+JPEG pair moves along with it
+        self.photos = {photo_key(name) for name in self.known}
+        self.watcher = watcher or get_watcher(directory)
+        self.ready = queue.Queue()
+        self.pool = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix='watch-prepare')
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='watch', daemon=True)
+
+    def start(self) -> 'FolderWatch':
+        self.thread.start()
+        return self
+
+    @traced('watch.prepare')
+    def _prepare(self, name: str) -> None:
+        try:
+            self.ready.put((self.key(os.path.join(self.directory, name)), name))
+        except Exception as e:
+            logging.warning(f"Could not read new file {name}: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                names = self.watcher.poll(WATCH_WAIT)
+            except OSError as e:
+                logging.error(f"Watching {self.directory} failed: {e}")
+                return
+            for name in names:
+                # Files can be closed after writing more than once
+                if name not in self.known:
+                    self.known.add(name)
+                    if photo_key(name) in self.photos:
+                        continue
+                    self.photos.add(photo_key(name))
+                    self.pool.submit(self._prepare, name)
+
+    def drain(self) -> list[tuple[float, str]]:
+        """Return the new files prepared since the last call, without blocking."""
+        items = []
+        while True:
+            try:
+                items.append(self.ready.get_nowait())
+            except queue.Empty:
+                return items
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.thread.join(timeout=WATCH_WAIT * 2)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.watcher.close()
@@ -0,0 +1,400 @@
+"""
+Browser frontend for sorting (declutrr serve).
+
+Runs next to the photos, e.g. on the NAS, and serves a page that sorts
+with the same keys as the GUI. Over a tunnel only display-sized JPEG
+previews and a little JSON cross the wire, rather than every pixel of a
+full-window Tk image over X11:
+
+    ssh -L 8765:localhost:8765 nas declutrr serve /volume1/shoot
+    # then open http://localhost:8765
+
+    GET  /                      the page
+    GET  /api/state?w=&h=       current image, counts and upcoming previews
+    GET  /preview/<name>?w=&h=  JPEG fitted into w x h; cacheable for good
+    POST /api/decision          {"file": ..., "action": "keep"|"delete"|"skip"}
+    POST /api/undo
+
+Previews of upcoming images are rendered ahead on the scheduler's workers
+and named in Link: rel=prefetch headers, so the browser has them before
+they are needed. Decisions go through the usual backends (--decisions),
+and --share sorts alongside other operators (see leases.py).
+"""
+import io
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from declutrr.constants import *
+from declutrr.decisions import get_decision_backend
+from declutrr.image_processor import ImageProcessor
+from declutrr.leases import LeaseManager
+from declutrr.scheduler import Scheduler
+from declutrr.tracing import span
+
+
+class SortSession:
+    """
+    The images left to sort, oldest first, and the decisions made so far.
+    Skipped images go to the back of the queue. Safe to use from several
+    request threads.
+    """
+    def __init__(self, directory: str, filter_expr: str | None = None, decisions: str | None = None,
+                 share: bool = False):
+        self.directory = directory
+        self.scheduler = Scheduler(name='preview')
+        self.processor = ImageProcessor(directory, create_dirs=False,
+                                        executor=self.scheduler.executor(PRIORITY_LOOKAHEAD))
+        self.decisions = get_decision_backend(directory, decisions)
+        self.leases = None
+        if share:
+            if self.decisions.name == 'manifest':
+                raise ValueError("Sharing a folder needs decisions recorded per file, not in a manifest")
+            self.leases = LeaseManager(directory)
+        self.lock = threading.RLock()
+        self.history = []
+        self.stats = {STATUS_KEPT: 0, STATUS_DELETED: 0}
+        self.skipped = set()  # Skipped since they were last shown first
+        self.previews = OrderedDict()  # (name, width, height) -> JPEG bytes, least recently used first
+        self.rendering = {}  # (name, width, height) -> Task
+        self.queue = self.decisions.undecided(self.processor.get_image_files(filter_expr))
+        if self.leases is not None:
+            self.leases.sync(self.queue)
+            self.queue = self.leases.acquire(self.decisions.undecided)
+
+    def current(self) -> str | None:
+        with self.lock:
+            if self.leases is not None and all(name in self.skipped for name in self.queue):
+                # Only skipped images left here: fetch fresh ones first
+                self.queue[:0] = self.leases.acquire(self.decisions.undecided)
+            return self.queue[0] if self.queue else None
+
+    def upcoming(self) -> list[str]:
+        with self.lock:
+            return self.queue[1:1 + self.processor.lookahead]
+
+    def state(self) -> dict:
+        with self.lock:
+            current = self.current()
+            return {'current': current, 'upcoming': self.upcoming(), 'left': len(self.queue),
+                    'kept': self.stats[STATUS_KEPT], 'deleted': self.stats[STATUS_DELETED],
+                    'can_undo': bool(self.history)}
+
+    def decide(self, filename: str, action: str) -> bool:
+        """Apply action to filename, which must still be in the queue; False if it isn't or that failed."""
+        with self.lock:
+            if filename not in self.queue:
+                return False
+            if action == ACTION_SKIP:
+                self.queue.remove(filename)
+                self.queue.append(filename)
+                self.skipped.add(filename)
+                return True
+            with span('move', file=filename):
+                if not self.decisions.record(filename, action):
+                    return False
+            self.queue.remove(filename)
+            self.skipped.discard(filename)
+            self.history.append((filename, action))
+            self.stats[STATUS_KEPT if action == ACTION_KEEP else STATUS_DELETED] += 1
+            self.scheduler.submit(self.processor.evict, filename, priority=PRIORITY_MOVE)
+            if self.leases is not None:
+                chunk = self.leases.decided(filename)
+                if chunk is not None:
+                    self.scheduler.submit(self.leases.finish, chunk, priority=PRIORITY_MOVE)
+            return True
+
+    def undo(self) -> bool:
+        """Revert the last keep or delete and show that image again."""
+        with self.lock:
+            if not self.history:
+                return False
+            filename, action = self.history.pop()
+            if not self.decisions.revert(filename, action):
+                self.history.append((filename, action))
+                return False
+            self.stats[STATUS_KEPT if action == ACTION_KEEP else STATUS_DELETED] -= 1
+            self.queue.insert(0, filename)
+            if self.leases is not None:
+                self.leases.undone(filename)
+            return True
+
+    def _render(self, filename: str, width: int, height: int) -> bytes | None:
+        image = self.processor.load_image(self.processor.local_path(filename))
+        if image is None:
+            return None
+        with span('resize', file=filename):
+            image = ImageProcessor.fit_image(image, (width, height))
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            data = io.BytesIO()
+            image.save(data, 'JPEG', quality=PREVIEW_QUALITY, progressive=True)
+        return data.getvalue()
+
+    def _schedule(self, filename: str, width: int, height: int, priority: int):
+        """The task rendering a preview, started at priority unless already cached or under way."""
+        key = (filename, width, height)
+        task = self.rendering.get(key)
+        if task is None and key not in self.previews:
+            task = self.scheduler.submit(self._render, filename, width, height, priority=priority)
+            task.add_done_callback(lambda task, key=key: self._rendered(key, task))
+            self.rendering[key] = task
+        return task
+
+    def _rendered(self, key: tuple, task) -> None:
+        with self.lock:
+            self.rendering.pop(key, None)
+            if task.cancelled() or task.exception() is not None or task.result() is None:
+                return
+            self.previews[key] = task.result()
+            while len(self.previews) > PREVIEW_CACHE_ITEMS:
+                self.previews.popitem(last=False)
+
+    def preview(self, filename: str, width: int, height: int) -> bytes | None:
+        """JPEG preview of filename fitted into width x height; None if it can't be read."""
+        key = (filename, width, height)
+        with self.lock:
+            if key in self.previews:
+                self.previews.move_to_end(key)
+                return self.previews[key]
+            task = self._schedule(filename, width, height, PRIORITY_INTERACTIVE)
+        # Waiting promotes a preview being rendered ahead to interactive
+        return task.result()
+
+    def render_ahead(self, width: int, height: int) -> list[str]:
+        """Start rendering previews of upcoming images; returns their names."""
+        with self.lock:
+            upcoming = self.upcoming()
+            self.processor.prefetch(upcoming)
+            for filename in upcoming:
+                self._schedule(filename, width, height, PRIORITY_LOOKAHEAD)
+        return upcoming
+
+    def renew_leases(self) -> None:
+        """Keep this operator's leases; images of chunks lost meanwhile leave the queue."""
+        lost = self.leases.renew()
+        with self.lock:
+            dropped = {name for chunk in lost for name in self.leases.chunks[chunk]}
+            self.queue = [name for name in self.queue if name not in dropped]
+
+    def close(self) -> None:
+        self.scheduler.shutdown()
+        self.processor.close()
+        self.decisions.close()
+        if self.leases is not None:
+            self.leases.release()
+
+
+def preview_size(query: dict) -> tuple[int, int]:
+    """Viewport size from the query, rounded up to PREVIEW_STEP so previews are shared between sizes."""
+    size = []
+    for name, default in (('w', PREVIEW_SIZE[0]), ('h', PREVIEW_SIZE[1])):
+        try:
+            value = int(query.get(name, [default])[0])
+        except ValueError:
+            value = default
+        value = -(-max(value, 1) // PREVIEW_STEP) * PREVIEW_STEP
+        size.append(min(value, PREVIEW_MAX_SIZE))
+    return size[0], size[1]
+
+
+def preview_url(filename: str, size: tuple[int, int]) -> str:
+    return f"/preview/{quote(filename)}?w={size[0]}&h={size[1]}"
+
+
+class TriageHandler(BaseHTTPRequestHandler):
+    session: SortSession = None  # Set on the subclass serve() creates
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(f"{self.address_string()} {format % args}")
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data: dict, status: int = HTTPStatus.OK, headers: dict | None = None) -> None:
+        self._send(status, json.dumps(data).encode(), 'application/json',
+                   {'Cache-Control': 'no-store', **(headers or {})})
+
+    def _send_state(self, query: dict) -> None:
+        size = preview_size(query)
+        state = self.session.state()
+        upcoming = self.session.render_ahead(*size)
+        state['preview'] = preview_url(state['current'], size) if state['current'] else None
+        state['upcoming'] = [preview_url(name, size) for name in upcoming]
+        links = ', '.join(f"<{url}>; rel=prefetch; as=image" for url in state['upcoming'])
+        self._send_json(state, headers={'Link': links} if links else None)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/':
+            self._send(HTTPStatus.OK, WEB_PAGE.encode(), 'text/html; charset=utf-8', {'Cache-Control': 'no-cache'})
+        elif url.path == '/api/state':
+            self._send_state(query)
+        elif url.path.startswith('/preview/'):
+            filename = unquote(url.path[len('/preview/'):])
+            # Only names in the folder itself, never paths
+            if not filename or filename != os.path.basename(filename) or filename.startswith('.'):
+                self._send_json({'error': 'bad file name'}, HTTPStatus.BAD_REQUEST)
+                return
+            etag = f'"{quote(filename)}-{"x".join(map(str, preview_size(query)))}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            data = self.session.preview(filename, *preview_size(query))
+            if data is None:
+                self._send_json({'error': f"cannot read {filename}"}, HTTPStatus.NOT_FOUND)
+                return
+            # A name is one photo for the whole session, so the browser never needs to ask again
+            self._send(HTTPStatus.OK, data, 'image/jpeg',
+                       {'Cache-Control': f"private, max-age={PREVIEW_MAX_AGE}, immutable", 'ETag': etag})
+        else:
+            self._send_json({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        # A JSON body can't be sent cross-origin without a preflight, which is never answered
+        if self.headers.get('Content-Type', '').split(';')[0] != 'application/json':
+            self._send_json({'error': 'expected application/json'}, HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except ValueError:
+            self._send_json({'error': 'invalid JSON'}, HTTPStatus.BAD_REQUEST)
+            return
+        if url.path == '/api/decision':
+            action = body.get('action')
+            if action not in MANIFEST_ACTIONS:
+                self._send_json({'error': f"action must be one of {', '.join(MANIFEST_ACTIONS)}"},
+                                HTTPStatus.BAD_REQUEST)
+                return
+            if not self.session.decide(body.get('file'), action):
+                self._send_json({'error': f"could not {action} {body.get('file')}"}, HTTPStatus.CONFLICT)
+                return
+        elif url.path == '/api/undo':
+            if not self.session.undo():
+                self._send_json({'error': 'nothing to undo'}, HTTPStatus.CONFLICT)
+                return
+        else:
+            self._send_json({'error': 'not found'}, HTTPStatus.NOT_FOUND)
+            return
+        self._send_state(parse_qs(url.query))
+
+
+def make_server(session: SortSession, host: str = WEB_HOST, port: int = WEB_PORT) -> ThreadingHTTPServer:
+    handler = type('Handler', (TriageHandler,), {'session': session})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(directory: str, host: str = WEB_HOST, port: int = WEB_PORT, filter_expr: str | None = None,
+          decisions: str | None = None, share: bool = False) -> int:
+    try:
+        session = SortSession(directory, filter_expr, decisions, share)
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+    server = make_server(session, host, port)
+    renew = None
+    if session.leases is not None:
+        def renew_leases():
+            nonlocal renew
+            try:
+                session.renew_leases()
+            except OSError as e:
+                logging.warning(f"Could not renew leases: {e}")
+            renew = threading.Timer(LEASE_RENEW_MS / 1000, renew_leases)
+            renew.daemon = True
+            renew.start()
+        renew_leases()
+    logging.info(f"Sorting {len(session.queue)} images from {directory} at "
+                 f"http://{host}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if renew is not None:
+            renew.cancel()
+        server.server_close()
+        session.close()
+    return 0
+
+
+WEB_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Declutrr</title>
+<style>
+  html, body { margin: 0; height: 100%; background: #202020; color: #ddd; font: 14px sans-serif; }
+  #image { display: block; margin: 0 auto; max-width: 100vw; max-height: calc(100vh - 40px); }
+  #status { position: fixed; bottom: 0; left: 0; right: 0; height: 40px; line-height: 40px; text-align: center; }
+</style>
+</head>
+<body>
+<img id="image" alt="">
+<div id="status">Loading...</div>
+<script>
+const KEYS = {ArrowLeft: 'delete', ArrowRight: 'keep', ArrowDown: 'skip', j: 'delete', l: 'keep', k: 'skip'};
+const image = document.getElementById('image'), status = document.getElementById('status');
+let state = null, busy = false;
+
+function size() {
+  const ratio = window.devicePixelRatio || 1;
+  return `w=${Math.round(innerWidth * ratio)}&h=${Math.round((innerHeight - 40) * ratio)}`;
+}
+
+function show(next) {
+  state = next;
+  if (!state.current) {
+    image.removeAttribute('src');
+    status.textContent = `All sorted: ${state.kept} kept, ${state.deleted} deleted`;
+    return;
+  }
+  image.src = state.preview;
+  status.textContent = `${state.current} - ${state.left} left, ${state.kept} kept, ${state.deleted} deleted`;
+  for (const url of state.upcoming) new Image().src = url;
+}
+
+async function request(path, body) {
+  if (busy) return;
+  busy = true;
+  try {
+    const options = body === undefined ? {} :
+      {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body)};
+    const response = await fetch(`${path}?${size()}`, options);
+    const data = await response.json();
+    if (response.ok) show(data); else status.textContent = data.error;
+  } finally {
+    busy = false;
+  }
+}
+
+document.addEventListener('keydown', event => {
+  if (event.ctrlKey || event.metaKey || event.altKey) return;
+  const action = KEYS[event.key];
+  if (action && state && state.current) {
+    event.preventDefault();
+    request('/api/decision', {file: state.current, action});
+  } else if (event.key === 'z' || event.key === 'Z') {
+    request('/api/undo', {});
+  }
+});
+request('/api/state');
+</script>
+</body>
+</html>
+"""
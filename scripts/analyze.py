@@ -0,0 +1,7 @@
+import sys
+
+from declutrr.cli import main
+
+# Same as `declutrr scan`
+if __name__ == "__main__":
+    sys.exit(main(['scan', *sys.argv[1:]]))
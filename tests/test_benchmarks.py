@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+from benchmarks.corpus import generate_corpus, plan
+from benchmarks.suite import run_suite, summarize
+from benchmarks.replay import link_session, replay, start_xvfb
+from declutrr.recording import synthetic_recording
+
+
+class TestBenchmarks(unittest.TestCase):
+    def setUp(self):
+        """Create an empty corpus folder"""
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def test_plan_covers_orientations_and_dates(self):
+        """Test the plan is repeatable, uses every orientation and dates files in order"""
+        specs = plan(16, seed=1)
+        self.assertEqual(specs, plan(16, seed=1))
+        self.assertEqual({spec['orientation'] for spec in specs}, set(range(1, 9)))
+        self.assertEqual([spec['taken'] for spec in specs], sorted(spec['taken'] for spec in specs))
+
+    def test_generated_files_look_like_photos(self):
+        """Test files carry orientation, capture date and a thumbnail, and the corpus is reused"""
+        specs = generate_corpus(self.test_dir, 8, sizes={0.05: 1}, workers=1)
+        jpeg = next(spec for spec in specs if spec['name'].endswith('.jpg'))
+        with Image.open(os.path.join(self.test_dir, jpeg['name'])) as image:
+            exif = image.getexif()
+            self.assertEqual(exif[274], jpeg['orientation'])
+            self.assertEqual(exif.get_ifd(0x8769)[36867], jpeg['taken'])
+            self.assertAlmostEqual(image.size[0] * image.size[1] / 1e6, 0.05, places=2)
+        # The thumbnail is a JPEG inside the EXIF block
+        self.assertIn(b'\xff\xd8', image.info['exif'])
+        self.assertEqual(generate_corpus(self.test_dir, 8, sizes={0.05: 1}), specs)
+
+    def test_suite_runs(self):
+        """Test every benchmark reports and moved files are put back"""
+        specs = generate_corpus(self.test_dir, 8, sizes={0.05: 1}, workers=1)
+        before = sorted(os.listdir(self.test_dir))
+        results = run_suite(self.test_dir, specs, sample=4, repeat=2)
+        self.assertEqual(set(results), {'get_image_files', 'get_creation_time', 'load_image', 'resize', 'move'})
+        self.assertEqual(results['move']['count'], 16)
+        self.assertEqual(sorted(os.listdir(self.test_dir)), before)
+
+    def test_summarize_percentiles(self):
+        """Test latencies are reported in ms with throughput"""
+        result = summarize([0.001 * i for i in range(1, 101)])
+        self.assertEqual((result['p50'], result['p99']), (50.5, 99.99))
+        self.assertEqual(result['per_second'], 19.8)
+
+
+class TestReplay(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Find or start a display"""
+        try:
+            cls.xvfb = start_xvfb()
+        except RuntimeError as e:
+            raise unittest.SkipTest(str(e))
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop Xvfb if we started it"""
+        if cls.xvfb is not None:
+            cls.xvfb.terminate()
+            cls.xvfb.wait()
+
+    def setUp(self):
+        """Create a corpus and a session folder linked to it"""
+        self.test_dir = tempfile.mkdtemp()
+        self.corpus = os.path.join(self.test_dir, 'corpus')
+        self.session = os.path.join(self.test_dir, 'session')
+        os.makedirs(self.session)
+        self.specs = generate_corpus(self.corpus, 12, sizes={0.05: 1}, workers=1)
+        link_session(self.corpus, self.session, self.specs)
+
+    def tearDown(self):
+        """Remove the folders"""
+        shutil.rmtree(self.test_dir)
+
+    def test_replay_measures_every_frame(self):
+        """Test every keypress gets a frame latency and decisions land in the session folder only"""
+        events = synthetic_recording(10, seed=1, think_time=0.01)
+        run = replay(self.session, events, speed=0, decisions='manifest')
+        self.assertEqual(len(run['latencies']), 10)
+        self.assertGreater(run['stages']['decode']['count'], 0)
+        self.assertTrue(all(os.path.exists(os.path.join(self.corpus, spec['name'])) for spec in self.specs))
+
+
+if __name__ == '__main__':
+    unittest.main()
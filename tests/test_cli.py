@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+import unittest
+import unittest.mock
+from PIL import Image, ImageDraw
+
+from declutrr import cli
+from declutrr.dedupe import find_duplicates, hamming
+from declutrr.store import MetadataStore
+
+HEAVY_MODULES = ('tkinter', 'PIL', 'numpy', 'cv2', 'ultralytics')
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        """Create a folder with sharp and flat images and run from a scratch directory for logs"""
+        self.test_dir = tempfile.mkdtemp()
+        self.work_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.work_dir)
+        for i in range(3):
+            img = Image.new('RGB', (200, 150), 'white')
+            draw = ImageDraw.Draw(img)
+            for x in range(0, 200, 4):
+                draw.line([(x, 0), (x, 150)], fill='black')
+            img.save(os.path.join(self.test_dir, f"sharp{i}.png"))
+        Image.new('RGB', (200, 150), 'gray').save(os.path.join(self.test_dir, "flat.png"))
+
+    def tearDown(self):
+        """Restore the working directory and remove the folders"""
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.work_dir)
+
+    def test_help_imports_nothing_heavy(self):
+        """Test --help doesn't import tkinter, PIL or model libraries"""
+        code = ("import sys\n"
+                "from declutrr import cli\n"
+                "try:\n"
+                "    cli.main(['--help'])\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                f"print('MODULES', __import__('json').dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=self.old_cwd, check=True).stdout
+        self.assertIn('scan', output)
+        self.assertEqual(json.loads(output.split('MODULES', 1)[1]), [])
+
+    def test_blur_moves_blurry_images(self):
+        """Test the blur subcommand runs headless and moves the flat image"""
+        self.assertEqual(cli.main(['blur', self.test_dir, '--workers', '1']), 0)
+        self.assertEqual(os.listdir(os.path.join(self.test_dir, 'blurry')), ['flat.png'])
+
+    def test_profile_writes_trace(self):
+        """Test --profile writes a trace with the pipeline's spans and thread names"""
+        trace = os.path.join(self.test_dir, 'trace.json')
+        self.assertEqual(cli.main(['screenshots', self.test_dir, '--header-only', '--no-move', '--profile', trace]), 0)
+        with open(trace) as f:
+            events = json.load(f)['traceEvents']
+        self.assertIn('scan', {event['name'] for event in events if event['ph'] == 'X'})
+        self.assertIn('scan', {event['args']['name'] for event in events if event['ph'] == 'M'})
+
+    def test_screenshots_header_only(self):
+        """Test header-only screenshot scoring stores scores without moving anything"""
+        self.assertEqual(cli.main(['screenshots', self.test_dir, '--header-only', '--no-move']), 0)
+        with MetadataStore.for_directory(self.test_dir) as store:
+            self.assertIn('screenshot', store.get_scores('flat.png'))
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'screenshots')))
+
+    def test_dedupe_moves_duplicates(self):
+        """Test identical images are grouped and all but one moved"""
+        self.assertEqual(cli.main(['dedupe', self.test_dir, '--move']), 0)
+        self.assertEqual(len(os.listdir(os.path.join(self.test_dir, 'duplicates'))), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'flat.png')))
+
+    def test_invalid_directory(self):
+        """Test a missing folder fails without opening a dialog"""
+        self.assertEqual(cli.main(['scan', os.path.join(self.test_dir, 'missing')]), 1)
+
+    def test_apply_manifest(self):
+        """Test apply moves files from a manifest and --undo puts them back"""
+        manifest = os.path.join(self.test_dir, 'decisions.csv')
+        with open(manifest, 'w') as f:
+            f.write("file,decision\nflat.png,delete\nsharp0.png,keep\n")
+        self.assertEqual(cli.main(['apply', manifest]), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'delete', 'flat.png')))
+        self.assertEqual(cli.main(['apply', '--undo', '-d', self.test_dir]), 0)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'flat.png')))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'sharp0.png')))
+
+    def test_tag_find(self):
+        """Test --find lists stored tag matches"""
+        path = os.path.join(self.test_dir, 'flat.png')
+        with MetadataStore.for_directory(self.test_dir) as store:
+            store.set_tags('flat.png', os.stat(path), [('wall', 0.9)])
+            store.commit()
+        with unittest.mock.patch('builtins.print') as mock_print:
+            self.assertEqual(cli.main(['tag', self.test_dir, '--find', 'tag:wall']), 0)
+        mock_print.assert_called_once_with('flat.png')
+
+
+class TestFindDuplicates(unittest.TestCase):
+    def test_groups_within_distance(self):
+        """Test hashes a few bits apart are grouped and distant ones aren't"""
+        base = 0xF0F0_1234_ABCD_0001
+        hashes = {'a': base, 'b': base ^ 0b101, 'c': base ^ (1 << 63), 'd': ~base & (2**64 - 1)}
+        self.assertEqual(hamming(hashes['a'], hashes['b']), 2)
+        self.assertEqual(find_duplicates(hashes, max_distance=4), [['a', 'b', 'c']])
+        self.assertEqual(find_duplicates(hashes, max_distance=1), [['a', 'c']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from declutrr.constants import *
+from declutrr.companions import companions, group_photos, photo_names
+from declutrr.file_manager import mark_as_kept, unmark_as_kept
+from declutrr.image_processor import ImageProcessor
+from declutrr.organizer import _move
+
+FILES = ['IMG_0001.JPG', 'IMG_0001.CR2', 'IMG_0001.xmp', 'IMG_0002.NEF', 'IMG_0003.jpg', 'notes.txt']
+
+
+class TestCompanions(unittest.TestCase):
+    def setUp(self):
+        """Create a RAW+JPEG pair with a sidecar, a lone RAW and a lone JPEG"""
+        self.test_dir = tempfile.mkdtemp()
+        for name in FILES:
+            with open(os.path.join(self.test_dir, name), 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def listing(self, folder: str = '') -> list[str]:
+        return sorted(os.listdir(os.path.join(self.test_dir, folder)))
+
+    def test_group_photos(self):
+        """Pairs are listed once by their JPEG; lone RAW files stand for themselves"""
+        self.assertEqual(photo_names(FILES), ['IMG_0001.JPG', 'IMG_0002.NEF', 'IMG_0003.jpg'])
+        self.assertEqual(group_photos(FILES)['IMG_0001.JPG'], ['IMG_0001.CR2'])
+        self.assertEqual(companions(os.path.join(self.test_dir, 'IMG_0001.JPG')), ['IMG_0001.CR2', 'IMG_0001.xmp'])
+        self.assertEqual(companions(os.path.join(self.test_dir, 'IMG_0003.jpg')), [])
+
+    def test_get_image_files_lists_pairs_once(self):
+        """The sorting queue has one entry per photo"""
+        processor = ImageProcessor(self.test_dir)
+        self.assertEqual(sorted(processor.get_image_files()), ['IMG_0001.JPG', 'IMG_0002.NEF', 'IMG_0003.jpg'])
+
+    def test_move_file_carries_companions(self):
+        """Keeping a photo moves its RAW and sidecar too, and restoring brings them back"""
+        processor = ImageProcessor(self.test_dir)
+        processor.move_to_keep('IMG_0001.JPG')
+        self.assertEqual(self.listing('keep'), ['IMG_0001.CR2', 'IMG_0001.JPG', 'IMG_0001.xmp'])
+        processor.restore_from_keep('IMG_0001.JPG')
+        self.assertEqual(self.listing('keep'), [])
+        self.assertIn('IMG_0001.CR2', self.listing())
+
+    def test_prefix_renames_companions(self):
+        """The G_ prefix goes on every file of the photo, and comes off again"""
+        self.assertTrue(mark_as_kept(os.path.join(self.test_dir, 'IMG_0001.JPG')))
+        self.assertTrue({'G_IMG_0001.JPG', 'G_IMG_0001.CR2', 'G_IMG_0001.xmp'} <= set(self.listing()))
+        self.assertTrue(unmark_as_kept(os.path.join(self.test_dir, 'G_IMG_0001.JPG')))
+        self.assertTrue(set(FILES) <= set(self.listing()))
+
+    def test_organize_renames_companions(self):
+        """Companions get the photo's new name with their own extension"""
+        os.makedirs(os.path.join(self.test_dir, '202405'))
+        renames = _move(self.test_dir, 'IMG_0001.JPG', os.path.join('202405', 'IMG_20240501_123000.JPG'))
+        self.assertEqual([new for _, new in renames], [os.path.join('202405', name) for name in (
+            'IMG_20240501_123000.JPG', 'IMG_20240501_123000.CR2', 'IMG_20240501_123000.xmp')])
+        self.assertEqual(self.listing('202405'),
+                         ['IMG_20240501_123000.CR2', 'IMG_20240501_123000.JPG', 'IMG_20240501_123000.xmp'])
+
+
+if __name__ == '__main__':
+    unittest.main()
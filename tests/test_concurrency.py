@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from declutrr import tracing
+from declutrr.concurrency import AdaptivePool, ConcurrencyLimiter, fixed_workers
+
+
+class TestConcurrencyLimiter(unittest.TestCase):
+    def test_manual_override(self):
+        """Test an explicit count or DECLUTRR_WORKERS_<NAME> fixes the pool size"""
+        self.assertEqual(fixed_workers('decode', 3), 3)
+        with patch.dict(os.environ, {'DECLUTRR_WORKERS_DECODE': '2'}):
+            self.assertEqual(fixed_workers('decode'), 2)
+            limiter = ConcurrencyLimiter('decode', maximum=16)
+        self.assertFalse(limiter.adaptive)
+        self.assertEqual((limiter.limit, limiter.maximum), (2, 2))
+        with patch.dict(os.environ, {'DECLUTRR_WORKERS_DECODE': 'many'}):
+            self.assertIsNone(fixed_workers('decode'))
+
+    def test_increase_and_decrease(self):
+        """Test the limit grows by one while tasks keep their speed and halves when they only queue"""
+        limiter = ConcurrencyLimiter('test', maximum=16, initial=4)
+        limiter._adjust(throughput=100, latency=0.010)
+        self.assertEqual(limiter.limit, 5)
+        limiter._adjust(throughput=125, latency=0.012)
+        self.assertEqual(limiter.limit, 6)
+        # Twice as slow per task, no more done per second: the disk is queueing
+        limiter._adjust(throughput=125, latency=0.020)
+        self.assertEqual(limiter.limit, 3)
+        # Slower, but finishing more: still worth it
+        limiter._adjust(throughput=200, latency=0.020)
+        self.assertEqual(limiter.limit, 4)
+
+    def test_limit_is_respected(self):
+        """Test no more tasks run at once than the limit"""
+        limiter = ConcurrencyLimiter('test', maximum=3, workers=3)
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def task():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.005)
+            with lock:
+                running[0] -= 1
+
+        threads = [threading.Thread(target=limiter.run, args=(task,)) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 3)
+
+
+class TestAdaptivePool(unittest.TestCase):
+    def setUp(self):
+        """Create a folder for traces"""
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Stop tracing and remove the folder"""
+        tracing.stop_tracing()
+        shutil.rmtree(self.test_dir)
+
+    def test_grows_when_parallelism_pays(self):
+        """Test a pool of waits that overlap perfectly ends above where it started, with the level traced"""
+        trace = os.path.join(self.test_dir, 'trace.json')
+        tracing.start_tracing(trace)
+        with AdaptivePool('sleep', maximum=12, initial=2) as pool:
+            list(pool.map(time.sleep, [0.002] * 300))
+        self.assertGreater(pool.limiter.limit, 2)
+        self.assertTrue(pool.limiter.history)
+        tracing.stop_tracing()
+        with open(trace) as f:
+            levels = [event['args']['limit'] for event in json.load(f)['traceEvents']
+                      if event['ph'] == 'C' and event['name'] == 'sleep workers']
+        self.assertEqual(levels[0], 2)
+        self.assertEqual(levels[-1], pool.limiter.limit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from declutrr import cli
+from declutrr.constants import *
+from declutrr.decisions import DECISION_BACKENDS, get_decision_backend
+from declutrr.manifest import apply_manifest, read_manifest, undo_last_apply
+
+
+def xattrs_supported(path):
+    try:
+        os.setxattr(path, 'user.test', b'1')
+        return True
+    except (AttributeError, OSError):
+        return False
+
+
+class TestDecisionBackends(unittest.TestCase):
+    def setUp(self):
+        """Create a folder with two placeholder images"""
+        self.test_dir = tempfile.mkdtemp()
+        for name in ('a.jpg', 'b.jpg'):
+            with open(os.path.join(self.test_dir, name), 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def backends(self):
+        for name in DECISION_BACKENDS:
+            if name == 'xattr' and not xattrs_supported(os.path.join(self.test_dir, 'a.jpg')):
+                continue
+            yield name
+
+    def test_record_and_revert(self):
+        """Test every backend records, reports and reverts decisions by original name"""
+        for name in self.backends():
+            with self.subTest(backend=name):
+                backend = get_decision_backend(self.test_dir, name)
+                self.assertTrue(backend.record('a.jpg', ACTION_KEEP))
+                self.assertTrue(backend.record('b.jpg', ACTION_DELETE))
+                self.assertEqual(backend.decision('a.jpg'), ACTION_KEEP)
+                self.assertEqual(backend.decision('b.jpg'), ACTION_DELETE)
+                self.assertTrue(backend.exists('a.jpg'))
+                backend.close()
+
+                # A new instance sees the decisions, e.g. in the next session
+                backend = get_decision_backend(self.test_dir, name)
+                self.assertEqual(backend.decision('a.jpg'), ACTION_KEEP)
+                self.assertTrue(backend.revert('a.jpg', ACTION_KEEP))
+                self.assertTrue(backend.revert('b.jpg', ACTION_DELETE))
+                self.assertIsNone(backend.decision('a.jpg'))
+                self.assertIsNone(backend.decision('b.jpg'))
+                backend.close()
+                self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'a.jpg')))
+                self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'b.jpg')))
+
+    def test_prefix_renames_kept_files(self):
+        """Test the prefix backend renames in place and hides kept files"""
+        backend = get_decision_backend(self.test_dir, 'prefix')
+        backend.record('a.jpg', ACTION_KEEP)
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'G_a.jpg')))
+        self.assertEqual(backend.undecided(['G_a.jpg', 'b.jpg']), ['b.jpg'])
+
+    def test_manifest_touches_no_photos(self):
+        """Test the manifest backend only writes a manifest that apply understands"""
+        backend = get_decision_backend(self.test_dir, 'manifest')
+        backend.record('a.jpg', ACTION_DELETE)
+        backend.record('b.jpg', ACTION_KEEP)
+        backend.revert('b.jpg', ACTION_KEEP)
+        backend.close()
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ['a.jpg', 'b.jpg', DECISIONS_MANIFEST_FILENAME])
+
+        stats = apply_manifest(self.test_dir, read_manifest(os.path.join(self.test_dir, DECISIONS_MANIFEST_FILENAME)))
+        self.assertEqual((stats[ACTION_DELETE], stats['unchanged']), (1, 1))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'delete', 'a.jpg')))
+
+    def test_apply_with_backend_and_undo(self):
+        """Test apply goes through the chosen backend and undo uses the journaled one"""
+        apply_manifest(self.test_dir, [('a.jpg', ACTION_KEEP)], backend='xmp')
+        self.assertEqual(get_decision_backend(self.test_dir, 'xmp').decision('a.jpg'), ACTION_KEEP)
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'keep')))
+        self.assertEqual(undo_last_apply(self.test_dir)['restored'], 1)
+        self.assertIsNone(get_decision_backend(self.test_dir, 'xmp').decision('a.jpg'))
+
+    def test_xmp_reject_rating(self):
+        """Test deleting rates -1 and reverting restores an earlier rating"""
+        backend = get_decision_backend(self.test_dir, 'xmp')
+        sidecar = os.path.join(self.test_dir, 'a.xmp')
+        with open(sidecar, 'w') as f:
+            f.write('<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+                    '<rdf:Description rdf:about="" xmlns:xmp="http://ns.adobe.com/xap/1.0/" xmp:Rating="3"/>'
+                    '</rdf:RDF></x:xmpmeta>')
+        backend.record('a.jpg', ACTION_DELETE)
+        with open(sidecar) as f:
+            self.assertIn('xmp:Rating="-1"', f.read())
+        backend.revert('a.jpg', ACTION_DELETE)
+        with open(sidecar) as f:
+            self.assertIn('xmp:Rating="3"', f.read())
+
+    def test_xmp_ignores_foreign_decisions(self):
+        """Test a sidecar value that isn't keep or delete doesn't count as a decision"""
+        backend = get_decision_backend(self.test_dir, 'xmp')
+        with open(os.path.join(self.test_dir, 'a.xmp'), 'w') as f:
+            f.write('<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+                    '<rdf:Description rdf:about="" xmlns:declutrr="https://github.com/vmatt/declutrr/ns/1.0/"'
+                    ' declutrr:Decision="maybe"/></rdf:RDF></x:xmpmeta>')
+        self.assertIsNone(backend.decision('a.jpg'))
+        self.assertEqual(backend.undecided(['a.jpg', 'b.jpg']), ['a.jpg', 'b.jpg'])
+
+    def test_unknown_backend(self):
+        """Test unknown names are rejected and the CLI offers every backend"""
+        with self.assertRaises(ValueError):
+            get_decision_backend(self.test_dir, 'nope')
+        self.assertEqual(set(cli.DECISION_BACKEND_NAMES), set(DECISION_BACKENDS))
+
+
+if __name__ == '__main__':
+    unittest.main()
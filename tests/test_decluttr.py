@@ -7,6 +7,7 @@ from PIL import Image
 from declutrr.constants import *
 from declutrr.app import ImageSorter
 from declutrr.image_processor import ImageProcessor
+from declutrr.decisions import get_decision_backend
 from tests.generate_test_images import create_test_images
 
 def get_display_or_skip():
@@ -151,6 +152,7 @@ class TestImageSorter(unittest.TestCase):
         # Setup test data and processor
         self.app.directory = os.path.join(FIXTURES_DIR, "test_photos")
         self.app.processor = ImageProcessor(self.app.directory)
+        self.app.decisions = get_decision_backend(self.app.directory, 'prefix')
         
         # Setup UI components needed for test
         self.app.setup_ui()
@@ -162,7 +164,7 @@ class TestImageSorter(unittest.TestCase):
         self.app.current_index = 0
         
         with patch('os.path.exists') as mock_exists, \
-             patch.object(self.app.processor, 'restore_from_delete') as mock_restore, \
+             patch('declutrr.image_processor.ImageProcessor.move_file') as mock_move, \
              patch.object(self.app, '_load_and_display_current_image'):
             mock_exists.return_value = True
             self.app.undo_last_action()
@@ -170,15 +172,15 @@ class TestImageSorter(unittest.TestCase):
             # Verify the undo delete operation
             self.assertEqual(self.app.history, [])
             self.assertEqual(self.app.stats["deleted"], 0)
-            mock_restore.assert_called_once_with("test1.jpg")
+            mock_move.assert_called_once_with("test1.jpg", self.app.processor.delete_dir, self.app.directory)
 
         # Test undo keep
-        self.app.history = [("G_test2.jpg", "keep")]
+        self.app.history = [("test2.jpg", "keep")]
         self.app.stats = {"deleted": 0, "kept": 1}
-        self.app.image_files = ["G_test2.jpg"]
+        self.app.image_files = ["test2.jpg"]
         
         with patch('os.path.exists') as mock_exists, \
-             patch('declutrr.file_manager.unmark_as_kept') as mock_unmark:
+             patch('declutrr.decisions.unmark_as_kept') as mock_unmark:
             mock_exists.return_value = True
             mock_unmark.return_value = True
             self.app.undo_last_action()
@@ -186,7 +188,7 @@ class TestImageSorter(unittest.TestCase):
             # Verify the undo keep operation
             self.assertEqual(self.app.history, [])
             self.assertEqual(self.app.stats["kept"], 0)
-            mock_unmark.assert_called_once()
+            mock_unmark.assert_called_once_with(os.path.join(self.app.directory, "G_test2.jpg"))
 
     def test_load_directory(self):
         """Test loading directory with images"""
@@ -203,6 +205,7 @@ class TestImageSorter(unittest.TestCase):
         # Set directory to test_photos
         self.app.directory = os.path.join(FIXTURES_DIR, "test_photos")
         self.app.processor = ImageProcessor(self.app.directory)
+        self.app.decisions = get_decision_backend(self.app.directory)
         
         # Mock display methods to avoid tkinter image issues
         with patch.object(self.app, '_load_and_display_current_image'), \
@@ -221,6 +224,88 @@ class TestImageSorter(unittest.TestCase):
             self.app.load_directory()
             self.assertEqual(self.app.status_var.get(), "No images found in directory")
 
+    def test_load_directory_shared(self):
+        """Test a shared session only loads images no other operator has leased"""
+        from tests.fixtures import FIXTURES_DIR
+        from declutrr.leases import LeaseManager
+
+        create_test_images()
+        self.app.setup_ui()
+        self.app.directory = os.path.join(FIXTURES_DIR, "test_photos")
+        self.app.processor = ImageProcessor(self.app.directory)
+        self.app.decisions = get_decision_backend(self.app.directory)
+        other = LeaseManager(self.app.directory, 'other', chunk_size=2)
+        other.sync(self.app.decisions.undecided(self.app.processor.get_image_files()))
+        taken = other.acquire(self.app.decisions.undecided)
+        self.app.leases = LeaseManager(self.app.directory, 'me', chunk_size=2)
+
+        with patch.object(self.app, '_load_and_display_current_image'), \
+             patch.object(self.app, 'resize_image'):
+            self.app.load_directory()
+        self.assertEqual(self.app.image_files, other.chunks[1])
+        self.assertFalse(set(taken) & set(self.app.image_files))
+        self.app.release_leases()
+
+    def test_lease_more_does_not_block(self):
+        """Test the next shared chunk is leased in the background and shown once it is in"""
+        from tests.fixtures import FIXTURES_DIR
+        from declutrr.leases import LeaseManager
+
+        create_test_images()
+        self.app.setup_ui()
+        self.app.directory = os.path.join(FIXTURES_DIR, "test_photos")
+        self.app.processor = ImageProcessor(self.app.directory)
+        self.app.decisions = get_decision_backend(self.app.directory)
+        self.app.leases = LeaseManager(self.app.directory, 'me', chunk_size=2)
+
+        with patch.object(self.app, '_load_and_display_current_image') as show, \
+             patch.object(self.app, 'resize_image'):
+            self.app.load_directory()
+            first = list(self.app.image_files)
+            for name in first:
+                self.app.image_status[name] = STATUS_KEPT
+            show.reset_mock()
+            task = self.app.lease_task
+            self.app.display_current_image()
+            self.assertTrue(self.app.status_var.get().startswith("Leasing more images"))
+            self.assertEqual(self.app.image_files, first)
+            self.assertEqual(task.priority, PRIORITY_INTERACTIVE)
+
+            task.result(timeout=5)
+            self.app.scheduler.poll()
+            self.assertGreater(len(self.app.image_files), len(first))
+            show.assert_called_once()
+        self.app.release_leases()
+
+    def test_load_directory_with_filter(self):
+        """Test loading only the images matching a filter"""
+        from tests.fixtures import FIXTURES_DIR
+        from declutrr.store import MetadataStore
+
+        create_test_images()
+        self.app.directory = os.path.join(FIXTURES_DIR, "test_photos")
+        self.app.processor = ImageProcessor(self.app.directory)
+        self.app.decisions = get_decision_backend(self.app.directory)
+        self.app.setup_ui()
+
+        with MetadataStore.for_directory(self.app.directory) as store:
+            path = os.path.join(self.app.directory, "graphic.png")
+            store.set_score("graphic.png", os.stat(path), "screenshot", 5)
+            store.commit()
+
+        self.app.filter_var.set("screenshots")
+        with patch.object(self.app, '_load_and_display_current_image'), \
+             patch.object(self.app, 'resize_image'):
+            self.app.load_directory()
+        self.assertEqual(self.app.image_files, ["graphic.png"])
+        self.assertEqual(self.app.status_var.get(), "Image 1 of 1 [screenshots]: graphic.png")
+
+        # Invalid filters are reported instead of raising
+        self.app.filter_var.set("blur <")
+        self.app.load_directory()
+        self.assertEqual(self.app.image_files, [])
+        self.assertTrue(self.app.status_var.get().startswith("Invalid filter"))
+
     def test_display_current_image(self):
         """Test display_current_image functionality"""
         from tests.fixtures import FIXTURES_DIR
@@ -322,6 +407,7 @@ class TestImageSorter(unittest.TestCase):
         self.app.setup_ui()
         self.app.directory = os.path.join(FIXTURES_DIR, "test_photos")
         self.app.processor = ImageProcessor(self.app.directory)
+        self.app.decisions = get_decision_backend(self.app.directory, 'prefix')
         self.app.image_files = ["image.jpg", "photo.jpeg", "graphic.png"]
         self.app.current_index = 0
         self.app.stats = {"deleted": 0, "kept": 0}
@@ -341,7 +427,7 @@ class TestImageSorter(unittest.TestCase):
             # Test keep image
             self.app.keep_image()
             self.assertEqual(self.app.stats["kept"], 1)
-            self.assertEqual(self.app.image_status["G_photo.jpeg"], "kept")
+            self.assertEqual(self.app.image_status["photo.jpeg"], "kept")
             self.assertEqual(self.app.current_index, 2)
             self.assertTrue(os.path.exists(os.path.join(self.app.directory, "G_photo.jpeg")))
 
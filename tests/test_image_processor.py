@@ -128,5 +128,71 @@ class TestImageProcessor(unittest.TestCase):
         self.assertIn("photo.jpeg", result)
         self.assertIn("graphic.png", result)
 
+    def test_get_image_files_with_filter(self):
+        """Test filtered listing only returns files matching stored scores"""
+        from declutrr.store import MetadataStore
+        create_test_images()
+
+        with MetadataStore.for_directory(self.test_dir) as store:
+            for name, score in [("image.jpg", 30.0), ("photo.jpeg", 300.0)]:
+                store.set_score(name, os.stat(os.path.join(self.test_dir, name)), "blur", score)
+            store.commit()
+
+        self.assertEqual(self.processor.get_image_files("blur < 90"), ["image.jpg"])
+        with self.assertRaises(ValueError):
+            self.processor.get_image_files("blur <")
+
+    def test_load_image_from_pooled_buffer(self):
+        """Test images decode from reused buffers, with EXIF rotation applied"""
+        from declutrr.image_processor import BUFFERS
+        create_test_images()
+        rotated = os.path.join(self.test_dir, "rotated.jpg")
+        exif = Image.Exif()
+        exif[274] = 6
+        Image.new('RGB', (80, 40), 'white').save(rotated, exif=exif)
+
+        first = ImageProcessor.load_image(os.path.join(self.test_dir, "image.jpg"))
+        second = ImageProcessor.load_image(os.path.join(self.test_dir, "graphic.png"))
+        self.assertEqual(first.size, (800, 600))
+        self.assertGreater(first.getpixel((400, 300))[0], 200)
+        self.assertEqual(second.getpixel((0, 0)), (0, 128, 0))
+        self.assertEqual(ImageProcessor.load_image(rotated).size, (40, 80))
+        self.assertEqual(len(BUFFERS.free), 1)
+
+    def test_fit_image(self):
+        """Test images are scaled down to fit, never up, keeping their aspect ratio"""
+        image = Image.new('RGB', (4000, 1000))
+        self.assertEqual(ImageProcessor.fit_image(image, (800, 500)).size, (800, 200))
+        small = Image.new('RGB', (300, 200))
+        self.assertIs(ImageProcessor.fit_image(small, (800, 500)), small)
+
+    def test_load_image_invalid(self):
+        """Test unreadable files give None"""
+        create_test_images()
+        self.assertIsNone(ImageProcessor.load_image(os.path.join(self.test_dir, "missing.jpg")))
+        self.assertIsNone(ImageProcessor.load_image(os.path.join(self.test_dir, "invalid.txt")))
+
+    def test_load_image_truncated(self):
+        """Test a file cut short gives None, not a half-decoded image"""
+        from declutrr.image_processor import BUFFERS
+        create_test_images()
+        truncated = os.path.join(self.test_dir, "truncated.jpg")
+        with open(os.path.join(self.test_dir, "image.jpg"), 'rb') as f:
+            data = f.read()
+        with open(truncated, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        self.assertIsNone(ImageProcessor.load_image(truncated))
+        self.assertEqual(len(BUFFERS.free), 1)
+
+    def test_prefetch_and_evict(self):
+        """Test read-ahead hints are sent once per file and dropped on decision"""
+        create_test_images()
+        self.processor.prefetch(["image.jpg", "photo.jpeg", "missing.jpg"])
+        self.processor.prefetch(["image.jpg"])
+        self.processor.evict("image.jpg")
+        if hasattr(os, 'posix_fadvise'):
+            self.assertEqual(self.processor.prefetched, {"photo.jpeg", "missing.jpg"})
+        self.processor.close()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from types import SimpleNamespace
+from PIL import Image
+
+from declutrr.inference import (InferenceServer, LocalPredictor, RemotePredictor,
+                                default_socket_path, get_predictor, is_running)
+
+
+class FakeTensor(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeDetector:
+    """Detects one 'wide' or 'tall' box per image and records batch sizes"""
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, images):
+        self.batches.append(len(images))
+        return [
+            SimpleNamespace(
+                names={0: 'wide', 1: 'tall'}, probs=None,
+                boxes=SimpleNamespace(cls=FakeTensor([0 if image.width >= image.height else 1]),
+                                      conf=FakeTensor([0.5]))
+            )
+            for image in images
+        ]
+
+
+class TestInference(unittest.TestCase):
+    def setUp(self):
+        """Start a daemon with a fake model loader on a temporary socket"""
+        self.test_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.test_dir, 'inference.sock')
+        self.models = {}
+
+        def loader(name):
+            self.models[name] = FakeDetector()
+            return self.models[name]
+
+        self.loader = loader
+        self.server = InferenceServer(self.socket_path, loader=loader, window=0.2)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the daemon"""
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.test_dir)
+
+    def test_remote_predict(self):
+        """Test images round-trip through the daemon"""
+        predictor = get_predictor('det', self.socket_path, self.loader)
+        self.assertIsInstance(predictor, RemotePredictor)
+        results = predictor([Image.new('RGB', (40, 20)), Image.new('L', (20, 40))])
+        self.assertEqual([r['boxes'][0][0] for r in results], ['wide', 'tall'])
+        predictor.close()
+
+    def test_model_stays_loaded(self):
+        """Test the model is loaded once across clients"""
+        for _ in range(3):
+            predictor = RemotePredictor('det', self.socket_path)
+            predictor([Image.new('RGB', (8, 8))])
+            predictor.close()
+        self.assertEqual(list(self.models), ['det'])
+        self.assertEqual(self.models['det'].batches, [1, 1, 1])
+
+    def test_concurrent_clients_are_batched(self):
+        """Test requests arriving within the window share one model call"""
+        barrier = threading.Barrier(4)
+
+        def client():
+            predictor = RemotePredictor('det', self.socket_path)
+            barrier.wait()
+            predictor([Image.new('RGB', (8, 8))] * 2)
+            predictor.close()
+
+        threads = [threading.Thread(target=client) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(self.models['det'].batches), 8)
+        self.assertLess(len(self.models['det'].batches), 4)
+
+    def test_fallback_without_daemon(self):
+        """Test in-process inference when no daemon is running"""
+        missing = os.path.join(self.test_dir, 'missing.sock')
+        self.assertFalse(is_running(missing))
+        predictor = get_predictor('det', missing, self.loader)
+        self.assertIsInstance(predictor, LocalPredictor)
+        self.assertEqual(predictor([Image.new('RGB', (40, 20))])[0]['boxes'], [('wide', 0.5)])
+
+    def test_fallback_when_daemon_stops(self):
+        """Test a client keeps working after the daemon goes away"""
+        predictor = RemotePredictor('det', self.socket_path, self.loader)
+        predictor([Image.new('RGB', (8, 8))])
+        self.server.shutdown()
+        self.server.server_close()
+        predictor.close()
+        results = predictor([Image.new('RGB', (40, 20))])
+        self.assertEqual(results[0]['boxes'], [('wide', 0.5)])
+        self.assertIsNotNone(predictor.fallback)
+
+    def test_stale_socket_is_replaced(self):
+        """Test a socket file left by a crashed daemon doesn't block startup"""
+        stale = os.path.join(self.test_dir, 'stale.sock')
+        open(stale, 'w').close()
+        server = InferenceServer(stale, loader=self.loader)
+        server.server_close()
+        self.assertFalse(os.path.exists(stale))
+        with self.assertRaises(RuntimeError):
+            InferenceServer(self.socket_path, loader=self.loader)
+
+    def test_default_socket_in_private_dir(self):
+        """Test the fallback socket goes in a directory only this user can enter"""
+        with patch.dict(os.environ), patch('tempfile.gettempdir', return_value=self.test_dir):
+            os.environ.pop('XDG_RUNTIME_DIR', None)
+            folder = os.path.dirname(default_socket_path())
+            InferenceServer(loader=self.loader).server_close()
+            self.assertEqual(os.stat(folder).st_mode & 0o777, 0o700)
+
+            os.chmod(folder, 0o777)
+            with self.assertRaises(RuntimeError):
+                InferenceServer(loader=self.loader)
+
+    def test_socket_of_another_user_is_ignored(self):
+        """Test images are never sent to a socket someone else created"""
+        with patch('os.getuid', return_value=os.getuid() + 1):
+            self.assertFalse(is_running(self.socket_path))
+            predictor = RemotePredictor('det', self.socket_path, self.loader)
+            self.assertEqual(predictor([Image.new('RGB', (40, 20))])[0]['boxes'], [('wide', 0.5)])
+        self.assertIsNotNone(predictor.fallback)
+        self.assertEqual(self.server.batchers, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+import multiprocessing
+
+from declutrr.constants import *
+from declutrr.decisions import get_decision_backend
+from declutrr.leases import LeaseManager
+
+FILES = [f"IMG_{i:04d}.jpg" for i in range(60)]
+
+
+def operate(directory: str, owner: str) -> list[str]:
+    """One operator keeping everything it is given, a little slower than a script would."""
+    backend = get_decision_backend(directory, 'subfolder')
+    leases = LeaseManager(directory, owner, chunk_size=5)
+    leases.sync(backend.undecided(FILES))
+    sorted_here = []
+    while True:
+        files = leases.acquire(backend.undecided)
+        if not files:
+            return sorted_here
+        for name in files:
+            time.sleep(0.005)
+            assert backend.record(name, ACTION_KEEP), name
+            sorted_here.append(name)
+            chunk = leases.decided(name)
+            if chunk is not None:
+                leases.finish(chunk)
+
+
+class TestLeases(unittest.TestCase):
+    def setUp(self):
+        """Create a folder of placeholder images"""
+        self.test_dir = tempfile.mkdtemp()
+        for name in FILES:
+            with open(os.path.join(self.test_dir, name), 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def manager(self, owner: str, **kwargs) -> LeaseManager:
+        leases = LeaseManager(self.test_dir, owner, chunk_size=kwargs.pop('chunk_size', 20), **kwargs)
+        leases.sync(FILES)
+        return leases
+
+    def undecided(self, names: list[str]) -> list[str]:
+        return [name for name in names if os.path.exists(os.path.join(self.test_dir, name))]
+
+    def test_operators_get_disjoint_streams(self):
+        """Test several processes sorting one folder each sort different files, and all of them"""
+        with multiprocessing.get_context('spawn').Pool(3) as pool:
+            streams = pool.starmap(operate, [(self.test_dir, f"operator {i}") for i in range(3)])
+        self.assertEqual(sorted(name for stream in streams for name in stream), FILES)
+        self.assertGreater(sum(bool(stream) for stream in streams), 1)
+        self.assertEqual(len(os.listdir(os.path.join(self.test_dir, 'keep'))), len(FILES))
+
+    def test_queue_is_shared(self):
+        """Test operators that see different files at start build one queue without overlaps"""
+        first = LeaseManager(self.test_dir, 'first', chunk_size=20)
+        first.sync(FILES[:30])
+        second = LeaseManager(self.test_dir, 'second', chunk_size=20)
+        second.sync(FILES)
+        first.sync(FILES[10:])
+        self.assertEqual(first.chunks, second.chunks)
+        self.assertEqual([name for chunk in first.chunks for name in chunk], FILES)
+
+    def test_expired_lease_is_taken_over(self):
+        """Test a lease nobody renewed is taken over, and its old owner notices"""
+        crashed, other = self.manager('crashed'), self.manager('other')
+        self.assertEqual(crashed.acquire(self.undecided), FILES[:20])
+        self.assertEqual(other.acquire(self.undecided), FILES[20:40])
+        self.assertEqual(other.acquire(self.undecided), FILES[40:])
+        self.assertEqual(other.acquire(self.undecided), [])
+        stale = time.time() - LEASE_SECONDS - 1
+        os.utime(os.path.join(self.test_dir, LEASE_DIRNAME, f"0.{LEASE_ACTIVE}"), (stale, stale))
+        self.assertEqual(other.acquire(self.undecided), FILES[:20])
+        self.assertEqual(crashed.renew(), [0])
+        self.assertEqual(other.renew(), [])
+
+    def test_unstarted_chunks_are_rebalanced(self):
+        """Test an operator out of work takes a chunk another leased ahead, but not one being sorted"""
+        busy, idle = self.manager('busy'), self.manager('idle')
+        busy.acquire(self.undecided)
+        busy.acquire(self.undecided, ahead=True)
+        idle.acquire(self.undecided)
+        self.assertEqual(idle.acquire(self.undecided, ahead=True), [])
+        self.assertEqual(idle.acquire(self.undecided), FILES[20:40])
+        self.assertFalse(busy.start(1))
+        self.assertNotIn(1, busy.held)
+        self.assertEqual(idle.acquire(self.undecided), [])
+
+    def test_finished_and_released_chunks(self):
+        """Test finished chunks are never handed out again, and released ones are"""
+        first, second = self.manager('first'), self.manager('second')
+        files = first.acquire(self.undecided)
+        for name in files:
+            os.remove(os.path.join(self.test_dir, name))
+            chunk = first.decided(name)
+        self.assertEqual(chunk, 0)
+        first.finish(chunk)
+        first.acquire(self.undecided)
+        first.release()
+        self.assertEqual(second.acquire(self.undecided), FILES[20:40])
+
+    def test_released_chunk_hands_out_only_undecided_files(self):
+        """Test files decided before a chunk was released aren't handed out again"""
+        backend = get_decision_backend(self.test_dir, 'subfolder')
+        first, second = self.manager('first', chunk_size=4), self.manager('second', chunk_size=4)
+        files = first.acquire(backend.undecided)
+        for name in files[:2]:
+            self.assertTrue(backend.record(name, ACTION_KEEP))
+            first.decided(name)
+        first.release()
+        self.assertEqual(second.acquire(backend.undecided), files[2:])
+
+    def test_chunk_finished_during_listing_is_skipped(self):
+        """Test a chunk whose .done appeared after the listing isn't leased again"""
+        first, second = self.manager('first'), self.manager('second')
+        first.acquire(self.undecided)
+        states = second._states()
+        first._finish(0, LEASE_ACTIVE)
+        first._drop(0)
+        with unittest.mock.patch.object(second, '_states', lambda: {**states, 0: {}}):
+            self.assertEqual(second.acquire(self.undecided), FILES[20:40])
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, LEASE_DIRNAME, f"0.{LEASE_ACTIVE}")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from declutrr.manifest import Journal, read_manifest, read_journal, apply_manifest, undo_last_apply, journal_paths
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        """Create a folder with a few placeholder images"""
+        self.test_dir = tempfile.mkdtemp()
+        for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+            with open(os.path.join(self.test_dir, name), 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.test_dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def exists(self, *parts):
+        return os.path.exists(os.path.join(self.test_dir, *parts))
+
+    def test_read_formats(self):
+        """Test CSV with and without header, JSON list and mapping, and NDJSON read alike"""
+        expected = [('a.jpg', 'keep'), ('b.jpg', 'delete')]
+        self.assertEqual(read_manifest(self.write('m.csv', "file,decision\na.jpg,keep\nb.jpg,DELETE\n")), expected)
+        self.assertEqual(read_manifest(self.write('n.csv', "a.jpg,keep\nb.jpg,delete\n")), expected)
+        self.assertEqual(read_manifest(self.write('m.json', json.dumps({'a.jpg': 'keep', 'b.jpg': 'delete'}))), expected)
+        self.assertEqual(read_manifest(self.write('l.json', json.dumps(
+            [{'file': 'a.jpg', 'decision': 'keep'}, {'file': 'b.jpg', 'decision': 'delete'}]))), expected)
+        self.assertEqual(read_manifest(self.write('m.ndjson',
+            '{"file": "a.jpg", "decision": "keep"}\n\n{"file": "b.jpg", "decision": "delete"}\n')), expected)
+
+    def test_read_rejects_unknown_decision(self):
+        """Test a bad decision names the line"""
+        with self.assertRaisesRegex(ValueError, r'm\.csv:2'):
+            read_manifest(self.write('m.csv', "a.jpg,keep\nb.jpg,archive\n"))
+
+    def test_apply_and_rerun(self):
+        """Test files are moved once and a rerun changes nothing"""
+        entries = [('a.jpg', 'keep'), ('b.jpg', 'delete'), ('c.jpg', 'skip'), ('gone.jpg', 'keep')]
+        stats = apply_manifest(self.test_dir, entries)
+        self.assertEqual((stats['keep'], stats['delete'], stats['unchanged'], stats['missing']), (1, 1, 1, 1))
+        self.assertTrue(self.exists('keep', 'a.jpg'))
+        self.assertTrue(self.exists('delete', 'b.jpg'))
+        self.assertTrue(self.exists('c.jpg'))
+
+        stats = apply_manifest(self.test_dir, entries)
+        self.assertEqual((stats['keep'], stats['delete'], stats['unchanged']), (0, 0, 3))
+
+    def test_changed_decision_moves_between_folders(self):
+        """Test a rerun with a changed decision moves the file to its new folder"""
+        apply_manifest(self.test_dir, [('a.jpg', 'keep')])
+        apply_manifest(self.test_dir, [('a.jpg', 'delete')])
+        self.assertTrue(self.exists('delete', 'a.jpg'))
+        apply_manifest(self.test_dir, [('a.jpg', 'skip')])
+        self.assertTrue(self.exists('a.jpg'))
+
+    def test_dry_run(self):
+        """Test a dry run moves nothing and writes no journal"""
+        stats = apply_manifest(self.test_dir, [('a.jpg', 'keep')], dry_run=True)
+        self.assertEqual(stats['keep'], 1)
+        self.assertTrue(self.exists('a.jpg'))
+        self.assertFalse(self.exists('keep'))
+        self.assertEqual(journal_paths(self.test_dir), [])
+
+    def test_rejects_paths(self):
+        """Test entries pointing outside the folder are refused"""
+        stats = apply_manifest(self.test_dir, [('../a.jpg', 'delete')])
+        self.assertEqual(stats['failed'], 1)
+
+    def test_undo(self):
+        """Test undo reverts the last run only"""
+        apply_manifest(self.test_dir, [('a.jpg', 'keep')])
+        apply_manifest(self.test_dir, [('a.jpg', 'delete'), ('b.jpg', 'delete')])
+        self.assertEqual(undo_last_apply(self.test_dir), {'restored': 2, 'missing': 0})
+        self.assertTrue(self.exists('keep', 'a.jpg'))
+        self.assertTrue(self.exists('b.jpg'))
+        self.assertEqual(len(journal_paths(self.test_dir)), 1)
+
+    def test_undo_keeps_unrestored_entries(self):
+        """Test entries undo couldn't restore stay in the journal for another try"""
+        apply_manifest(self.test_dir, [('a.jpg', 'delete'), ('b.jpg', 'delete')])
+        os.rename(os.path.join(self.test_dir, 'delete', 'b.jpg'), os.path.join(self.test_dir, 'b.moved'))
+        self.assertEqual(undo_last_apply(self.test_dir), {'restored': 1, 'missing': 1})
+        [path] = journal_paths(self.test_dir)
+        self.assertEqual([record['file'] for record in read_journal(path)], ['b.jpg'])
+        os.rename(os.path.join(self.test_dir, 'b.moved'), os.path.join(self.test_dir, 'delete', 'b.jpg'))
+        self.assertEqual(undo_last_apply(self.test_dir), {'restored': 1, 'missing': 0})
+        self.assertEqual(journal_paths(self.test_dir), [])
+
+    def test_journal_lines_are_flushed(self):
+        """Test each record is on disk before the journal is closed"""
+        journal = Journal(self.test_dir, 'apply')
+        journal.record({'file': 'a.jpg'})
+        self.assertEqual(read_journal(journal.path), [{'file': 'a.jpg'}])
+        journal.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+"""
+Memory-footprint tests for long sorting sessions.
+
+Loads and displays many large synthetic images the way a session does and
+checks memory against a budget, so a leaked PhotoImage, PIL image or read
+buffer fails here rather than after an hour of sorting. Defaults keep the
+run short; the long sessions of thousands of camera-sized images are marked
+slow and run in CI with:
+
+    python -m pytest -m slow tests/test_memory.py
+
+The short run can be made longer still:
+
+    DECLUTRR_MEMORY_IMAGES=5000 DECLUTRR_MEMORY_MEGAPIXELS=24 python -m pytest tests/test_memory.py
+"""
+import os
+import gc
+import shutil
+import tempfile
+import unittest
+import tracemalloc
+import tkinter as tk
+
+import pytest
+
+from declutrr.constants import *
+from declutrr.image_processor import ImageProcessor
+from benchmarks.corpus import generate_corpus
+from tests.test_decluttr import get_display_or_skip
+
+IMAGES = int(os.environ.get('DECLUTRR_MEMORY_IMAGES', 80))
+MEGAPIXELS = int(os.environ.get('DECLUTRR_MEMORY_MEGAPIXELS', 2))
+# Long sessions (pytest -m slow)
+LONG_SESSION_IMAGES = 2000
+LONG_SESSION_MEGAPIXELS = 12
+# Distinct files; the rest of the session are hard links to them
+DISTINCT_IMAGES = 8
+DISPLAY_SIZE = (DEFAULT_WINDOW_WIDTH, DEFAULT_WINDOW_HEIGHT)
+# Images after which memory is considered warmed up (pools filled, caches built)
+WARMUP_IMAGES = 16
+
+# Budgets. Peak: the read buffers plus this many decoded images at once
+# (the current one, its rotated copy and the next one), plus the reduced
+# copy fit_image() scales from (at most a quarter of an image), plus freed
+# image blocks the allocator hasn't handed back yet (up to an image's worth
+# with camera-sized images), plus slack for Python and Tk.
+PEAK_DECODED_IMAGES = 3
+PEAK_REDUCED_IMAGES = 0.25
+PEAK_RETAINED_IMAGES = 1
+PEAK_SLACK_MB = 64
+# Steady state: growth after warm-up, whatever the session length
+STEADY_RSS_GROWTH_MB = 32
+STEADY_PYTHON_GROWTH_MB = 1
+# Python objects a decision legitimately keeps (history, status, manifest)
+BYTES_PER_DECISION = 2048
+# Tk images alive at once; anything more is a PhotoImage leak
+MAX_TK_IMAGES = 2
+
+MB = 1024 * 1024
+
+
+def rss_bytes() -> int | None:
+    """Resident set size of this process, or None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemorySampler:
+    """RSS and tracemalloc samples taken during a session."""
+    def __init__(self):
+        gc.collect()
+        tracemalloc.start()
+        self.start_rss = rss_bytes()
+        self.start_traced = tracemalloc.get_traced_memory()[0]
+        self.peak_rss = self.start_rss
+        self.warm_rss = None
+        self.warm_traced = None
+
+    def sample(self) -> None:
+        rss = rss_bytes()
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss, rss)
+
+    def warmed_up(self) -> None:
+        gc.collect()
+        self.warm_rss = rss_bytes()
+        self.warm_traced = tracemalloc.get_traced_memory()[0]
+
+    def stop(self) -> dict:
+        """Peak and post-warm-up growth, in bytes."""
+        gc.collect()
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss = rss_bytes()
+        return {
+            'traced_peak': traced_peak - self.start_traced,
+            'traced_growth': traced - self.warm_traced,
+            'rss_peak': None if rss is None else self.peak_rss - self.start_rss,
+            'rss_growth': None if rss is None else rss - self.warm_rss,
+        }
+
+
+def make_session(directory: str, count: int = IMAGES, megapixels: int = MEGAPIXELS) -> list[str]:
+    """Generate a few large images and hard link them up to count files."""
+    specs = generate_corpus(directory, DISTINCT_IMAGES, sizes={megapixels: 1}, workers=2)
+    names = [spec['name'] for spec in specs]
+    for i in range(len(names), count):
+        source = specs[i % len(specs)]['name']
+        name = f"LINK_{i:05d}{os.path.splitext(source)[1]}"
+        os.link(os.path.join(directory, source), os.path.join(directory, name))
+        names.append(name)
+    return names
+
+
+class MemoryBudgetMixin:
+    images = IMAGES
+    megapixels = MEGAPIXELS
+
+    def assertWithinBudget(self, usage: dict, decisions: int = 0):
+        largest_file = max(os.path.getsize(os.path.join(self.test_dir, name)) for name in os.listdir(self.test_dir))
+        decoded = self.megapixels * 10 ** 6 * 4  # RGB images take four bytes a pixel in PIL
+        # Python-side: the read buffers (and one growing), nothing that scales with the session
+        self.assertLess(usage['traced_peak'], (BUFFER_POOL_SIZE + 1) * largest_file + 8 * MB)
+        self.assertLess(usage['traced_growth'], STEADY_PYTHON_GROWTH_MB * MB + decisions * BYTES_PER_DECISION)
+        if usage['rss_peak'] is None:
+            return
+        images = PEAK_DECODED_IMAGES + PEAK_REDUCED_IMAGES + PEAK_RETAINED_IMAGES
+        peak_budget = (BUFFER_POOL_SIZE + 1) * largest_file + images * decoded + PEAK_SLACK_MB * MB
+        self.assertLess(usage['rss_peak'], peak_budget)
+        self.assertLess(usage['rss_growth'], STEADY_RSS_GROWTH_MB * MB)
+
+
+class TestProcessorMemory(MemoryBudgetMixin, unittest.TestCase):
+    def setUp(self):
+        """Create a session's worth of large images"""
+        self.test_dir = tempfile.mkdtemp()
+        self.names = make_session(self.test_dir, self.images, self.megapixels)
+        self.processor = ImageProcessor(self.test_dir, create_dirs=False)
+
+    def tearDown(self):
+        """Remove the images"""
+        self.processor.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_load_and_fit_stay_within_budget(self):
+        """Test loading and scaling every image keeps peak and steady-state memory bounded"""
+        sampler = MemorySampler()
+        display = None
+        for i, name in enumerate(self.names):
+            if i == WARMUP_IMAGES:
+                sampler.warmed_up()
+            image = self.processor.load_image(os.path.join(self.test_dir, name))
+            self.assertIsNotNone(image)
+            display = self.processor.fit_image(image, DISPLAY_SIZE)
+            self.processor.prefetch(self.names[i + 1:i + 1 + self.processor.lookahead])
+            self.processor.evict(name)
+            sampler.sample()
+        self.assertLessEqual(display.width, DISPLAY_SIZE[0])
+        del image, display
+        self.assertWithinBudget(sampler.stop())
+
+
+class TestImageSorterMemory(MemoryBudgetMixin, unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Find or start a display"""
+        cls.display_type = get_display_or_skip()
+        if cls.display_type == 'Xvfb':
+            import subprocess
+            cls.xvfb_process = subprocess.Popen(['Xvfb', ':99'])
+            os.environ['DISPLAY'] = ':99'
+        elif not cls.display_type:
+            raise unittest.SkipTest("No display available and Xvfb not found")
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop Xvfb if we started it"""
+        if hasattr(cls, 'xvfb_process'):
+            cls.xvfb_process.terminate()
+            cls.xvfb_process.wait()
+
+    def setUp(self):
+        """Create a session's worth of large images and a sorter on them"""
+        from declutrr.app import ImageSorter
+        self.test_dir = tempfile.mkdtemp()
+        self.names = make_session(self.test_dir, self.images, self.megapixels)
+        self.root = tk.Tk()
+        self.root.geometry(f"{DEFAULT_WINDOW_WIDTH}x{DEFAULT_WINDOW_HEIGHT}")
+        self.app = ImageSorter(self.root, directory=self.test_dir, decisions='manifest')
+        self.root.update()
+
+    def tearDown(self):
+        """Close the sorter and remove the images"""
+        self.app.scheduler.shutdown()
+        self.app.decisions.close()
+        self.app.processor.close()
+        self.root.destroy()
+        shutil.rmtree(self.test_dir)
+
+    def test_session_stays_within_budget(self):
+        """Test deciding on every image leaks no PhotoImages and keeps memory bounded"""
+        sampler = MemorySampler()
+        decisions = len(self.names) - 1  # the last one would end the session
+        for i in range(decisions):
+            if i == WARMUP_IMAGES:
+                sampler.warmed_up()
+            if i % 2:
+                self.app.keep_image()
+            else:
+                self.app.delete_image()
+            self.root.update()
+            self.assertLessEqual(len(self.root.image_names()), MAX_TK_IMAGES)
+            sampler.sample()
+        self.assertEqual(self.app.metrics.decisions, decisions)
+        self.assertWithinBudget(sampler.stop(), decisions - WARMUP_IMAGES)
+
+
+
+@pytest.mark.slow
+class TestProcessorLongSession(TestProcessorMemory):
+    """TestProcessorMemory over thousands of camera-sized images"""
+    images = LONG_SESSION_IMAGES
+    megapixels = LONG_SESSION_MEGAPIXELS
+
+
+@pytest.mark.slow
+class TestImageSorterLongSession(TestImageSorterMemory):
+    """TestImageSorterMemory over thousands of camera-sized images"""
+    images = LONG_SESSION_IMAGES
+    megapixels = LONG_SESSION_MEGAPIXELS
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from declutrr.metrics import Histogram, SessionMetrics
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles_within_a_bucket(self):
+        """Test percentiles land within one bucket width of the exact value"""
+        histogram = Histogram()
+        for ms in range(1, 101):
+            histogram.add(ms / 1000)
+        self.assertEqual(histogram.count, 100)
+        for p, exact in ((50, 0.050), (95, 0.095), (99, 0.099)):
+            self.assertGreaterEqual(histogram.percentile(p), exact)
+            self.assertLess(histogram.percentile(p), exact * 1.1)
+
+    def test_extremes_are_clamped(self):
+        """Test zero and very long latencies still count"""
+        histogram = Histogram()
+        histogram.add(0)
+        histogram.add(10 ** 6)
+        self.assertEqual(histogram.percentile(0.1), Histogram.upper_bound(0))
+        self.assertEqual(sum(histogram.counts), 2)
+        self.assertIsNone(Histogram().percentile(50))
+
+
+class TestSessionMetrics(unittest.TestCase):
+    def setUp(self):
+        """Create a folder for exports"""
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def test_keypress_to_paint(self):
+        """Test a keypress is timed through to the paint, with queueing delay as the key stage"""
+        metrics = SessionMetrics()
+        with patch('declutrr.metrics.time.perf_counter', side_effect=[10.0, 12.0, 12.5, 12.75]):
+            metrics.key_pressed(event_time=1000)  # the quickest event sets the clock offset
+            metrics.key_pressed(event_time=2500)  # 1.5 s later, but handled 2 s later
+            metrics.paint_started()
+            metrics.paint_finished()
+        key = metrics.histograms['key']
+        self.assertEqual(key.count, 2)
+        self.assertAlmostEqual(key.percentile(100), 0.5, delta=0.05)
+        self.assertAlmostEqual(metrics.histograms['paint'].percentile(50), 0.25, delta=0.025)
+        self.assertAlmostEqual(metrics.histograms['total'].percentile(50), 0.75, delta=0.075)
+
+    def test_export(self):
+        """Test the JSON export has throughput and every stage"""
+        metrics = SessionMetrics()
+        with metrics.stage('decode'):
+            pass
+        metrics.decision()
+        metrics.bytes_read = 25 * 10 ** 6
+        path = os.path.join(self.test_dir, 'stats.json')
+        metrics.export(path)
+        with open(path) as f:
+            summary = json.load(f)
+        self.assertEqual((summary['decisions'], summary['mb_read']), (1, 25.0))
+        self.assertEqual(summary['stages']['decode']['count'], 1)
+        self.assertEqual(set(summary['stages']), {'key', 'move', 'decode', 'resize', 'photo', 'paint', 'total'})
+        self.assertIn('1 decisions', metrics.overlay_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+from declutrr.analyzers import read_capture_time
+from declutrr.organizer import _rename_new, organize, plan_moves, undo_last_organize
+from declutrr.store import MetadataStore
+from tests.test_raw import build_tiff_raw, jpeg_bytes, lossless_jpeg
+
+
+def save_photo(path, taken=None, tag=36867):
+    exif = Image.Exif()
+    if taken:
+        exif.get_ifd(0x8769)[tag] = taken
+    Image.new('RGB', (16, 16), 'red').save(path, exif=exif)
+
+
+class TestOrganizer(unittest.TestCase):
+    def setUp(self):
+        """Create photos taken in two months, one sharing a timestamp, and one without a date"""
+        self.test_dir = tempfile.mkdtemp()
+        save_photo(self.path('DSC_0001.jpg'), '2024:01:15 10:00:00')
+        save_photo(self.path('DSC_0002.jpg'), '2024:01:15 10:00:00')
+        save_photo(self.path('PXL_0003.jpg'), '2024:02:01 08:30:00', tag=36868)
+        save_photo(self.path('scan.jpg'))
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def path(self, *parts):
+        return os.path.join(self.test_dir, *parts)
+
+    def test_read_capture_time(self):
+        """Test DateTimeOriginal and CreateDate are read from the header"""
+        self.assertEqual(read_capture_time(self.path('DSC_0001.jpg')), 1705312800.0)
+        self.assertEqual(read_capture_time(self.path('PXL_0003.jpg')), 1706776200.0)
+        self.assertIsNone(read_capture_time(self.path('scan.jpg')))
+
+    def test_plan_resolves_collisions_in_memory(self):
+        """Test same-second photos get numbered names, also against existing files"""
+        os.makedirs(self.path('202401'))
+        open(self.path('202401', 'IMG_20240115_100000.jpg'), 'w').close()
+        times = {'a.jpg': 1705312800.0, 'b.jpg': 1705312800.0, 'c.jpg': None}
+        self.assertEqual(plan_moves(self.test_dir, times), [
+            ('a.jpg', os.path.join('202401', 'IMG_20240115_100000_1.jpg')),
+            ('b.jpg', os.path.join('202401', 'IMG_20240115_100000_2.jpg')),
+        ])
+
+    def test_companion_names_are_reserved(self):
+        """Test a RAW+JPEG pair and a lone RAW from the same second don't claim the same RAW name"""
+        for name in os.listdir(self.test_dir):
+            os.remove(self.path(name))
+        save_photo(self.path('a.jpg'), '2024:05:01 12:30:00')
+        open(self.path('a.cr2'), 'w').close()
+        preview = jpeg_bytes((64, 48))
+        with open(self.path('b.cr2'), 'wb') as f:
+            f.write(build_tiff_raw(preview, jpeg_bytes((8, 8)), lossless_jpeg(16)))
+        stats = organize(self.test_dir, workers=2)
+        self.assertEqual((stats['moved'], stats['failed']), (2, 0))
+        self.assertEqual(sorted(os.listdir(self.path('202405'))),
+                         ['IMG_20240501_123000.cr2', 'IMG_20240501_123000.jpg', 'IMG_20240501_123000_1.cr2'])
+        with open(self.path('202405', 'IMG_20240501_123000_1.cr2'), 'rb') as f:
+            self.assertIn(preview, f.read())
+
+    def test_rename_never_replaces(self):
+        """Test a target that appeared after planning is kept, not overwritten"""
+        open(self.path('taken.jpg'), 'w').close()
+        with self.assertRaises(FileExistsError):
+            _rename_new(self.path('scan.jpg'), self.path('taken.jpg'))
+        self.assertTrue(os.path.exists(self.path('scan.jpg')))
+
+    def test_organize_and_rerun(self):
+        """Test one pass renames and buckets, and a rerun changes nothing"""
+        stats = organize(self.test_dir)
+        self.assertEqual(stats, {'moved': 3, 'unchanged': 0, 'undated': 1, 'failed': 0})
+        self.assertEqual(sorted(os.listdir(self.path('202401'))),
+                         ['IMG_20240115_100000.jpg', 'IMG_20240115_100000_1.jpg'])
+        self.assertEqual(os.listdir(self.path('202402')), ['IMG_20240201_083000.jpg'])
+        self.assertTrue(os.path.exists(self.path('scan.jpg')))
+
+        stats = organize(self.test_dir)
+        self.assertEqual(stats['moved'], 0)
+
+    def test_rename_only_keeps_store_results(self):
+        """Test renaming in place carries stored capture times over to the new names"""
+        organize(self.test_dir, bucket=False)
+        self.assertTrue(os.path.exists(self.path('IMG_20240201_083000.jpg')))
+        with MetadataStore.for_directory(self.test_dir) as store:
+            self.assertEqual(store.get_scores('IMG_20240201_083000.jpg'), {'captured': 1706776200.0})
+        self.assertEqual(organize(self.test_dir, bucket=False)['unchanged'], 3)
+
+    def test_store_results_survive_organize_and_undo(self):
+        """Test tags of files moved into bucket folders are kept, and back under the old name after undo"""
+        with MetadataStore.for_directory(self.test_dir) as store:
+            store.set_tags('PXL_0003.jpg', os.stat(self.path('PXL_0003.jpg')), [('dog', 0.9)])
+            store.commit()
+        organize(self.test_dir)
+        moved = os.path.join('202402', 'IMG_20240201_083000.jpg')
+        with MetadataStore.for_directory(self.test_dir) as store:
+            self.assertEqual(store.get_tags(moved), ['dog'])
+
+        undo_last_organize(self.test_dir)
+        with MetadataStore.for_directory(self.test_dir) as store:
+            self.assertEqual(store.get_tags('PXL_0003.jpg'), ['dog'])
+            self.assertEqual(store.get_tags(moved), [])
+            self.assertTrue(store.is_analyzed('PXL_0003.jpg', os.stat(self.path('PXL_0003.jpg')), 'tags'))
+
+    def test_dry_run_and_undo(self):
+        """Test dry run changes nothing and undo restores names and removes folders"""
+        self.assertEqual(organize(self.test_dir, dry_run=True)['moved'], 3)
+        self.assertFalse(os.path.exists(self.path('202401')))
+
+        organize(self.test_dir)
+        self.assertEqual(undo_last_organize(self.test_dir), {'restored': 3, 'missing': 0})
+        self.assertTrue(os.path.exists(self.path('DSC_0002.jpg')))
+        self.assertFalse(os.path.exists(self.path('202401')))
+
+
+if __name__ == '__main__':
+    unittest.main()
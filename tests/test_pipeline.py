@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageDraw
+
+from declutrr import pipeline
+from declutrr.pipeline import Pipeline, Analyzer, MoveAction
+from declutrr.analyzers import BlurAnalyzer, ScreenshotAnalyzer, laplacian_variance
+from declutrr.store import MetadataStore
+
+
+class RecordingAnalyzer(Analyzer):
+    """Counts frames and batches it receives"""
+    name = 'recording'
+    batch_size = 4
+
+    def __init__(self):
+        self.batches = []
+
+    def analyze_batch(self, frames):
+        self.batches.append(len(frames))
+        return [frame.image.size[0] for frame in frames]
+
+
+class FailingAnalyzer(Analyzer):
+    name = 'failing'
+
+    def analyze(self, frame):
+        raise RuntimeError("boom")
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        """Create a folder with sharp and flat images"""
+        self.test_dir = tempfile.mkdtemp()
+        for i in range(6):
+            img = Image.new('RGB', (200, 150), 'white')
+            draw = ImageDraw.Draw(img)
+            for x in range(0, 200, 4):
+                draw.line([(x, 0), (x, 150)], fill='black')
+            img.save(os.path.join(self.test_dir, f"sharp{i}.png"))
+        for i in range(4):
+            Image.new('RGB', (200, 150), 'gray').save(os.path.join(self.test_dir, f"flat{i}.jpg"))
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def test_laplacian_variance(self):
+        """Test flat images have zero variance and edges don't"""
+        import numpy as np
+        self.assertEqual(laplacian_variance(np.full((10, 10), 128, dtype=np.uint8)), 0.0)
+        checker = np.indices((10, 10)).sum(axis=0) % 2 * 255
+        self.assertGreater(laplacian_variance(checker.astype(np.uint8)), 1000)
+
+    def test_decodes_once_per_image(self):
+        """Test all analyzers share one decode per image"""
+        recording = RecordingAnalyzer()
+        with patch.object(pipeline, 'decode_for_inference', wraps=pipeline.decode_for_inference) as decode:
+            stats = Pipeline(self.test_dir, [BlurAnalyzer(), ScreenshotAnalyzer(), recording]).run()
+        self.assertEqual(decode.call_count, 10)
+        self.assertEqual(stats['processed'], 10)
+        self.assertEqual(stats['analyzed'], 10)
+        self.assertEqual(sum(recording.batches), 10)
+        self.assertLessEqual(max(recording.batches), 4)
+
+    def test_results_stored_and_reused(self):
+        """Test a rerun skips decoding and reuses stored results"""
+        Pipeline(self.test_dir, [BlurAnalyzer(), ScreenshotAnalyzer()]).run()
+        with MetadataStore.for_directory(self.test_dir) as store:
+            self.assertEqual(store.get_scores("flat0.jpg")['blur'], 0.0)
+            self.assertGreater(store.get_scores("sharp0.png")['blur'], 1000)
+            self.assertIn('screenshot', store.get_scores("sharp0.png"))
+
+        with patch.object(pipeline, 'decode_for_inference') as decode:
+            stats = Pipeline(self.test_dir, [BlurAnalyzer()]).run()
+        decode.assert_not_called()
+        self.assertEqual(stats['cached'], 10)
+
+    def test_commits_are_spaced_out(self):
+        """Test failed frames count towards the commit interval too"""
+        with patch.object(pipeline, 'PIPELINE_COMMIT_EVERY', 4), patch.object(MetadataStore, 'commit') as commit:
+            stats = Pipeline(self.test_dir, [FailingAnalyzer()]).run()
+        self.assertEqual(stats['failed'], 10)
+        self.assertEqual(commit.call_count, 3)  # After frames 4 and 8, and at the end
+
+    def test_move_action(self):
+        """Test actions see the results and move matching files"""
+        action = MoveAction(self.test_dir, 'blurry', lambda results: results['blur'] < 90)
+        stats = Pipeline(self.test_dir, [BlurAnalyzer()], [action]).run()
+        self.assertEqual(stats['blurry'], 4)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.test_dir, 'blurry'))),
+                         ["flat0.jpg", "flat1.jpg", "flat2.jpg", "flat3.jpg"])
+
+    def test_backpressure(self):
+        """Test tiny queues still drain without deadlock"""
+        stats = Pipeline(self.test_dir, [BlurAnalyzer(), RecordingAnalyzer()],
+                         decode_workers=3, queue_size=1).run()
+        self.assertEqual(stats['processed'], 10)
+
+    def test_failures_are_retried(self):
+        """Test failed analyses and undecodable files aren't stored"""
+        with open(os.path.join(self.test_dir, "broken.jpg"), 'w') as f:
+            f.write("not an image")
+        stats = Pipeline(self.test_dir, [BlurAnalyzer(), FailingAnalyzer()]).run()
+        self.assertEqual(stats['failed'], 11)
+        stats = Pipeline(self.test_dir, [BlurAnalyzer(), FailingAnalyzer()]).run()
+        self.assertEqual(stats['failed'], 11)
+
+        # Blur results survived the failing analyzer
+        with patch.object(pipeline, 'decode_for_inference') as decode:
+            stats = Pipeline(self.test_dir, [BlurAnalyzer()]).run()
+        self.assertEqual(stats['cached'], 10)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(decode.call_count, 1)  # Only the broken file is retried
+
+
+if __name__ == '__main__':
+    unittest.main()
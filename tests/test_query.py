@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+
+from declutrr.store import MetadataStore
+from declutrr.query import parse_filter, compile_filter, select_files
+
+
+class TestQuery(unittest.TestCase):
+    def setUp(self):
+        """Create a folder with stored scores and tags"""
+        self.test_dir = tempfile.mkdtemp()
+        for name in ("sharp.jpg", "blurry.jpg", "screen.png", "doc.jpg"):
+            Image.new('RGB', (32, 32), 'white').save(os.path.join(self.test_dir, name))
+
+        with MetadataStore.for_directory(self.test_dir) as store:
+            def stat(name):
+                return os.stat(os.path.join(self.test_dir, name))
+            store.set_score("sharp.jpg", stat("sharp.jpg"), "blur", 450.0)
+            store.set_score("blurry.jpg", stat("blurry.jpg"), "blur", 12.5)
+            store.set_score("doc.jpg", stat("doc.jpg"), "blur", 80.0)
+            store.set_score("screen.png", stat("screen.png"), "screenshot", 6)
+            store.set_tags("doc.jpg", stat("doc.jpg"), [("document", 0.9)])
+            store.commit()
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def test_parse_filter(self):
+        """Test score, tag and preset terms"""
+        self.assertEqual(parse_filter("blur < 90"), [('score', 'blur', '<', 90.0)])
+        self.assertEqual(parse_filter("tag:document and blur>=10"),
+                         [('tag', 'document'), ('score', 'blur', '>=', 10.0)])
+        self.assertEqual(parse_filter("tagged dog, tagged beach"), [('tag', 'dog'), ('tag', 'beach')])
+        self.assertEqual(parse_filter("Screenshots"), [('score', 'screenshot', '>=', 4.0)])
+
+    def test_parse_filter_invalid(self):
+        """Test malformed filters raise ValueError"""
+        for text in ("", "blur <", "blur < 90; DROP TABLE files", "blur ~ 3"):
+            with self.assertRaises(ValueError):
+                parse_filter(text)
+
+    def test_compile_filter(self):
+        """Test every condition becomes one subquery"""
+        sql, params = compile_filter(parse_filter("blur < 90 and tag:document"))
+        self.assertEqual(sql.count("SELECT file_id"), 2)
+        self.assertEqual(params, ['blur', 90.0, 'document'])
+
+    def test_select_files(self):
+        """Test filters select the matching subset"""
+        self.assertEqual(select_files(self.test_dir, "blur < 90"), ["blurry.jpg", "doc.jpg"])
+        self.assertEqual(select_files(self.test_dir, "blurry"), ["blurry.jpg", "doc.jpg"])
+        self.assertEqual(select_files(self.test_dir, "screenshots"), ["screen.png"])
+        self.assertEqual(select_files(self.test_dir, "tag:document and blur < 90"), ["doc.jpg"])
+        self.assertEqual(select_files(self.test_dir, "tag:cat"), [])
+
+    def test_select_files_skips_moved_and_changed(self):
+        """Test stale results are ignored"""
+        os.remove(os.path.join(self.test_dir, "blurry.jpg"))
+        path = os.path.join(self.test_dir, "doc.jpg")
+        Image.new('RGB', (64, 64), 'black').save(path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(select_files(self.test_dir, "blur < 90"), [])
+
+    def test_select_files_without_store(self):
+        """Test folders that were never analyzed match nothing"""
+        empty_dir = tempfile.mkdtemp()
+        try:
+            self.assertEqual(select_files(empty_dir, "blur < 90"), [])
+            self.assertFalse(os.listdir(empty_dir))
+        finally:
+            shutil.rmtree(empty_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import io
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+from declutrr.constants import *
+from declutrr.image_processor import ImageProcessor
+from declutrr.raw import CANON_UUID, is_raw, open_image, raw_capture_date, read_preview
+
+
+def jpeg_bytes(size: tuple[int, int], quality: int = 95) -> bytes:
+    """A noisy JPEG, so it doesn't compress below RAW_PREVIEW_MIN_BYTES."""
+    pixels = np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, 'JPEG', quality=quality)
+    return output.getvalue()
+
+
+def lossless_jpeg(size: int) -> bytes:
+    """What sensor data stored as lossless JPEG (SOF3) starts with, padded to size."""
+    return (b'\xff\xd8\xff\xc3\x00\x0b\x10\x00\x10\x00\x10\x01\x01\x11\x00').ljust(size, b'\0')
+
+
+def entry(tag: int, kind: int, count: int, value: int) -> bytes:
+    packed = struct.pack('<HH', value, 0) if kind == 3 else struct.pack('<I', value)
+    return struct.pack('<HHI', tag, kind, count) + packed
+
+
+def ifd(entries: list[bytes]) -> bytes:
+    return struct.pack('<H', len(entries)) + b''.join(entries) + struct.pack('<I', 0)
+
+
+def build_tiff_raw(preview: bytes, thumbnail: bytes, sensor: bytes, orientation: int = 6) -> bytes:
+    """
+    A little-endian TIFF laid out like a CR2 or DNG: a thumbnail from IFD0,
+    the preview and lossless sensor data in SubIFDs, dates in IFD0 and EXIF.
+    """
+    date, original = b'2024:05:02 08:00:00\0', b'2024:05:01 12:30:00\0'
+    ifd0_at, exif_at, sub1_at, sub2_at = 8, 98, 116, 158
+    date_at, original_at, subs_at, thumb_at = 200, 220, 240, 248
+    preview_at = thumb_at + len(thumbnail)
+    sensor_at = preview_at + len(preview)
+    parts = [
+        b'II*\0' + struct.pack('<I', ifd0_at),
+        ifd([entry(274, 3, 1, orientation), entry(306, 2, len(date), date_at), entry(330, 4, 2, subs_at),
+             entry(513, 4, 1, thumb_at), entry(514, 4, 1, len(thumbnail)), entry(34665, 4, 1, exif_at),
+             entry(271, 2, 4, 0)]),
+        ifd([entry(36867, 2, len(original), original_at)]),
+        ifd([entry(259, 3, 1, 6), entry(273, 4, 1, preview_at), entry(279, 4, 1, len(preview))]),
+        ifd([entry(259, 3, 1, 7), entry(273, 4, 1, sensor_at), entry(279, 4, 1, len(sensor))]),
+        date, original, struct.pack('<II', sub1_at, sub2_at), thumbnail, preview, sensor,
+    ]
+    data = b''.join(parts)
+    assert data.index(thumbnail) == thumb_at
+    return data
+
+
+def box(kind: bytes, *children: bytes) -> bytes:
+    payload = b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def build_cr3(preview: bytes, orientation: int = 8) -> bytes:
+    """Canon's ISO base media layout: metadata in a uuid box, the preview as track 1's first sample."""
+    original = b'2023:12:24 18:00:00\0'
+    cmt1 = b'II*\0' + struct.pack('<I', 8) + ifd([entry(274, 3, 1, orientation)])
+    cmt2 = b'II*\0' + struct.pack('<I', 8) + ifd([entry(36867, 2, len(original), 26)]) + original
+
+    def moov(offset: int) -> bytes:
+        stbl = box(b'stbl', box(b'stsz', struct.pack('>IIII', 0, 0, 1, len(preview))),
+                   box(b'co64', struct.pack('>IIQ', 0, 1, offset)))
+        thumbnail_track = box(b'trak', box(b'mdia', box(b'minf', box(b'stbl'))))
+        return box(b'moov', box(b'uuid', CANON_UUID, box(b'CMT1', cmt1), box(b'CMT2', cmt2)),
+                   box(b'trak', box(b'mdia', box(b'minf', stbl))), thumbnail_track)
+
+    ftyp = box(b'ftyp', b'crx \0\0\0\1')
+    offset = len(ftyp) + len(moov(0)) + 8
+    return ftyp + moov(offset) + box(b'mdat', preview)
+
+
+class TestRaw(unittest.TestCase):
+    def setUp(self):
+        """Create a CR2-like and a CR3-like file"""
+        self.test_dir = tempfile.mkdtemp()
+        self.preview = jpeg_bytes((400, 300))
+        self.cr2 = os.path.join(self.test_dir, 'IMG_0001.CR2')
+        with open(self.cr2, 'wb') as f:
+            f.write(build_tiff_raw(self.preview, jpeg_bytes((16, 12)), lossless_jpeg(len(self.preview) * 2)))
+        self.cr3 = os.path.join(self.test_dir, 'IMG_0002.CR3')
+        with open(self.cr3, 'wb') as f:
+            f.write(build_cr3(self.preview))
+
+    def tearDown(self):
+        """Remove the files"""
+        shutil.rmtree(self.test_dir)
+
+    def test_is_raw(self):
+        """RAW extensions are recognized in any case, JPEGs are not RAW"""
+        self.assertTrue(is_raw('a.CR2'))
+        self.assertTrue(is_raw('a.nef'))
+        self.assertFalse(is_raw('a.jpg'))
+        self.assertIn('.dng', VALID_IMAGE_EXTENSIONS)
+
+    def test_read_preview_from_tiff(self):
+        """The largest lossy JPEG is picked, not the thumbnail or the larger lossless sensor data"""
+        data, orientation = read_preview(self.cr2)
+        self.assertEqual(data, self.preview)
+        self.assertEqual(orientation, 6)
+
+    def test_read_preview_from_cr3(self):
+        """CR3 previews come from the first track, orientation from CMT1"""
+        data, orientation = read_preview(self.cr3)
+        self.assertEqual(data, self.preview)
+        self.assertEqual(orientation, 8)
+
+    def test_capture_date(self):
+        """DateTimeOriginal from the EXIF IFD wins over IFD0's DateTime"""
+        self.assertEqual(raw_capture_date(self.cr2), datetime(2024, 5, 1, 12, 30))
+        self.assertEqual(raw_capture_date(self.cr3), datetime(2023, 12, 24, 18, 0))
+        self.assertEqual(ImageProcessor.get_creation_time(self.cr2), datetime(2024, 5, 1, 12, 30).timestamp())
+
+    def test_load_image_reads_only_the_preview(self):
+        """RAW files load as their rotated preview, reading no more than the preview"""
+        before = ImageProcessor.bytes_read
+        image = ImageProcessor.load_image(self.cr2)
+        self.assertEqual(image.size, (300, 400))
+        self.assertEqual(ImageProcessor.bytes_read - before, len(self.preview))
+        with open_image(self.cr3) as image:
+            self.assertEqual(image.getexif()[274], 8)
+
+    def test_file_without_preview(self):
+        """Unparseable RAW files are reported as unreadable, not raised"""
+        broken = os.path.join(self.test_dir, 'broken.nef')
+        with open(broken, 'wb') as f:
+            f.write(b'MM\0*\0\0\xff\xff' + bytes(64))
+        self.assertIsNone(read_preview(broken))
+        self.assertIsNone(ImageProcessor.load_image(broken))
+        self.assertIsNone(raw_capture_date(broken))
+
+
+if __name__ == '__main__':
+    unittest.main()
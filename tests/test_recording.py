@@ -0,0 +1,57 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from declutrr.recording import SessionRecorder, load_recording, synthetic_recording
+
+
+class TestRecording(unittest.TestCase):
+    def setUp(self):
+        """Create a folder for recordings"""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, 'session.json')
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def test_record_and_load(self):
+        """Test keypresses are saved with increasing times and load back in order"""
+        recorder = SessionRecorder(self.path)
+        recorder.start()
+        recorder.record('keep', 'Right')
+        recorder.record('undo', 'z')
+        self.assertTrue(recorder.save())
+        events = load_recording(self.path)
+        self.assertEqual([(event['action'], event['key']) for event in events], [('keep', 'Right'), ('undo', 'z')])
+        self.assertLessEqual(events[0]['t'], events[1]['t'])
+
+    def test_load_rejects_other_files(self):
+        """Test files that aren't recordings, or have unknown actions, raise ValueError"""
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': []}, f)
+        with self.assertRaises(ValueError):
+            load_recording(self.path)
+        with open(self.path, 'w') as f:
+            json.dump({'version': 1, 'events': [{'t': 0, 'action': 'rotate', 'key': 'r'}]}, f)
+        with self.assertRaises(ValueError):
+            load_recording(self.path)
+
+    def test_save_failure(self):
+        """Test an unwritable path gives False"""
+        recorder = SessionRecorder(os.path.join(self.test_dir, 'missing', 'session.json'))
+        self.assertFalse(recorder.save())
+
+    def test_synthetic_recording(self):
+        """Test synthetic sessions are repeatable, in order and mostly decisions"""
+        events = synthetic_recording(200, seed=3)
+        self.assertEqual(events, synthetic_recording(200, seed=3))
+        self.assertEqual([event['t'] for event in events], sorted(event['t'] for event in events))
+        decisions = sum(event['action'] in ('keep', 'delete') for event in events)
+        self.assertGreater(decisions, 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import time
+import threading
+import unittest
+from concurrent.futures import wait
+
+from declutrr.constants import *
+from declutrr.scheduler import Scheduler, checkpoint
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        """Two workers: one for interactive work, one for the rest"""
+        self.scheduler = Scheduler(workers=2)
+        self.gate = threading.Event()
+        self.order = []
+
+    def tearDown(self):
+        """Stop the workers"""
+        self.gate.set()
+        self.scheduler.shutdown(wait=True)
+
+    def block(self, priority: int = PRIORITY_BACKGROUND):
+        """Occupy the non-interactive worker until the gate opens."""
+        started = threading.Event()
+
+        def blocker():
+            started.set()
+            self.gate.wait()
+        task = self.scheduler.submit(blocker, priority=priority)
+        started.wait()
+        return task
+
+    def test_priority_order(self):
+        """Test queued work runs most urgent first, in submission order within a class"""
+        blocker = self.block()
+        tasks = [self.scheduler.submit(self.order.append, name, priority=priority) for name, priority in
+                 (('scan', PRIORITY_BACKGROUND), ('ahead 1', PRIORITY_LOOKAHEAD), ('move', PRIORITY_MOVE),
+                  ('ahead 2', PRIORITY_LOOKAHEAD))]
+        self.gate.set()
+        # Not result(), which would promote each task as it is waited for
+        wait([blocker] + tasks)
+        self.assertEqual(self.order, ['move', 'ahead 1', 'ahead 2', 'scan'])
+
+    def test_interactive_work_has_a_free_worker(self):
+        """Test an interactive task runs while background work occupies the other workers"""
+        self.block()
+        task = self.scheduler.submit(lambda: 'shown', priority=PRIORITY_INTERACTIVE)
+        self.assertEqual(task.result(timeout=5), 'shown')
+
+    def test_stale_tasks_are_replaced(self):
+        """Test a pending task is cancelled when one with the same key is submitted"""
+        self.block()
+        first = self.scheduler.submit(self.order.append, 'a.jpg', priority=PRIORITY_LOOKAHEAD, key='ahead')
+        second = self.scheduler.submit(self.order.append, 'b.jpg', priority=PRIORITY_LOOKAHEAD, key='ahead')
+        self.assertTrue(first.cancelled())
+        self.gate.set()
+        second.result()
+        self.assertEqual(self.order, ['b.jpg'])
+        self.assertFalse(self.scheduler.cancel('ahead'))
+
+    def test_interactive_block_holds_back_and_promotes(self):
+        """Test work waits while the UI is busy, unless the UI waits for it"""
+        with self.scheduler.interactive():
+            held = self.scheduler.submit(self.order.append, 'held', priority=PRIORITY_LOOKAHEAD)
+            waited = self.scheduler.submit(self.order.append, 'waited', priority=PRIORITY_LOOKAHEAD)
+            self.assertFalse(held.done())
+            waited.result(timeout=5)
+            self.assertEqual(self.order, ['waited'])
+        held.result(timeout=5)
+        self.assertEqual(self.order, ['waited', 'held'])
+
+    def test_checkpoint_pauses_long_tasks(self):
+        """Test a long task stops at checkpoints during interactive work and resumes once waited for"""
+        reached, go = threading.Event(), threading.Event()
+        chunks = []
+
+        def copy():
+            for i in range(5):
+                chunks.append(i)
+                if i == 1:
+                    reached.set()
+                    go.wait()
+                checkpoint()
+            return len(chunks)
+
+        task = self.scheduler.submit(copy, priority=PRIORITY_LOOKAHEAD)
+        reached.wait()
+        with self.scheduler.interactive():
+            go.set()
+            time.sleep(0.1)
+            self.assertEqual(chunks, [0, 1])
+            self.assertEqual(task.result(timeout=5), 5)
+
+    def test_callbacks_run_in_poll(self):
+        """Test callbacks run on the thread calling poll(), not on workers"""
+        threads = []
+        task = self.scheduler.submit(lambda: 1, callback=lambda task: threads.append(threading.current_thread()))
+        task.result()
+        # The callback is queued just after the result is set
+        while not self.scheduler.poll():
+            time.sleep(0.01)
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_executor_shutdown_is_per_executor(self):
+        """Test shutting down one executor cancels only its own pending tasks"""
+        self.block()
+        staging = self.scheduler.executor(PRIORITY_LOOKAHEAD)
+        watch = self.scheduler.executor(PRIORITY_BACKGROUND)
+        copy = staging.submit(self.order.append, 'copy')
+        scan = watch.submit(self.order.append, 'scan')
+        staging.shutdown(wait=False, cancel_futures=True)
+        self.assertTrue(copy.cancelled())
+        self.gate.set()
+        scan.result(timeout=5)
+        self.assertEqual(self.order, ['scan'])
+
+
+if __name__ == '__main__':
+    unittest.main()
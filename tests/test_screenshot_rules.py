@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageFile, PngImagePlugin
+
+from declutrr import screenshot_rules
+from declutrr.screenshot_rules import read_header, score_header, is_screenshot, find_screenshots
+
+
+class TestScreenshotRules(unittest.TestCase):
+    def setUp(self):
+        """Create a temporary directory for test images"""
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        shutil.rmtree(self.test_dir)
+
+    def _save_png(self, name, size, srgb=True):
+        path = os.path.join(self.test_dir, name)
+        info = PngImagePlugin.PngInfo()
+        if srgb:
+            info.add(b"sRGB", b"\x00")
+        Image.new('RGB', size, 'white').save(path, pnginfo=info)
+        return path
+
+    def _save_jpeg(self, name, size, **tags):
+        path = os.path.join(self.test_dir, name)
+        exif = Image.Exif()
+        for tag, value in tags.items():
+            exif[getattr(screenshot_rules, f"TAG_{tag.upper()}")] = value
+        Image.new('RGB', size, 'white').save(path, exif=exif)
+        return path
+
+    def test_read_header(self):
+        """Test header fields are collected"""
+        path = self._save_jpeg("photo.jpg", (400, 300), make="Canon", model="EOS R5")
+        header = read_header(path)
+        self.assertEqual((header['width'], header['height']), (400, 300))
+        self.assertEqual(header['format'], 'JPEG')
+        self.assertEqual(header['make'], 'Canon')
+        self.assertEqual(header['model'], 'EOS R5')
+        self.assertTrue(header['has_exif'])
+
+        png = self._save_png("graphic.png", (10, 10))
+        header = read_header(png)
+        self.assertTrue(header['srgb'])
+        self.assertFalse(header['has_exif'])
+
+    def test_read_header_invalid(self):
+        """Test unreadable files return None"""
+        path = os.path.join(self.test_dir, "invalid.jpg")
+        with open(path, 'w') as f:
+            f.write("not an image")
+        self.assertIsNone(read_header(path))
+        self.assertFalse(is_screenshot(path))
+
+    def test_no_pixel_decode(self):
+        """Test classification never loads pixel data"""
+        png = self._save_png("screen.png", (1125, 2436))
+        jpg = self._save_jpeg("photo.jpg", (400, 300), make="Canon")
+        with patch.object(ImageFile.ImageFile, 'load') as mock_load:
+            is_screenshot(png)
+            is_screenshot(jpg)
+            mock_load.assert_not_called()
+
+    def test_phone_screenshot(self):
+        """Test PNG at a phone resolution is a screenshot in either orientation"""
+        self.assertTrue(is_screenshot(self._save_png("portrait.png", (1125, 2436))))
+        self.assertTrue(is_screenshot(self._save_png("landscape.png", (2436, 1125))))
+
+    def test_camera_photo(self):
+        """Test camera photos are not screenshots"""
+        path = self._save_jpeg("photo.jpg", (4032, 3024), make="Apple", model="iPhone 15")
+        self.assertFalse(is_screenshot(path))
+
+    def test_graphic_is_not_screenshot(self):
+        """Test an arbitrary sRGB PNG is not enough on its own"""
+        path = self._save_png("graphic.png", (700, 700))
+        score, matched = score_header(read_header(path))
+        self.assertEqual(matched, ['no_camera', 'png_srgb_no_exif'])
+        self.assertFalse(is_screenshot(path))
+
+    def test_screenshot_software(self):
+        """Test the EXIF Software tag identifies screenshot tools"""
+        path = self._save_jpeg("capture.jpg", (700, 500), software="Flameshot 12.1")
+        self.assertTrue(is_screenshot(path))
+
+    def test_custom_rule(self):
+        """Test the rules table can be extended"""
+        path = self._save_png("graphic.png", (700, 700))
+        rule = ('square', 5, lambda header: header['width'] == header['height'])
+        with patch.object(screenshot_rules, 'SCREENSHOT_RULES', screenshot_rules.SCREENSHOT_RULES + [rule]):
+            self.assertTrue(is_screenshot(path))
+
+    def test_find_screenshots(self):
+        """Test directory scan returns only screenshots"""
+        self._save_png("screen.png", (1170, 2532))
+        self._save_jpeg("photo.jpg", (4032, 3024), make="Canon")
+        with open(os.path.join(self.test_dir, "notes.txt"), 'w') as f:
+            f.write("text")
+        self.assertEqual(find_screenshots(self.test_dir), ["screen.png"])
+
+
+if __name__ == '__main__':
+    unittest.main()
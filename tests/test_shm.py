@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import shutil
+import signal
+import tempfile
+import subprocess
+import unittest
+import numpy as np
+from multiprocessing import shared_memory
+from PIL import Image, ImageDraw
+
+from declutrr.shm import FrameRing, ProcessAnalyzer
+from declutrr.pipeline import Pipeline
+from declutrr.analyzers import BlurAnalyzer, laplacian_variance
+from declutrr.store import MetadataStore
+
+
+def segment_exists(name):
+    try:
+        shared_memory.SharedMemory(name=name).close()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class TestFrameRing(unittest.TestCase):
+    def test_write_and_view(self):
+        """Test frames round-trip through a slot and views share memory"""
+        with FrameRing(slots=2, slot_bytes=64 * 64 * 3) as ring:
+            frame = np.random.randint(0, 255, (48, 64, 3), dtype=np.uint8)
+            slot = ring.acquire()
+            ref = ring.write(slot, frame)
+
+            worker = FrameRing.attach(ring.name, ring.slots, ring.slot_bytes)
+            view = worker.view(ref)
+            np.testing.assert_array_equal(view, frame)
+            view[0, 0, 0] = 7
+            self.assertEqual(ring.view(ref)[0, 0, 0], 7)
+            del view
+            worker.close()
+
+    def test_slots_bound_frames_in_flight(self):
+        """Test acquire blocks once every slot is taken"""
+        with FrameRing(slots=2, slot_bytes=16) as ring:
+            first, second = ring.acquire(), ring.acquire()
+            self.assertNotEqual(first, second)
+            with self.assertRaises(TimeoutError):
+                ring.acquire(timeout=0.05)
+            ring.release(first)
+            self.assertEqual(ring.acquire(timeout=0.05), first)
+
+    def test_oversized_frame(self):
+        """Test frames larger than a slot are rejected"""
+        with FrameRing(slots=1, slot_bytes=16) as ring:
+            with self.assertRaises(ValueError):
+                ring.write(ring.acquire(), np.zeros((8, 8), dtype=np.uint8))
+
+    def test_close_unlinks(self):
+        """Test the owner removes the segment on close"""
+        ring = FrameRing(slots=1, slot_bytes=16)
+        name = ring.name
+        ring.close()
+        ring.close()
+        self.assertFalse(segment_exists(name))
+
+    def test_cleanup_after_crash(self):
+        """Test a killed owner doesn't leak its segment"""
+        code = ("import sys, time; from declutrr.shm import FrameRing; "
+                "ring = FrameRing(slots=1, slot_bytes=1024); print(ring.name, flush=True); time.sleep(60)")
+        process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, text=True, cwd=os.getcwd())
+        name = process.stdout.readline().strip()
+        self.assertTrue(segment_exists(name))
+        process.send_signal(signal.SIGKILL)
+        process.wait()
+
+        deadline = time.monotonic() + 10
+        while segment_exists(name) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.assertFalse(segment_exists(name))
+
+
+class TestProcessAnalyzer(unittest.TestCase):
+    def setUp(self):
+        """Create a folder with sharp and flat images"""
+        self.test_dir = tempfile.mkdtemp()
+        for i in range(5):
+            img = Image.new('RGB', (300, 200), 'white')
+            ImageDraw.Draw(img).rectangle([50, 50, 100 + i * 20, 150], fill='black')
+            img.save(os.path.join(self.test_dir, f"img{i}.png"))
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def test_matches_in_process_analyzer(self):
+        """Test worker processes compute the same scores from shared memory"""
+        analyzer = ProcessAnalyzer('blur_mp', laplacian_variance, workers=2)
+        stats = Pipeline(self.test_dir, [BlurAnalyzer(), analyzer]).run()
+        self.assertEqual(stats['analyzed'], 5)
+        self.assertIsNone(analyzer.ring)
+
+        with MetadataStore.for_directory(self.test_dir) as store:
+            for i in range(5):
+                scores = store.get_scores(f"img{i}.png")
+                self.assertAlmostEqual(scores['blur'], scores['blur_mp'], places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import threading
+from unittest import mock
+
+from declutrr.constants import *
+from declutrr.scheduler import Scheduler, checkpoint
+
+from declutrr.image_processor import ImageProcessor
+from declutrr.staging import StagingCache, is_network_mount
+
+
+class TestStagingCache(unittest.TestCase):
+    def setUp(self):
+        """Create a source folder with four 100 byte files and an empty cache root"""
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_root = tempfile.mkdtemp()
+        for i in range(4):
+            with open(os.path.join(self.test_dir, f'{i}.jpg'), 'wb') as f:
+                f.write(bytes([i]) * 100)
+
+    def tearDown(self):
+        """Remove both folders"""
+        shutil.rmtree(self.test_dir)
+        shutil.rmtree(self.cache_root)
+
+    def wait(self, cache):
+        """Wait for the copies queued so far, with one worker they run in order"""
+        cache.pool.submit(lambda: None).result()
+
+    def staged(self, cache):
+        return sorted(name for name in os.listdir(cache.cache_dir) if not name.endswith('.part'))
+
+    def test_stage_and_serve_copies(self):
+        """Test staged files are served from the cache and unknown ones from the source"""
+        cache = StagingCache(self.test_dir, root=self.cache_root, workers=1)
+        cache.stage(['0.jpg', '1.jpg'])
+        self.wait(cache)
+        path = cache.path('0.jpg')
+        self.assertEqual(os.path.dirname(path), cache.cache_dir)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), bytes([0]) * 100)
+        self.assertEqual(cache.path('3.jpg'), os.path.join(self.test_dir, '3.jpg'))
+        cache.close()
+        self.assertFalse(os.path.exists(cache.cache_dir))
+
+    def test_disk_usage_is_bounded(self):
+        """Test older copies make room for wanted ones, and decided files are dropped"""
+        cache = StagingCache(self.test_dir, root=self.cache_root, max_bytes=250, workers=1)
+        cache.stage(['0.jpg', '1.jpg'])
+        self.wait(cache)
+        cache.path('0.jpg')
+        # 1.jpg, the copy used longest ago, makes room; 0.jpg may still be on screen
+        cache.stage(['2.jpg'])
+        self.wait(cache)
+        self.assertEqual(self.staged(cache), ['0.jpg', '2.jpg'])
+
+        cache.evict('0.jpg')
+        self.assertEqual(self.staged(cache), ['2.jpg'])
+        self.assertEqual(cache.used, 100)
+        cache.close()
+
+    def test_processor_reads_staged_copies(self):
+        """Test the processor loads from the cache and evicts after decisions"""
+        cache = StagingCache(self.test_dir, root=self.cache_root, workers=1)
+        processor = ImageProcessor(self.test_dir, create_dirs=False, staging=cache)
+        processor.prefetch(['0.jpg'])
+        self.wait(cache)
+        self.assertTrue(processor.local_path('0.jpg').startswith(cache.cache_dir))
+        processor.evict('0.jpg')
+        self.assertEqual(processor.local_path('0.jpg'), os.path.join(self.test_dir, '0.jpg'))
+        processor.close()
+        self.assertFalse(os.path.exists(cache.cache_dir))
+
+    def test_interactive_wait_promotes_running_copy(self):
+        """Test a decode waiting on a staging copy doesn't stall once the UI waits for the decode"""
+        started, release = threading.Event(), threading.Event()
+
+        def slow_copy(source, target):
+            shutil.copyfile(source, target)
+            started.set()
+            while True:
+                time.sleep(0.001)
+                # Paused here while the UI is busy, unless promoted
+                checkpoint()
+                if release.is_set():
+                    return
+
+        scheduler = Scheduler(workers=3)
+        cache = StagingCache(self.test_dir, root=self.cache_root, executor=scheduler.executor(PRIORITY_LOOKAHEAD))
+        try:
+            with mock.patch('declutrr.staging.copy_in_chunks', slow_copy):
+                cache.stage(['0.jpg'])
+                started.wait()
+                # Decoding ahead, waiting on the copy at the same priority
+                decode = scheduler.submit(cache.path, '0.jpg', priority=PRIORITY_LOOKAHEAD)
+                while not decode.running():
+                    time.sleep(0.001)
+                time.sleep(0.05)
+                with scheduler.interactive():
+                    release.set()
+                    self.assertEqual(decode.result(timeout=5), os.path.join(cache.cache_dir, '0.jpg'))
+        finally:
+            scheduler.shutdown(wait=True)
+            cache.close()
+
+    def test_local_folder_is_not_network_mount(self):
+        """Test a temp folder doesn't turn staging on"""
+        self.assertFalse(is_network_mount(self.test_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
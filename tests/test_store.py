@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from types import SimpleNamespace
+
+from declutrr.store import MetadataStore, ANALYZER_TAGS
+
+
+class TestMetadataStore(unittest.TestCase):
+    def setUp(self):
+        """Create a store with a few tagged files"""
+        self.test_dir = tempfile.mkdtemp()
+        self.store = MetadataStore.for_directory(self.test_dir)
+        self.stat = os.stat(self.test_dir)
+        self.store.set_tags("a.jpg", self.stat, [("dog", 0.9), ("beach", 0.8)])
+        self.store.set_tags("b.jpg", self.stat, [("dog", 0.7), ("park", 0.6)])
+        self.store.set_tags("c.jpg", self.stat, [("beach", 0.5), ("sunset", 0.95)])
+        self.store.set_tags("d.jpg", self.stat, [])
+        self.store.commit()
+
+    def tearDown(self):
+        """Close the store and remove the folder"""
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_get_tags(self):
+        """Test tags are returned most confident first"""
+        self.assertEqual(self.store.get_tags("c.jpg"), ["sunset", "beach"])
+        self.assertEqual(self.store.get_tags("d.jpg"), [])
+        self.assertTrue(self.store.is_analyzed("d.jpg", self.stat, ANALYZER_TAGS))
+
+    def test_find_all_tags(self):
+        """Test AND queries"""
+        self.assertEqual(self.store.find_files(["dog", "beach"]), ["a.jpg"])
+        self.assertEqual(self.store.find_files(["dog"]), ["a.jpg", "b.jpg"])
+        self.assertEqual(self.store.find_files(["cat"]), [])
+        self.assertEqual(self.store.find_files(), [])
+
+    def test_find_any_tags(self):
+        """Test OR queries, alone and combined with AND"""
+        self.assertEqual(self.store.find_files(any_tags=["park", "sunset"]), ["b.jpg", "c.jpg"])
+        self.assertEqual(self.store.find_files(["beach"], ["dog", "park"]), ["a.jpg"])
+
+    def test_search_scales(self):
+        """Test an AND query over a 200k photo library only walks the tag index, in milliseconds"""
+        self.store.conn.execute(
+            """INSERT INTO files (id, name, size, mtime_ns)
+               WITH RECURSIVE n(i) AS (SELECT 100 UNION ALL SELECT i + 1 FROM n WHERE i < 200100)
+               SELECT i, printf('IMG_%06d.jpg', i), 0, 0 FROM n""")
+        self.store.conn.execute(
+            """INSERT INTO file_tags (file_id, tag, confidence)
+               SELECT id, 'tag' || (id % 50), 0.5 FROM files WHERE id >= 100 UNION ALL
+               SELECT id, 'dog', 0.5 FROM files WHERE id >= 100 AND id % 20 = 0 UNION ALL
+               SELECT id, 'beach', 0.5 FROM files WHERE id >= 100 AND id % 30 = 0""")
+        self.store.commit()
+
+        start = time.perf_counter()
+        found = self.store.find_files(["dog", "beach"])
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(found), 3335)  # a.jpg and every 60th file
+        self.assertLess(elapsed, 0.25)
+        self.assertEqual(self.store.all_tags()[0], ("dog", 10003))
+
+        plan = self.store.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT name FROM files WHERE id IN "
+            "(SELECT file_id FROM file_tags WHERE tag = ? INTERSECT SELECT file_id FROM file_tags WHERE tag = ?)",
+            ("dog", "beach")).fetchall()
+        self.assertFalse([row for row in plan if row[-1].startswith("SCAN")])
+
+    def test_changed_file_drops_tags(self):
+        """Test a changed file loses its stale tags"""
+        changed = SimpleNamespace(st_size=self.stat.st_size + 1, st_mtime_ns=self.stat.st_mtime_ns)
+        self.store.set_tags("a.jpg", changed, [("cat", 0.9)])
+        self.assertEqual(self.store.find_files(["dog"]), ["b.jpg"])
+        self.assertEqual(self.store.all_tags()[0], ("beach", 1))
+
+    def test_journal_mode(self):
+        """Test WAL is used on local disks and a rollback journal on network shares"""
+        journal_mode = "PRAGMA journal_mode"
+        self.assertEqual(self.store.conn.execute(journal_mode).fetchone()[0], "wal")
+        self.store.close()
+        with patch('declutrr.store.is_network_mount', return_value=True):
+            self.store = MetadataStore.for_directory(self.test_dir)
+        self.assertEqual(self.store.conn.execute(journal_mode).fetchone()[0], "delete")
+        self.store.set_tags("e.jpg", self.stat, [("cat", 0.9)])
+        self.store.commit()
+        self.assertFalse([name for name in os.listdir(self.test_dir) if name.endswith(('-wal', '-shm'))])
+
+    def test_persistence(self):
+        """Test committed tags survive reopening the store"""
+        self.store.close()
+        self.store = MetadataStore.for_directory(self.test_dir)
+        self.assertEqual(self.store.find_files(["park"]), ["b.jpg"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from declutrr.tag_mirror import (XattrTagMirror, XmpSidecarTagMirror, get_tag_mirror,
+                                 xmp_sidecar_path)
+
+
+class TestTagMirror(unittest.TestCase):
+    def setUp(self):
+        """Create a temporary file to tag"""
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "IMG_0001.jpg")
+        with open(self.path, 'wb') as f:
+            f.write(b"test")
+
+    def tearDown(self):
+        """Remove the temporary folder"""
+        shutil.rmtree(self.test_dir)
+
+    def test_xattr(self):
+        """Test tags round-trip through user.xdg.tags"""
+        mirror = XattrTagMirror()
+        if not hasattr(os, 'setxattr'):
+            self.skipTest("Extended attributes not supported on this platform")
+        try:
+            os.setxattr(self.path, 'user.test', b'1')
+        except OSError:
+            self.skipTest("Extended attributes not supported on this filesystem")
+        self.assertTrue(mirror.write(self.path, ["dog", "beach"]))
+        self.assertEqual(mirror.read(self.path), ["dog", "beach"])
+
+    def test_xmp_sidecar(self):
+        """Test tags round-trip through an XMP sidecar and replace old tags"""
+        mirror = XmpSidecarTagMirror()
+        self.assertEqual(mirror.read(self.path), [])
+        self.assertTrue(mirror.write(self.path, ["dog", "beach"]))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "IMG_0001.xmp")))
+        self.assertTrue(mirror.write(self.path, ["cat"]))
+        self.assertEqual(mirror.read(self.path), ["cat"])
+
+    def test_xmp_sidecar_keeps_other_metadata(self):
+        """Test existing sidecar content survives a tag update"""
+        with open(xmp_sidecar_path(self.path), 'w') as f:
+            f.write('<x:xmpmeta xmlns:x="adobe:ns:meta/">'
+                    '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+                    '<rdf:Description rdf:about="" xmlns:xmp="http://ns.adobe.com/xap/1.0/" xmp:Rating="5"/>'
+                    '</rdf:RDF></x:xmpmeta>')
+        XmpSidecarTagMirror().write(self.path, ["dog"])
+        with open(xmp_sidecar_path(self.path)) as f:
+            content = f.read()
+        self.assertIn('Rating="5"', content)
+        self.assertEqual(XmpSidecarTagMirror().read(self.path), ["dog"])
+
+    def test_get_tag_mirror(self):
+        """Test mirror lookup by name"""
+        self.assertIsInstance(get_tag_mirror('xmp'), XmpSidecarTagMirror)
+        with self.assertRaises(ValueError):
+            get_tag_mirror('unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from PIL import Image
+
+from declutrr.store import MetadataStore
+from declutrr.analyzers import TagAnalyzer
+from declutrr.pipeline import Pipeline
+from declutrr.tagging import extract_tags, decode_for_inference
+
+
+class FakeTensor(list):
+    def tolist(self):
+        return list(self)
+
+
+def cls_result(pairs):
+    names = {i: name for i, (name, _) in enumerate(pairs)}
+    probs = SimpleNamespace(top5=list(names), top5conf=FakeTensor(conf for _, conf in pairs))
+    return SimpleNamespace(names=names, probs=probs)
+
+
+def det_result(pairs):
+    names = {i: name for i, (name, _) in enumerate(pairs)}
+    boxes = SimpleNamespace(cls=FakeTensor(names), conf=FakeTensor(conf for _, conf in pairs))
+    return SimpleNamespace(names=names, boxes=boxes)
+
+
+class FakeModel:
+    """Records batch sizes and returns the same result for every image"""
+    def __init__(self, result, fail_after=None):
+        self.result = result
+        self.batches = []
+        self.fail_after = fail_after
+
+    def __call__(self, images):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            raise RuntimeError("simulated crash")
+        self.batches.append(len(images))
+        return [self.result for _ in images]
+
+
+class TestTagging(unittest.TestCase):
+    def setUp(self):
+        """Create a folder of small test images"""
+        self.test_dir = tempfile.mkdtemp()
+        for i in range(10):
+            Image.new('RGB', (64, 48), 'red').save(os.path.join(self.test_dir, f"img{i}.jpg"))
+        self.store = MetadataStore.for_directory(self.test_dir)
+        self.cls_model = FakeModel(cls_result([("beach", 0.9), ("seashore", 0.5), ("sandbar", 0.1)]))
+        self.det_model = FakeModel(det_result([("person", 0.8), ("dog", 0.95)]))
+
+    def tearDown(self):
+        """Close the store and remove the folder"""
+        self.store.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_extract_tags(self):
+        """Test top classifications and detections are merged by confidence"""
+        tags = extract_tags(self.cls_model.result, self.det_model.result)
+        self.assertEqual([name for name, _ in tags], ["dog", "beach", "person", "seashore"])
+
+    def test_decode_for_inference(self):
+        """Test images are decoded no larger than model resolution"""
+        path = os.path.join(self.test_dir, "large.jpg")
+        Image.new('RGB', (2000, 1000), 'blue').save(path)
+        image = decode_for_inference(path, size=640)
+        self.assertLessEqual(max(image.size), 640)
+        self.assertEqual(image.mode, 'RGB')
+        self.assertIsNone(decode_for_inference(os.path.join(self.test_dir, "missing.jpg")))
+
+    def run_tagging(self, cls_model=None, det_model=None, batch_size=4):
+        analyzer = TagAnalyzer(cls_model or self.cls_model, det_model or self.det_model, batch_size=batch_size)
+        return Pipeline(self.test_dir, [analyzer]).run()
+
+    def test_batches_and_store(self):
+        """Test both models receive batches and tags are persisted"""
+        stats = self.run_tagging()
+        self.assertEqual(stats['analyzed'], 10)
+        self.assertEqual(sum(self.cls_model.batches), 10)
+        self.assertLessEqual(max(self.cls_model.batches), 4)
+        self.assertEqual(self.det_model.batches, self.cls_model.batches)
+        self.assertEqual(self.store.get_tags("img0.jpg"), ["dog", "beach", "person", "seashore"])
+
+    def test_rerun_only_processes_changed_files(self):
+        """Test a rerun skips tagged files and picks up modified ones"""
+        self.run_tagging()
+        path = os.path.join(self.test_dir, "img3.jpg")
+        Image.new('RGB', (80, 60), 'green').save(path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        stats = self.run_tagging()
+        self.assertEqual((stats['analyzed'], stats['cached']), (1, 9))
+
+    def test_undecodable_file(self):
+        """Test files that fail to decode are reported and not marked as tagged"""
+        with open(os.path.join(self.test_dir, "broken.jpg"), 'w') as f:
+            f.write("not an image")
+        self.assertEqual(self.run_tagging()['failed'], 1)
+        self.assertEqual(self.run_tagging()['failed'], 1)
+        self.assertEqual(self.store.get_tags("broken.jpg"), [])
+
+    def test_model_error_fails_only_its_file(self):
+        """Test a model crashing on one image still tags the rest of its batch"""
+        Image.new('RGB', (80, 60), 'green').save(os.path.join(self.test_dir, "odd.jpg"))
+
+        def picky(images):
+            if any(image.size == (80, 60) for image in images):
+                raise RuntimeError("unsupported image")
+            return [self.cls_model.result for _ in images]
+        stats = self.run_tagging(cls_model=picky)
+        self.assertEqual((stats['analyzed'], stats['failed']), (10, 1))
+        self.assertEqual(self.store.get_tags("odd.jpg"), [])
+        self.assertEqual(self.store.get_tags("img0.jpg"), ["dog", "beach", "person", "seashore"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from declutrr import tracing
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        """Create a folder for the trace"""
+        self.test_dir = tempfile.mkdtemp()
+        self.trace = os.path.join(self.test_dir, 'trace.json')
+
+    def tearDown(self):
+        """Stop tracing and remove the folder"""
+        tracing.stop_tracing()
+        shutil.rmtree(self.test_dir)
+
+    def events(self):
+        with open(self.trace) as f:
+            return json.load(f)['traceEvents']
+
+    def test_spans_per_thread(self):
+        """Test spans from the main and a worker thread end up in one trace, with thread names"""
+        @tracing.traced('work')
+        def work():
+            time.sleep(0.01)
+
+        tracing.start_tracing(self.trace)
+        with tracing.span('outer', file='a.jpg'):
+            worker = threading.Thread(target=work, name='worker')
+            worker.start()
+            worker.join()
+        tracing.mark('keypress', key='Right')
+        start = time.perf_counter()
+        tracing.add_span('paint', start, start + 0.005)
+        tracing.stop_tracing()
+
+        events = self.events()
+        spans = {event['name']: event for event in events if event['ph'] == 'X'}
+        self.assertEqual(set(spans), {'outer', 'work', 'paint'})
+        self.assertGreaterEqual(spans['work']['dur'], 10000)
+        self.assertEqual(spans['outer']['args'], {'file': 'a.jpg'})
+        self.assertAlmostEqual(spans['paint']['dur'], 5000, delta=1)
+        self.assertNotEqual(spans['outer']['tid'], spans['work']['tid'])
+        names = {event['tid']: event['args']['name'] for event in events if event['ph'] == 'M'}
+        self.assertEqual(names[spans['work']['tid']], 'worker')
+
+    def test_cprofile_per_span(self):
+        """Test nested spans are profiled once, under the outer span's name"""
+        profiles = os.path.join(self.test_dir, 'profiles')
+        tracing.start_tracing(self.trace, profiles)
+        with tracing.span('decode'):
+            with tracing.span('read'):
+                sum(range(1000))
+        tracing.stop_tracing()
+        self.assertEqual(os.listdir(profiles), ['decode.prof'])
+
+    def test_off_by_default(self):
+        """Test spans do nothing and nothing is written while tracing is off"""
+        with tracing.span('scan'):
+            pass
+        tracing.stop_tracing()
+        self.assertFalse(os.path.exists(self.trace))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+
+from declutrr.constants import *
+from declutrr.utils import setup_logging, stop_logging, log_summary
+
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        """Log into a temporary folder"""
+        self.test_dir = tempfile.mkdtemp()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.test_dir)
+
+    def tearDown(self):
+        """Stop the listener and remove the folder"""
+        stop_logging()
+        logging.getLogger().setLevel(logging.WARNING)
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.test_dir)
+
+    def read_log(self) -> list[str]:
+        stop_logging()
+        (name,) = [name for name in os.listdir(LOG_DIR) if name.endswith('.log')]
+        with open(os.path.join(LOG_DIR, name)) as f:
+            return f.read().splitlines()
+
+    def test_per_file_messages_are_sampled(self):
+        """Test 1 in N per-file messages of each kind is logged, and every warning"""
+        setup_logging('test', sample_every=10)
+        file_log = logging.getLogger(FILE_LOGGER)
+        for i in range(25):
+            file_log.info("Moved %s to blurry/", f"{i}.jpg")
+            file_log.info("Tagged %s", f"{i}.jpg")
+        file_log.warning("Could not read %s", "broken.jpg")
+        file_log.warning("Could not read %s", "other.jpg")
+        lines = self.read_log()
+        self.assertEqual(sum('Moved' in line for line in lines), 3)
+        self.assertEqual(sum('Tagged' in line for line in lines), 3)
+        self.assertEqual(sum('Could not read' in line for line in lines), 2)
+
+    def test_level(self):
+        """Test messages below the configured level are dropped"""
+        setup_logging('test', level='warning')
+        logging.info("hidden")
+        logging.warning("shown")
+        lines = self.read_log()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('WARNING - shown', lines[0])
+
+    def test_summary_is_structured(self):
+        """Test summaries are logged readably and appended to the summary log as JSON"""
+        setup_logging('apply')
+        log_summary("Apply", {'moved': 3, 'failed': 0})
+        lines = self.read_log()
+        self.assertIn("Apply summary: moved=3, failed=0", lines[-1])
+        with open(os.path.join(LOG_DIR, SUMMARY_LOG)) as f:
+            (entry,) = [json.loads(line) for line in f]
+        self.assertEqual((entry['command'], entry['summary'], entry['moved'], entry['failed']),
+                         ('apply', 'Apply', 3, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
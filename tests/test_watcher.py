@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+from declutrr.watcher import FolderWatch, InotifyWatcher, PollingWatcher
+
+
+def write(path, data=b'x'):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        """Create a folder with one existing image"""
+        self.test_dir = tempfile.mkdtemp()
+        write(self.path('old.jpg'))
+
+    def tearDown(self):
+        """Remove the folder"""
+        shutil.rmtree(self.test_dir)
+
+    def path(self, name):
+        return os.path.join(self.test_dir, name)
+
+    def test_polling_waits_for_stable_files(self):
+        """Test a new file is reported once it stopped changing, and only once"""
+        watcher = PollingWatcher(self.test_dir, interval=0)
+        write(self.path('new.jpg'))
+        write(self.path('notes.txt'))
+        self.assertEqual(watcher.poll(0), [])
+        self.assertEqual(watcher.poll(0), ['new.jpg'])
+        self.assertEqual(watcher.poll(0), [])
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "inotify is Linux only")
+    def test_inotify_reports_closed_and_moved_files(self):
+        """Test files are reported when written completely or moved in"""
+        watcher = InotifyWatcher(self.test_dir)
+        try:
+            write(self.path('new.jpg'))
+            write(self.path('.partial'))
+            os.rename(self.path('.partial'), self.path('moved.png'))
+            self.assertEqual(sorted(watcher.poll(1)), ['moved.png', 'new.jpg'])
+        finally:
+            watcher.close()
+
+    def test_folder_watch_burst(self):
+        """Test a burst of new files is prepared in the background, skipping known ones"""
+        watch = FolderWatch(self.test_dir, os.path.getsize,
+                            watcher=PollingWatcher(self.test_dir, interval=0.05)).start()
+        try:
+            for i in range(20):
+                write(self.path(f'{i:02d}.jpg'), b'x' * i)
+            items = []
+            deadline = time.time() + 5
+            while len(items) < 20 and time.time() < deadline:
+                items += watch.drain()
+                time.sleep(0.05)
+        finally:
+            watch.stop()
+        self.assertEqual(sorted(items), [(i, f'{i:02d}.jpg') for i in range(20)])
+
+    def test_files_arriving_before_watch_starts(self):
+        """Test a file arriving between listing the folder and starting the watch is still reported"""
+        watcher = PollingWatcher(self.test_dir, interval=0.05)
+        write(self.path('loaded.jpg'))
+        # Listed and loaded by the UI, then one more arrives before the watch starts
+        write(self.path('gap.jpg'))
+        watch = FolderWatch(self.test_dir, os.path.getsize, known={'loaded.jpg'}, watcher=watcher).start()
+        try:
+            items = []
+            deadline = time.time() + 5
+            while not items and time.time() < deadline:
+                items += watch.drain()
+                time.sleep(0.05)
+            time.sleep(0.2)
+            items += watch.drain()
+        finally:
+            watch.stop()
+        self.assertEqual(items, [(1, 'gap.jpg')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from PIL import Image
+
+from declutrr.constants import *
+from declutrr.web import SortSession, make_server, preview_size
+
+NAMES = ['a.jpg', 'b.jpg', 'c.jpg']
+
+
+class TestWebFrontend(unittest.TestCase):
+    def setUp(self):
+        """Serve a folder of three photos on a free port"""
+        self.test_dir = tempfile.mkdtemp()
+        for i, name in enumerate(NAMES):
+            path = os.path.join(self.test_dir, name)
+            Image.new('RGB', (1200, 800), (80 * i, 100, 150)).save(path, 'JPEG')
+            os.utime(path, (1000 + i, 1000 + i))
+        self.session = SortSession(self.test_dir)
+        self.server = make_server(self.session, port=0)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        """Stop the server and remove the folder"""
+        self.server.shutdown()
+        self.server.server_close()
+        self.session.close()
+        shutil.rmtree(self.test_dir)
+
+    def get(self, path: str, headers: dict | None = None):
+        return urlopen(Request(self.url + path, headers=headers or {}))
+
+    def post(self, path: str, body: dict, content_type: str = 'application/json') -> dict:
+        request = Request(self.url + path, data=json.dumps(body).encode(), method='POST',
+                          headers={'Content-Type': content_type})
+        with urlopen(request) as response:
+            return json.load(response)
+
+    def test_state_and_previews(self):
+        """Test the state names a fitted, cacheable preview and prefetch hints for the next ones"""
+        with self.get('/api/state?w=600&h=500') as response:
+            state = json.load(response)
+            links = response.headers['Link']
+        self.assertEqual(state['current'], 'a.jpg')
+        self.assertEqual(state['left'], 3)
+        self.assertEqual(state['preview'], '/preview/a.jpg?w=640&h=640')
+        self.assertIn('</preview/b.jpg?w=640&h=640>; rel=prefetch', links)
+
+        with self.get(state['preview']) as response:
+            self.assertEqual(response.headers['Content-Type'], 'image/jpeg')
+            self.assertIn('immutable', response.headers['Cache-Control'])
+            etag = response.headers['ETag']
+            preview = Image.open(io.BytesIO(response.read()))
+        self.assertEqual(preview.size, (640, 427))
+        with self.assertRaises(HTTPError) as cm:
+            self.get(state['preview'], {'If-None-Match': etag})
+        self.assertEqual(cm.exception.code, 304)
+
+    def test_decisions_and_undo(self):
+        """Test keep moves the file and shows the next one, skip goes to the back and undo restores"""
+        state = self.post('/api/decision', {'file': 'a.jpg', 'action': ACTION_KEEP})
+        self.assertEqual((state['current'], state['kept']), ('b.jpg', 1))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'keep', 'a.jpg')))
+        state = self.post('/api/decision', {'file': 'b.jpg', 'action': ACTION_SKIP})
+        self.assertEqual(self.session.queue, ['c.jpg', 'b.jpg'])
+        state = self.post('/api/undo', {})
+        self.assertEqual((state['current'], state['kept']), ('a.jpg', 0))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'a.jpg')))
+
+        # Only the current queue's files, and only JSON
+        with self.assertRaises(HTTPError) as cm:
+            self.post('/api/decision', {'file': '../a.jpg', 'action': ACTION_DELETE})
+        self.assertEqual(cm.exception.code, 409)
+        with self.assertRaises(HTTPError) as cm:
+            self.post('/api/decision', {'file': 'a.jpg', 'action': ACTION_DELETE}, 'text/plain')
+        self.assertEqual(cm.exception.code, 415)
+        with self.assertRaises(HTTPError) as cm:
+            self.get('/preview/..%2Fsecret.jpg')
+        self.assertEqual(cm.exception.code, 400)
+
+    def test_preview_size(self):
+        """Test window sizes are rounded up to shared steps and capped"""
+        self.assertEqual(preview_size({'w': ['1'], 'h': ['161']}), (PREVIEW_STEP, 2 * PREVIEW_STEP))
+        self.assertEqual(preview_size({'w': ['99999'], 'h': ['x']}), (PREVIEW_MAX_SIZE, PREVIEW_SIZE[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()